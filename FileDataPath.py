@@ -25,3 +25,8 @@ AdventureVoicePath = "typeadv/voice/adventure"
 StillVoicePath = "othersounds/still"
 
 StillSpinePath = "chara/still"
+
+
+# 本地已安装文件的 hash 记录
+TranslationHashPath = "update_manifest/translation.json"
+ClientHashPath = "update_manifest/client.json"
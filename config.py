@@ -1,6 +1,11 @@
 import os
 from pathlib import Path
 from utils import SimpleConfig, log, check_proxy
+from utils.session import SessionPool
+from utils.limiter import AdaptiveLimiter
+from utils.process_pool import ProcessPool
+from lib.flowery.flowery import ExecutorRegistry
+from core import UnityExtractor
 
 Game = {"token": ""}
 
@@ -16,6 +21,11 @@ def getGameToken():
 CachePath = Path("update_cache")
 CachePath.mkdir(exist_ok=True)
 CharaIconPath = CachePath / "chara_icon"
+CharaIconIndexPath = CachePath / "chara_icon.index.json"
+HashSnapshotPath = CachePath / "hash_data.pickle"
+BlobCachePath = CachePath / "blobs"
+BundleCachePath = CachePath / "bundles"
+UpdateJournalPath = CachePath / "update_journal.jsonl"
 
 
 update_config = SimpleConfig(Path("update_config.ini"))
@@ -33,6 +43,45 @@ if not update_config.has_option(section, "update_all_resources"):
 if not update_config.has_option(section, "use_github_mirror"):
     update_config.set(section, "use_github_mirror", "1")
 
+if not update_config.has_option(section, "plan_workers"):
+    update_config.set(section, "plan_workers", "4")
+
+if not update_config.has_option(section, "update_task_workers"):
+    update_config.set(section, "update_task_workers", "16")
+
+if not update_config.has_option(section, "decode_workers"):
+    update_config.set(section, "decode_workers", "0")
+
+if not update_config.has_option(section, "image_format"):
+    update_config.set(section, "image_format", "png")
+
+if not update_config.has_option(section, "png_compress_level"):
+    update_config.set(section, "png_compress_level", "1")
+
+if not update_config.has_option(section, "image_workers"):
+    update_config.set(section, "image_workers", "0")
+
+if not update_config.has_option(section, "download_segments"):
+    update_config.set(section, "download_segments", "8")
+
+if not update_config.has_option(section, "blob_cache_max_size"):
+    update_config.set(section, "blob_cache_max_size", "512")
+
+if not update_config.has_option(section, "verify_blob_cache"):
+    update_config.set(section, "verify_blob_cache", "0")
+
+if not update_config.has_option(section, "prune_translation"):
+    update_config.set(section, "prune_translation", "0")
+
+if not update_config.has_option(section, "http_connection_limit"):
+    update_config.set(section, "http_connection_limit", "100")
+
+if not update_config.has_option(section, "http_connection_limit_per_host"):
+    update_config.set(section, "http_connection_limit_per_host", "30")
+
+if not update_config.has_option(section, "http_initial_limit_per_host"):
+    update_config.set(section, "http_initial_limit_per_host", "8")
+
 http_proxy = update_config.get(section, "http_proxy", fallback="")
 
 if http_proxy != "":
@@ -45,6 +94,61 @@ update_all_resources = update_config.getboolean(section, "update_all_resources",
 
 use_github_mirror = update_config.getboolean(section, "use_github_mirror", fallback=True)
 
+# 生成更新计划时同时获取信息的角色数, 下载和解包的并发由 update_task_workers 和 decode_workers 控制
+plan_workers = update_config.getint(section, "plan_workers", fallback=4)
+update_task_workers = update_config.getint(section, "update_task_workers", fallback=16)
+
+# 导出贴图的格式 (png / webp) 和 PNG 压缩等级 (0-9, 越低越快, 文件越大)
+image_format = update_config.get(section, "image_format", fallback="png").lower()
+if image_format not in ("png", "webp"):
+    log.warning(f"不支持的图片格式: {image_format}, 使用 png")
+    image_format = "png"
+png_compress_level = update_config.getint(section, "png_compress_level", fallback=1)
+image_output_profile = {
+    "format": image_format,
+    "compress_level": min(max(png_compress_level, 0), 9),
+    "optimize": False,
+}
+UnityExtractor.set_output_profile(image_output_profile)
+
+# 解包进程数, 0 为 CPU 核心数, 子进程启动时传入贴图输出设置
+decode_workers = update_config.getint(section, "decode_workers", fallback=0)
+ProcessPool.configure(
+    decode_workers, UnityExtractor.set_output_profile, (image_output_profile,)
+)
+
+# 图片处理线程数, 与文件读写使用的默认线程池分开, 0 为默认数量
+image_workers = update_config.getint(section, "image_workers", fallback=0)
+ExecutorRegistry.configure("image", "thread", image_workers)
+
+# 大文件分段下载的连接数
+download_segments = update_config.getint(section, "download_segments", fallback=8)
+
+# 服务器数据文件缓存上限, 单位 MB
+blob_cache_max_size = (
+    update_config.getint(section, "blob_cache_max_size", fallback=512) * 1024 * 1024
+)
+verify_blob_cache = update_config.getboolean(section, "verify_blob_cache", fallback=False)
+
+prune_translation = update_config.getboolean(section, "prune_translation", fallback=False)
+
+http_connection_limit = update_config.getint(section, "http_connection_limit", fallback=100)
+http_connection_limit_per_host = update_config.getint(
+    section, "http_connection_limit_per_host", fallback=30
+)
+
+SessionPool.configure(
+    limit=http_connection_limit, limit_per_host=http_connection_limit_per_host
+)
+
+# 每个主机的并发数从初始值开始自动调整, 上限为 http_connection_limit_per_host
+http_initial_limit_per_host = update_config.getint(
+    section, "http_initial_limit_per_host", fallback=8
+)
+AdaptiveLimiter.configure(
+    initial_limit=http_initial_limit_per_host, max_limit=http_connection_limit_per_host
+)
+
 update_server_path = Path("update_server.ini")
 if not update_server_path.exists():
     log.error("update_server.ini not found")
@@ -0,0 +1,109 @@
+import asyncio
+
+from pathlib import Path
+
+from utils import log, load_json, save_json, ProcessPool
+
+from config import CharaIconPath, CharaIconIndexPath
+
+from core import UnityExtractor
+
+
+class CharaIconIndex:
+    """
+    chara_icon 资源包的 Sprite 索引
+
+    索引按 Sprite 名称记录 path_id, 保存在 update_cache 中,
+    资源包的大小或修改时间变化后自动重建。
+    解包在进程池中进行, 图标由 save_missing_icons 一次批量导出, 资源包只解析一次。
+    """
+
+    _instance = None
+
+    bundle_path: Path
+    index_path: Path
+    sprites: dict = None
+    _signature: dict = None
+    _lock: asyncio.Lock = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(CharaIconIndex, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(
+        self, bundle_path: Path = CharaIconPath, index_path: Path = CharaIconIndexPath
+    ):
+        self.bundle_path = bundle_path
+        self.index_path = index_path
+
+    def bundle_signature(self):
+        stat = self.bundle_path.stat()
+        return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    async def _build(self, signature):
+        log.info("正在建立图标索引")
+        sprites = await ProcessPool.run(UnityExtractor.index_chara_icon, self.bundle_path)
+        save_json({"bundle": signature, "sprites": sprites}, self.index_path)
+        return sprites
+
+    async def load(self):
+        """读取索引, 资源包变化后重建"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            return await self._load()
+
+    async def _load(self):
+        signature = self.bundle_signature()
+        if self.sprites is not None and self._signature == signature:
+            return self.sprites
+
+        sprites = None
+        if self.index_path.exists():
+            try:
+                index = load_json(self.index_path)
+                if index.get("bundle") == signature:
+                    sprites = index["sprites"]
+            except ValueError:
+                log.warning("图标索引损坏, 重新建立")
+
+        if sprites is None:
+            sprites = await self._build(signature)
+
+        self.sprites = sprites
+        self._signature = signature
+        return sprites
+
+    async def has_icon(self, name) -> bool:
+        return str(name) in await self.load()
+
+    async def save_icons(self, icons: dict) -> list[Path]:
+        """按名称导出图标, icons 为 {名称: 保存路径}"""
+        sprites = await self.load()
+        tasks = [
+            (sprites[str(name)]["path_id"], icon_path)
+            for name, icon_path in icons.items()
+            if str(name) in sprites
+        ]
+        if len(tasks) == 0:
+            return []
+
+        return await ProcessPool.run(
+            UnityExtractor.extract_chara_icons, self.bundle_path, tasks
+        )
+
+    async def save_missing_icons(
+        self, icon_dir: Path, names=None, force_download=False
+    ) -> list[Path]:
+        """一次导出所有缺少的图标, names 为空时导出索引中的全部图标"""
+        sprites = await self.load()
+        names = sprites.keys() if names is None else [str(x) for x in names]
+
+        icons = {}
+        for name in names:
+            icon_path = icon_dir / f"{name}.png"
+            if not icon_path.exists() or force_download:
+                icons[name] = icon_path
+        return await self.save_icons(icons)
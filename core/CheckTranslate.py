@@ -1,56 +1,134 @@
-import asyncio
-
 from pathlib import Path
 
 from tqdm.asyncio import tqdm_asyncio
 
-from utils import log, ids_difference
+from utils import log
 from FileDataPath import (
     ZH_MScenesPath,
     ZH_MAdultsPath,
 )
 
-from core.DataServer.GitHubServer import GitHubServer, save_server_json
-from core.LocalGame import LocalGame
+from core.DataServer.GitHubServer import GitHubServer, save_server_binary
+from core.DataServer.BlobStore import manifest_hash, content_hash_matches
+from core.LocalGame import LocalGame, get_path_ids
+
+
+async def download(ids, server_path, output_path):
+    """下载文件, 返回下载成功的id, 并发数由 AdaptiveLimiter 按主机自动调整"""
+
+    async def download_one(id):
+        try:
+            # 保存服务器的原始内容, 本地文件和服务器 hash 保持一致
+            return await save_server_binary(id, server_path, output_path)
+        except Exception as e:
+            log.warning(f"下载失败: {server_path}{id} ({e!r})")
+            return False
+
+    tasks = [download_one(id) for id in ids]
+    results = await tqdm_asyncio.gather(*tasks)
+    return [id for id, ok in zip(ids, results) if ok]
+
+
+def diff_translation(server_hashes: dict, local_hashes: dict, local_ids):
+    """
+    对比服务器和本地记录的 hash
+    返回 (新增, 有修改, 服务器已删除) 的id
+    本地有文件但没有记录 hash 的按有修改处理, 先用 seed_local_hashes 按内容补上记录
+    """
+    local_ids = set(local_ids)
+    added = [x for x in server_hashes if x not in local_ids]
+    changed = [
+        x
+        for x in server_hashes
+        if x in local_ids and local_hashes.get(x) != server_hashes[x]
+    ]
+    removed = [x for x in local_ids if x not in server_hashes]
+    return added, changed, removed
+
 
+def seed_local_hashes(output_path: Path, server_hashes: dict, local_hashes: dict, local_ids):
+    """
+    本地有文件但没有记录 hash 的 (首次运行或记录丢失) 按文件内容校验,
+    内容和服务器一致的直接记录服务器 hash, 不用重新下载
+    """
+    for id in local_ids:
+        if id in server_hashes and id not in local_hashes:
+            if content_hash_matches((output_path / id).read_bytes(), server_hashes[id]):
+                local_hashes[id] = server_hashes[id]
+    return local_hashes
 
-async def download(ids, server_path, output_path, download_num=20):
-    semaphore = asyncio.Semaphore(download_num)
-    tasks = [save_server_json(semaphore, id, server_path, output_path) for id in ids]
-    await tqdm_asyncio.gather(*tasks)
 
+async def sync_translation(
+    name: str,
+    server_path: str,
+    output_path: Path,
+    server_data: dict,
+    local_hashes: dict,
+    prune=False,
+    exclude_ids=(),
+):
+    # 文件的值可能是 hash 字符串或 {"hash": ...}, 子目录 manifest_hash 返回 None
+    server_hashes = {
+        id: hash
+        for id, value in server_data.items()
+        if id not in exclude_ids and (hash := manifest_hash(value)) is not None
+    }
+    output_path.mkdir(parents=True, exist_ok=True)
+    local_ids = get_path_ids(output_path)
+    seed_local_hashes(output_path, server_hashes, local_hashes, local_ids)
 
-async def check_translate(lg: LocalGame, output_path: Path = None, download_num=20):
+    added, changed, removed = diff_translation(server_hashes, local_hashes, local_ids)
+
+    log.info(f"{name} 新增: {len(added)}, 更新: {len(changed)}, 服务器已删除: {len(removed)}")
+
+    if len(added) + len(changed) > 0:
+        done_ids = await download(added + changed, server_path, output_path)
+        for id in done_ids:
+            local_hashes[id] = server_hashes[id]
+
+    if prune:
+        for id in removed:
+            (output_path / id).unlink(missing_ok=True)
+            local_hashes.pop(id, None)
+        if len(removed) > 0:
+            log.info(f"{name} 已删除: {len(removed)}")
+
+    return local_hashes
+
+
+async def check_translate(
+    lg: LocalGame, output_path: Path = None, prune=False
+):
     if output_path is None:
         output_path = lg.game_root
 
     log.info(f"正在检查汉化更新..")
 
-    localMSceneIds = lg.getZH_MSceneIds()
-    localMAdultIds = lg.getZH_MAdultIds()
-
-    log.info(f"汉化场景：{len(localMSceneIds)}")
-    log.info(f"侍寝场景：{len(localMAdultIds)}")
+    log.info(f"汉化场景：{len(lg.getZH_MSceneIds())}")
+    log.info(f"侍寝场景：{len(lg.getZH_MAdultIds())}")
 
     log.info(f"正在获取最新汉化资源列表...")
     res_server = GitHubServer()
     await res_server.init()
 
-    # fmt: off
-    diff_MSceneIds = ids_difference(localMSceneIds, res_server.hash_data["typeadv"]["MScenes_TW"].keys())
-    diff_MAdultIds = ids_difference(localMAdultIds, res_server.hash_data["jsoncn"].keys())
-    
-    if "MStory" in diff_MSceneIds:
-        diff_MSceneIds.remove("MStory")
-    # fmt: on
-
-    log.info(f"新增场景：{len(diff_MSceneIds)}")
-    log.info(f"新增侍寝：{len(diff_MAdultIds)}")
+    # 记录和文件保存在同一个目录下
+    translation_hash = lg.getTranslationHash(output_path)
 
     log.info(f"正在下载汉化文本...")
-    # fmt: off
-    if len(diff_MSceneIds) > 0:
-        await download(diff_MSceneIds, "typeadv/MScenes_TW/", output_path / ZH_MScenesPath, download_num)
-    if len(diff_MAdultIds) > 0:
-        await download(diff_MAdultIds, "jsoncn/", output_path / ZH_MAdultsPath, download_num)
-    # fmt: on
+    try:
+        # fmt: off
+        translation_hash[ZH_MScenesPath] = await sync_translation(
+            "汉化场景", "typeadv/MScenes_TW/", output_path / ZH_MScenesPath,
+            res_server.hash_data["typeadv"]["MScenes_TW"],
+            translation_hash.get(ZH_MScenesPath, {}),
+            prune, exclude_ids=("MStory",),
+        )
+        translation_hash[ZH_MAdultsPath] = await sync_translation(
+            "侍寝场景", "jsoncn/", output_path / ZH_MAdultsPath,
+            res_server.hash_data["jsoncn"],
+            translation_hash.get(ZH_MAdultsPath, {}),
+            prune,
+        )
+        # fmt: on
+    finally:
+        lg.saveTranslationHash(translation_hash, output_path)
@@ -1,17 +1,36 @@
-import re
-import ujson as json
-import UnityPy
+import asyncio
+import functools
 
 from pathlib import Path
 
 from tqdm import tqdm
 from tqdm.asyncio import tqdm_asyncio
 
-from utils import log, save_json, file_size_format, UnityEnv, Aria2c
-from config import http_proxy, CharaIconPath, update_all_resources
+from utils import (
+    log,
+    save_json,
+    file_size_format,
+    ProcessPool,
+    SegmentedDownloader,
+    RequestCoalescer,
+    AtomicDirectory,
+)
+from config import (
+    http_proxy,
+    CharaIconPath,
+    UpdateJournalPath,
+    update_all_resources,
+    plan_workers,
+    update_task_workers,
+    download_segments,
+)
 from FileDataPath import (
     MasterDataPath,
     VieableEpisodeListPath,
+    CharacterIconPath,
+    CharaStandPath,
+    HomeStandPath,
+    StandimagePath,
     BGPath,
     BGMPath,
     AdventureVoicePath,
@@ -20,33 +39,28 @@ from FileDataPath import (
 )
 
 from core.OtogiFrontier import OtogiApi
-from core.FetchGameRes import FetchGameRes
+from core.FetchGameRes import FetchGameRes, fetch_bundle
+from core.UpdatePlan import UpdatePlan, UpdateTask, load_manifest_sizes
+from core.UpdateJournal import UpdateJournal
 from core.LocalGame import LocalGame
+from core import UnityExtractor
 
-
-def save_unity_voice(env: UnityEnv, output_path):
-    for obj in env.objects:
-        if obj.type.name == "AudioClip":
-            clip = obj.read()
-            for name, data in clip.samples.items():
-                with (output_path / name).open("wb") as f:
-                    f.write(data)
+# 一次更新内合并不同章节/角色重复引用的背景, BGM, 语音和立绘
+res_coalescer = RequestCoalescer()
 
 
 async def init_chara_icon_cache(GameApi: OtogiApi):
     all_char_icon_size = await GameApi.resource.getAllCharacterIconDataSize()
     log.info(f"图标大小: [{file_size_format(all_char_icon_size)}]")
-    
+
+    # 旧版本 aria2c 下载中断时留下的文件
     aria2_config_file = CharaIconPath.with_suffix(".aria2")
     if aria2_config_file.exists():
         aria2_config_file.unlink()
-        CharaIconPath.unlink()
-    
+        CharaIconPath.unlink(missing_ok=True)
+
     if not CharaIconPath.exists() or CharaIconPath.stat().st_size != all_char_icon_size:
-        aria2c = Aria2c(CharaIconPath.parent)
         dl_url = "https://web-assets.otogi-frontier.com/prodassets//GeneralWebGL/Assets/chara_icon"
-        gid = aria2c.download(dl_url, "chara_icon")
-        
 
         dl_bar = tqdm(
             total=all_char_icon_size,
@@ -55,305 +69,433 @@ async def init_chara_icon_cache(GameApi: OtogiApi):
             unit_scale=True,
         )
 
-        while True:
-            dl_info = aria2c.get_files(gid)[0]
-            # stat = aria2c.get_stat()
-
-            dl_bar.n = int(dl_info["completedLength"])
-            dl_bar.refresh(dl_bar.lock_args)
-
-            if (
-                dl_info["length"] == dl_info["completedLength"]
-                and dl_info["completedLength"] != "0"
-            ):
-                if not aria2_config_file.exists():
-                    break
-
-        # chara_icon_file_f = CharaIconPath.open("wb+")
-        # def chunk_handler(chunk):
-        #     dl_bar.update(len(chunk))
-        #     chara_icon_file_f.write(chunk)
-        # await GameApi.resource.getAllCharacterIconData(chunk_handler)
-        # chara_icon_file_f.close()
-
-        dl_bar.close()
+        def progress_handler(completed, total):
+            dl_bar.total = total
+            dl_bar.n = completed
+            dl_bar.refresh()
+
+        downloader = SegmentedDownloader(
+            dl_url,
+            CharaIconPath,
+            segments=download_segments,
+            proxy=GameApi.resource.proxy,
+            progress_handler=progress_handler,
+        )
+        try:
+            await downloader.download()
+        finally:
+            dl_bar.close()
     else:
         log.info(f"当前图标缓存已经是最新")
 
 
-async def save_chara_res(char_id, output_path: Path, force_download=False):
+@res_coalescer.coalesce("chara/res/{char_id}")
+async def save_chara_res(
+    char_id, output_path: Path, force_download=False, GameApi: OtogiApi = None
+):
+    GameResApi = FetchGameRes(GameApi)
     request_res_task = [
-        FetchGameRes().save_chara_stand(char_id, output_path, force_download),
-        FetchGameRes().save_home_stand(char_id, output_path, force_download),
+        GameResApi.save_chara_stand(char_id, output_path, force_download),
+        GameResApi.save_home_stand(char_id, output_path, force_download),
     ]
 
-    await tqdm_asyncio.gather(*request_res_task)
+    await asyncio.gather(*request_res_task)
 
 
-async def save_MScenes_MAdults_res(
-    MSceneId, MAdultId, output_path: Path, force_download=False
+@res_coalescer.coalesce("bg/adventure/{bg_id}")
+async def save_adventure_bg(
+    GameApi: OtogiApi, bg_id, output_path: Path, force_download=False
 ):
-    GameApi = OtogiApi(proxy=http_proxy)
-    MScenes = await GameApi.char.getMScenes(MSceneId)
-
-    async def MScenes_handler(MScenes, output_path):
-        GameApi = OtogiApi(proxy=http_proxy)
-        if isinstance(MScenes, dict):
-            MScenes = [MScenes]
-
-        for MScene in MScenes:
-            if len(MScene["MSceneDetails"]) > 0:
-                pbar = tqdm(MScene["MSceneDetails"], desc="获取章节资源")
-                for MSceneDetail in pbar:
-                    await save_chara_res(
-                        MSceneDetail["MMonsterId"],
-                        output_path,
-                        force_download=force_download,
-                    )
-                    if bg_id := MSceneDetail.get("BackgroundImage"):
-                        if (
-                            not (output_path / BGPath / (bg_id + ".png")).exists()
-                            or force_download
-                        ):
-                            (output_path / BGPath).mkdir(parents=True, exist_ok=True)
-                            bg_data = await GameApi.resource.getAdventureBG(bg_id)
-                            bg_env = UnityPy.load(bg_data)
-                            for obj in bg_env.objects:
-                                if obj.type.name == "Texture2D":
-                                    data = obj.read()
-                                    data_name = Path(data.container).name
-                                    data.image.save(output_path / BGPath / data_name)
+    if (output_path / BGPath / (bg_id + ".png")).exists() and not force_download:
+        return
 
-                    if bgm_name := MSceneDetail.get("BGM"):
-                        if (
-                            not (output_path / BGMPath / (bgm_name + ".m4a")).exists()
-                            or force_download
-                        ):
-                            (output_path / BGMPath).mkdir(parents=True, exist_ok=True)
-                            bgm_data = await GameApi.resource.getAdventureBGM(bgm_name)
-                            bgm_env = UnityPy.load(bgm_data)
-                            save_unity_voice(bgm_env, output_path / BGMPath)
-
-                pbar.close()
-
-            if MRichSceneDetails := MScene.get("MRichSceneDetails"):
-                if len(MRichSceneDetails) > 0:
-                    pbar = tqdm(MRichSceneDetails, desc="获取章节资源")
-                    for MRichSceneDetail in pbar:
-                        for chara in MRichSceneDetail["Characters"]:
-                            await save_chara_res(
-                                chara["MMonsterId"],
-                                output_path,
-                                force_download=force_download,
-                            )
-
-            if MSceneDetails := MScene.get("MSceneDetails"):
-                if len(MSceneDetails) > 0:
-                    pbar = tqdm(MSceneDetails, desc="获取章节资源")
-                    for MSceneDetail in pbar:
-                        await save_chara_res(
-                            MSceneDetail["MMonsterId"],
-                            output_path,
-                            force_download=force_download,
-                        )
-
-    async def BGM_handler(MAdults, output_path):
-        GameApi = OtogiApi(proxy=http_proxy)
-
-        pbar = tqdm(MAdults["MAdultDetails"], desc="获取BGM资源")
-        for info in pbar:
-            bgm_name = info["BGM"]
-            if bgm_name is None:
-                continue
+    async with fetch_bundle(
+        GameApi, f"bg/adventure/{bg_id}"
+    ) as bundle_path, AtomicDirectory(
+        output_path / BGPath, merge=True, tag=bg_id
+    ) as temp_path:
+        await ProcessPool.run(
+            UnityExtractor.extract_container_textures, bundle_path, temp_path
+        )
 
-            if (
-                not (output_path / BGMPath / (bgm_name + ".m4a")).exists()
-                or force_download
-            ):
-                (output_path / BGMPath).mkdir(parents=True, exist_ok=True)
-                bgm_data = await GameApi.resource.getAdventureBGM(bgm_name)
-                bgm_env = UnityPy.load(bgm_data)
-                save_unity_voice(bgm_env, output_path / BGMPath)
-        pbar.close()
-
-    async def Voice_handler(MSceneId, MAdultId, output_path):
-        GameApi = OtogiApi(proxy=http_proxy)
-        pbar = tqdm(range(2), desc="获取语音资源")
-        AdventureVoice_path = output_path / AdventureVoicePath
-        AdventureVoice_path.mkdir(parents=True, exist_ok=True)
-        AdventureVoice_file = AdventureVoice_path / f"voice_adventure_{MSceneId}"
-        if not AdventureVoice_file.exists() or force_download:
-            AdventureVoice_file.mkdir(parents=True, exist_ok=True)
-            AdventureVoice_data = await GameApi.resource.getAdventureVoice(MSceneId)
-            AdventureVoice_env = UnityPy.load(AdventureVoice_data)
-            save_unity_voice(AdventureVoice_env, AdventureVoice_file)
-            pbar.update()
 
-        if MAdultId is not None:
-            StillVoice_path = output_path / StillVoicePath / str(MAdultId)
-            if not StillVoice_path.exists() or force_download:
-                StillVoice_path.mkdir(parents=True, exist_ok=True)
-                StillVoice_data = await GameApi.resource.getCharacterStillVoice(
-                    MAdultId
-                )
-                StillVoice_env = UnityPy.load(StillVoice_data)
-                save_unity_voice(StillVoice_env, StillVoice_path)
-                pbar.update()
-        pbar.close()
-
-    async def Spine_handler(MAdultId, output_path):
-        GameApi = OtogiApi(proxy=http_proxy)
-
-        def spine_json_sorter(x):
-            if "_" in x:
-                f = re.findall(r"\d+", x.split("_")[-1])
-                return int(f[0] if f else 0)
-            return int(re.findall(r"\d+", x)[-1])
-
-        StillSpine_path = output_path / StillSpinePath / str(MAdultId)
-        if not StillSpine_path.exists() or force_download:
-            StillSpine_path.mkdir(parents=True, exist_ok=True)
-            StillSpine_data = await GameApi.resource.getCharacterStillSpine(MAdultId)
-            # with (Path(".") / "test").open("wb") as f:
-            #     f.write(StillSpine_data)
-            StillSpine_env = UnityPy.load(StillSpine_data)
-            atlas_list = []
-            skel_json_list = []
-            pbar = tqdm(StillSpine_env.objects, desc="获取Spine资源")
-            for obj in pbar:
-                if obj.type.name == "Texture2D":
-                    data = obj.read()
-                    data_name = Path(data.container).name
-                    data.image.save(StillSpine_path / f"{data.name}.png")
-                if obj.type.name == "TextAsset":
-                    data = obj.read()
-                    data_name = Path(data.container).name
-                    output_path = StillSpine_path / data_name
-
-                    if data_name == f"{MAdultId}.atlas.txt":
-                        data_name = f"{MAdultId}.prefab.atlas.txt"
-
-                    if data_name == f"{MAdultId}.json":
-                        data_name = f"{MAdultId}.prefab.json"
-
-                    output_path = StillSpine_path / data_name
-                    try:
-                        json.loads(data.text)
-                        skel_json_list.append(output_path.stem)
-                    except:
-                        atlas_list.append(output_path)
-
-                    if not output_path.exists() or force_download:
-                        with output_path.open("wb") as f:
-                            f.write(data.script)
-            pbar.close()
-            if len(skel_json_list) != 0:
-                skel_json_list = sorted(skel_json_list, key=spine_json_sorter)
-                fake_skel_json = {
-                    "skeleton": {"spine": "0.0.0"},
-                    "skeleton_list": skel_json_list,
-                }
-                save_json(fake_skel_json, StillSpine_path / f"{MAdultId}.json")
-
-    handler_tasks = []
-
-    if MScenes is not None:
-        handler_tasks += [
-            MScenes_handler(MScenes, output_path),
-            Voice_handler(MSceneId, MAdultId, output_path),
-        ]
-
-    MAdults = None
-    if MAdultId is not None:
-        handler_tasks += [Spine_handler(MAdultId, output_path)]
-        MAdults = await GameApi.char.getMAdults(MAdultId)
-        if MAdults is not None:
-            handler_tasks += [BGM_handler(MAdults, output_path)]
-
-    await tqdm_asyncio.gather(*handler_tasks)
-
-    return MScenes, MAdults
-
-
-async def save_episode_res(
-    MSceneId,
-    MAdultId,
-    Description,
-    output_path: Path,
-    update_output_path: Path = None,
-    force_download=False,
+@res_coalescer.coalesce("sound/bgm/{bgm_name}")
+async def save_adventure_bgm(
+    GameApi: OtogiApi, bgm_name, output_path: Path, force_download=False
 ):
-    GameApi = OtogiApi(proxy=http_proxy)
-    GameResApi = FetchGameRes(GameApi)
+    if (output_path / BGMPath / (bgm_name + ".m4a")).exists() and not force_download:
+        return
 
-    MScenes = await GameApi.char.getMScenes(MSceneId)
-    if MScenes is None:
-        log.warning(f"角色需要 [{Description}]")
+    async with fetch_bundle(
+        GameApi, f"sound/bgm/{bgm_name}"
+    ) as bundle_path, AtomicDirectory(
+        output_path / BGMPath, merge=True, tag=bgm_name
+    ) as temp_path:
+        await ProcessPool.run(UnityExtractor.extract_voice, bundle_path, temp_path)
+
+
+@res_coalescer.coalesce("sound/voice/adventure/voice_adventure_{MSceneId}")
+async def save_adventure_voice(
+    GameApi: OtogiApi, MSceneId, output_path: Path, force_download=False
+):
+    AdventureVoice_path = output_path / AdventureVoicePath
+    AdventureVoice_file = AdventureVoice_path / f"voice_adventure_{MSceneId}"
+    if AdventureVoice_file.exists() and not force_download:
         return
 
-    await GameResApi.save_MScenes(
-        MSceneId, output_path, update_output_path, force_download
-    )
+    async with fetch_bundle(
+        GameApi, f"sound/voice/adventure/voice_adventure_{MSceneId}"
+    ) as bundle_path, AtomicDirectory(AdventureVoice_file) as temp_path:
+        await ProcessPool.run(UnityExtractor.extract_voice, bundle_path, temp_path)
 
-    if MAdultId is not None:
-        MAdults = await GameApi.char.getMAdults(MAdultId)
-        if MAdults is None:
-            log.warning(f"获取MAdults[{MAdultId}]失败")
-            return
 
-        await GameResApi.save_MAdults(
-            MAdultId, output_path, update_output_path, force_download
-        )
+@res_coalescer.coalesce("sound/voice/still/voice_still_{MAdultId}")
+async def save_still_voice(
+    GameApi: OtogiApi, MAdultId, output_path: Path, force_download=False
+):
+    StillVoice_path = output_path / StillVoicePath / str(MAdultId)
+    if StillVoice_path.exists() and not force_download:
+        return
 
-    await save_MScenes_MAdults_res(MSceneId, MAdultId, output_path, force_download)
+    async with fetch_bundle(
+        GameApi, f"sound/voice/still/voice_still_{MAdultId}"
+    ) as bundle_path, AtomicDirectory(StillVoice_path) as temp_path:
+        await ProcessPool.run(UnityExtractor.extract_voice, bundle_path, temp_path)
 
 
-async def save_specials(
-    GameApi: OtogiApi,
-    local_special_episodes,
-    output_path: Path,
-    update_output_path: Path,
-    force_download=False,
+@res_coalescer.coalesce("chara/still/{MAdultId}")
+async def save_still_spine(
+    GameApi: OtogiApi, MAdultId, output_path: Path, force_download=False
 ):
-    GameResApi = FetchGameRes(GameApi)
+    StillSpine_path = output_path / StillSpinePath / str(MAdultId)
+    if StillSpine_path.exists() and not force_download:
+        return
 
-    def is_local_episode(episode):
-        return episode["MSceneAdultFlowId"] in [
-            x["MSceneAdultFlowId"] for x in local_special_episodes
-        ]
+    # 加密资源, saveAssetsFromPath 下载完整后解密写入缓存文件
+    async with fetch_bundle(
+        GameApi, f"chara/still/{MAdultId}"
+    ) as bundle_path, AtomicDirectory(StillSpine_path) as temp_path:
+        await ProcessPool.run(
+            UnityExtractor.extract_spine,
+            bundle_path,
+            temp_path,
+            MAdultId,
+            force_download,
+        )
 
-    res_special = []
-    pbar = tqdm(GameApi.char.Specials, desc="获取报酬中")
-    for special in pbar:
-        title = special["Title"]
-        MSceneId = special["MSceneId"]
-        MAdultId = special["MAdultId"]
-        Description = special["Description"]
 
-        if not special["Viewable"]:
-            print(f"报酬({title})未解锁")
-            continue
+class UpdatePlanner:
+    """遍历角色, 剧情, 报酬和引用的背景/BGM/语音/动画, 生成去重后的更新任务图"""
+
+    def __init__(
+        self,
+        GameApi: OtogiApi,
+        output_path: Path,
+        update_output_path: Path = None,
+        force_download=False,
+    ):
+        self.GameApi = GameApi
+        self.GameResApi = FetchGameRes(GameApi)
+        self.output_path = output_path
+        self.update_output_path = update_output_path
+        self.force_download = force_download
+        self.plan = UpdatePlan()
+        self.characters: list[int] = []
+
+    def _need(self, path: Path) -> bool:
+        return self.force_download or not path.exists()
+
+    def _add(self, key, kind, run, *args, urls=None, deps=None, name=None, resumable=True):
+        return self.plan.add(
+            UpdateTask(
+                key, kind, functools.partial(run, *args), urls, deps, name, resumable
+            )
+        )
 
-        if is_local_episode(special):
-            continue
+    async def add_chara_icon_cache(self):
+        all_char_icon_size = await self.GameApi.resource.getAllCharacterIconDataSize()
+        need = (
+            not CharaIconPath.exists()
+            or CharaIconPath.stat().st_size != all_char_icon_size
+        )
+        # fmt: off
+        return self._add(
+            "chara_icon", "图标数据", init_chara_icon_cache, self.GameApi,
+            urls=["chara_icon"] if need else [], resumable=False,
+        )
+        # fmt: on
+
+    def add_chara_res(self, char_id):
+        urls = []
+        if self._need(self.output_path / CharaStandPath / str(char_id)):
+            urls.append(f"chara/stand/{char_id}")
+        if self._need(self.output_path / HomeStandPath / str(char_id)):
+            urls.append(f"chara/homestand/{char_id}")
+        if len(urls) == 0:
+            return None
+        # fmt: off
+        return self._add(
+            f"chara/res/{char_id}", "角色立绘", save_chara_res,
+            char_id, self.output_path, self.force_download, self.GameApi, urls=urls,
+        )
+        # fmt: on
+
+    def add_stand_image(self, img_id):
+        if not self._need(self.output_path / StandimagePath / f"{img_id}.png"):
+            return None
+        url = f"chara/standimagelarge/{img_id}"
+        # fmt: off
+        return self._add(
+            url, "角色大图", self.GameResApi.save_stand_image_file,
+            img_id, self.output_path, self.force_download, urls=[url],
+        )
+        # fmt: on
+
+    def add_bg(self, bg_id):
+        if not self._need(self.output_path / BGPath / (bg_id + ".png")):
+            return None
+        url = f"bg/adventure/{bg_id}"
+        # fmt: off
+        return self._add(
+            url, "背景", save_adventure_bg,
+            self.GameApi, bg_id, self.output_path, self.force_download, urls=[url],
+        )
+        # fmt: on
+
+    def add_bgm(self, bgm_name):
+        if not self._need(self.output_path / BGMPath / (bgm_name + ".m4a")):
+            return None
+        url = f"sound/bgm/{bgm_name}"
+        # fmt: off
+        return self._add(
+            url, "BGM", save_adventure_bgm,
+            self.GameApi, bgm_name, self.output_path, self.force_download, urls=[url],
+        )
+        # fmt: on
+
+    def add_adventure_voice(self, MSceneId):
+        path = self.output_path / AdventureVoicePath / f"voice_adventure_{MSceneId}"
+        if not self._need(path):
+            return None
+        url = f"sound/voice/adventure/voice_adventure_{MSceneId}"
+        # fmt: off
+        return self._add(
+            url, "剧情语音", save_adventure_voice,
+            self.GameApi, MSceneId, self.output_path, self.force_download, urls=[url],
+        )
+        # fmt: on
+
+    def add_still_voice(self, MAdultId):
+        if not self._need(self.output_path / StillVoicePath / str(MAdultId)):
+            return None
+        url = f"sound/voice/still/voice_still_{MAdultId}"
+        # fmt: off
+        return self._add(
+            url, "侍寝语音", save_still_voice,
+            self.GameApi, MAdultId, self.output_path, self.force_download, urls=[url],
+        )
+        # fmt: on
+
+    def add_still_spine(self, MAdultId):
+        if not self._need(self.output_path / StillSpinePath / str(MAdultId)):
+            return None
+        url = f"chara/still/{MAdultId}"
+        # fmt: off
+        return self._add(
+            url, "侍寝动画", save_still_spine,
+            self.GameApi, MAdultId, self.output_path, self.force_download, urls=[url],
+        )
+        # fmt: on
 
-        res_special.append(special)
+    def add_MScenes(self, MSceneId):
+        # fmt: off
+        return self._add(
+            f"MScenes/{MSceneId}", "剧情数据", self.GameResApi.save_MScenes,
+            MSceneId, self.output_path, self.update_output_path, self.force_download,
+        )
+        # fmt: on
 
-        MScenes, MAdults = await save_MScenes_MAdults_res(
-            MSceneId, MAdultId, output_path, force_download
+    def add_MAdults(self, MAdultId):
+        # fmt: off
+        return self._add(
+            f"MAdults/{MAdultId}", "侍寝数据", self.GameResApi.save_MAdults,
+            MAdultId, self.output_path, self.update_output_path, self.force_download,
         )
+        # fmt: on
 
+    def add_scene_res(self, MSceneId, MAdultId, MScenes, MAdults):
+        """剧情和侍寝场景引用的角色立绘, 背景, BGM, 语音和动画"""
+        keys = []
         if MScenes is not None:
-            await GameResApi.save_MScenes(
-                MSceneId, output_path, update_output_path, force_download
-            )
+            if isinstance(MScenes, dict):
+                MScenes = [MScenes]
+
+            chara_ids = set()
+            bg_ids = set()
+            bgm_names = set()
+            for MScene in MScenes:
+                for MSceneDetail in MScene.get("MSceneDetails") or []:
+                    chara_ids.add(MSceneDetail["MMonsterId"])
+                    if bg_id := MSceneDetail.get("BackgroundImage"):
+                        bg_ids.add(bg_id)
+                    if bgm_name := MSceneDetail.get("BGM"):
+                        bgm_names.add(bgm_name)
+
+                for MRichSceneDetail in MScene.get("MRichSceneDetails") or []:
+                    for chara in MRichSceneDetail["Characters"]:
+                        chara_ids.add(chara["MMonsterId"])
+
+            keys += [self.add_chara_res(x) for x in chara_ids]
+            keys += [self.add_bg(x) for x in bg_ids]
+            keys += [self.add_bgm(x) for x in bgm_names]
+            keys.append(self.add_adventure_voice(MSceneId))
+            if MAdultId is not None:
+                keys.append(self.add_still_voice(MAdultId))
+
+        if MAdultId is not None:
+            keys.append(self.add_still_spine(MAdultId))
+            if MAdults is not None:
+                for x in MAdults["MAdultDetails"]:
+                    if x["BGM"] is not None:
+                        keys.append(self.add_bgm(x["BGM"]))
+
+        return [x for x in keys if x is not None]
+
+    async def plan_episode(self, MSceneId, MAdultId, Description):
+        MScenes = await self.GameApi.char.getMScenes(MSceneId)
+        if MScenes is None:
+            log.warning(f"角色需要 [{Description}]")
+            return []
 
-        if MAdults is not None:
-            await GameResApi.save_MAdults(
-                MAdultId, output_path, update_output_path, force_download
+        keys = [self.add_MScenes(MSceneId)]
+
+        MAdults = None
+        if MAdultId is not None:
+            MAdults = await self.GameApi.char.getMAdults(MAdultId)
+            if MAdults is None:
+                log.warning(f"获取MAdults[{MAdultId}]失败")
+                return keys
+            keys.append(self.add_MAdults(MAdultId))
+
+        return keys + self.add_scene_res(MSceneId, MAdultId, MScenes, MAdults)
+
+    async def plan_character(self, char_id, deps=None):
+        charInfo = await self.GameApi.char.getCharacterInfo(char_id)
+        if charInfo is None:
+            log.warning(f"获取角色信息失败: {char_id}")
+            return None
+        charName = charInfo["n"]
+        self.characters.append(char_id)
+
+        char_episodes = await self.GameApi.char.getCharacterEpisodes(char_id)
+
+        keys = [self.add_chara_res(char_id)]
+        keys += [self.add_stand_image(char_id + num) for num in range(charInfo["r"])]
+
+        episode_tasks = []
+        for episode in char_episodes["Episodes"]:
+            MSceneId = episode["MSceneId"]
+            MAdultId = episode["MAdultId"]
+
+            if MSceneId is None:
+                continue
+
+            if MAdultId == 0:
+                MAdultId = None
+
+            if not update_all_resources and MAdultId is None:
+                continue
+
+            episode_tasks.append(
+                self.plan_episode(MSceneId, MAdultId, episode["Description"])
             )
 
-    return res_special
+        for episode_keys in await asyncio.gather(*episode_tasks):
+            keys += episode_keys
+
+        async def finish_character():
+            # 剧情列表在其他资源完成后保存, 角色图标由 save_chara_icons 最后批量导出
+            for path in [self.output_path, self.update_output_path]:
+                if path is not None:
+                    VieableEpisodeFile = path / VieableEpisodeListPath / str(char_id)
+                    save_json(char_episodes["Episodes"], VieableEpisodeFile)
+
+        keys = list(dict.fromkeys([x for x in keys if x is not None] + list(deps or [])))
+        return self._add(
+            f"character/{char_id}", "角色", finish_character, deps=keys, name=charName
+        )
+
+    async def save_chara_icons(self, errors: dict) -> list[int]:
+        """
+        一次导出所有更新完成的角色图标, 返回图标仍然缺少的角色
+
+        本地角色列表来自图标, 所以只给没有失败的角色导出, 失败的角色下次重新检查
+        """
+        char_ids = [x for x in self.characters if f"character/{x}" not in errors]
+        if len(char_ids) == 0:
+            return []
+
+        await self.GameResApi.save_missing_chara_icons(
+            self.output_path, char_ids, self.force_download
+        )
+        icon_dir = self.output_path / CharacterIconPath
+        return [x for x in char_ids if not (icon_dir / f"{x}.png").exists()]
+
+    async def plan_specials(self, lg: LocalGame):
+        local_special = lg.getSpecial()
+        local_special_episodes = local_special["Episodes"]
+        local_flow_ids = {x["MSceneAdultFlowId"] for x in local_special_episodes}
+
+        res_special = []
+        keys = []
+        for special in self.GameApi.char.Specials:
+            title = special["Title"]
+            MSceneId = special["MSceneId"]
+            MAdultId = special["MAdultId"]
+
+            if not special["Viewable"]:
+                print(f"报酬({title})未解锁")
+                continue
+
+            if special["MSceneAdultFlowId"] in local_flow_ids:
+                continue
+
+            res_special.append(special)
+
+            MScenes = await self.GameApi.char.getMScenes(MSceneId)
+            MAdults = None
+            if MAdultId is not None:
+                MAdults = await self.GameApi.char.getMAdults(MAdultId)
+
+            keys += self.add_scene_res(MSceneId, MAdultId, MScenes, MAdults)
+            if MScenes is not None:
+                keys.append(self.add_MScenes(MSceneId))
+            if MAdults is not None:
+                keys.append(self.add_MAdults(MAdultId))
+
+        if len(res_special) == 0:
+            return None
+
+        async def finish_specials():
+            local_special["Episodes"] += res_special
+            lg.saveDataSpecial(local_special)
+            if self.update_output_path is not None:
+                lg.saveDataSpecial(local_special, self.update_output_path)
+
+        return self._add("specials", "报酬", finish_specials, deps=keys, resumable=False)
+
+
+async def load_manifest(GameApi: OtogiApi, AssetsVersion: int = None) -> dict[str, int]:
+    """获取 AssetBundlePatch 列表中的资源大小, 失败时返回空字典"""
+    try:
+        if AssetsVersion is None:
+            AssetsVersion = await GameApi.resource.getAssetsLastVersion()
+        return load_manifest_sizes(
+            await GameApi.resource.GetAssetBundlePatch(AssetsVersion)
+        )
+    except Exception as e:
+        log.warning(f"获取AssetBundle列表失败, 使用HEAD请求估算大小 ({e!r})")
+        return {}
 
 
 async def check_game_update(
@@ -361,11 +503,17 @@ async def check_game_update(
     output_path: Path = None,
     update_output_path: Path = None,
     force_download=False,
+    workers: int = None,
+    dry_run=False,
 ):
     if output_path is None:
         output_path = lg.game_root
 
+    if workers is None:
+        workers = plan_workers
+
     log.info(f"正在检查资源更新..")
+    res_coalescer.reset()
 
     local_ids = lg.getCharacterIDS()
     log.info(f"本地角色ID数量: {len(local_ids)}")
@@ -376,11 +524,11 @@ async def check_game_update(
     MMonstersData = await GameApi.char.getMMonstersData()
     MSpiritsData = await GameApi.char.getMSpiritsData()
 
-    save_json(MMonstersData, output_path / MasterDataPath / "MMonsters.json")
-    save_json(MSpiritsData, output_path / MasterDataPath / "MSpirits.json")
+    if not dry_run:
+        save_json(MMonstersData, output_path / MasterDataPath / "MMonsters.json")
+        save_json(MSpiritsData, output_path / MasterDataPath / "MSpirits.json")
 
-    log.info(f"正在初始化图标数据")
-    await init_chara_icon_cache(GameApi)
+    GameApi.char.setCharacterData(MMonstersData, MSpiritsData)
 
     log.info(f"正在获取可更新角色总数")
     game_ids = await GameApi.char.getUserCharacterIDS()
@@ -391,72 +539,56 @@ async def check_game_update(
     exclude_ids = [80831, 80261, 15111]
     diff_ids = [x for x in diff_ids if x not in exclude_ids]
 
-    log.info(f"正在获取购入报酬更新")
-    local_special = lg.getSpecial()
-    local_special_Episodes = local_special["Episodes"]
-    res_special = await save_specials(
-        GameApi, local_special_Episodes, output_path, update_output_path, force_download
-    )
-    if len(res_special) != 0:
-        local_special["Episodes"] += res_special
-        lg.saveDataSpecial(local_special)
-
-    log.info(f"检测到 [{len(diff_ids)}] 个角色需要更新")
-
-    for index, char_id in enumerate(diff_ids):
-        charInfo = await GameApi.char.getCharacterInfo(char_id)
-        if charInfo is None:
-            log.warning(f"获取角色信息失败: {char_id}")
-            continue
-        charName = charInfo["n"]
-
-        log.info(f"正在更新角色 [{charName}] ({index + 1}/{len(diff_ids)})")
+    log.info(f"检测到 [{len(diff_ids)}] 个角色需要更新, 正在生成更新计划")
+    planner = UpdatePlanner(GameApi, output_path, update_output_path, force_download)
+    icon_key = await planner.add_chara_icon_cache()
+    await planner.plan_specials(lg)
 
-        log.info(f"正在下载资源")
-        await save_chara_res(char_id, output_path, force_download=force_download)
+    semaphore = asyncio.Semaphore(max(workers, 1))
 
-        log.info(f"获取角色章节信息")
-        char_episodes = await GameApi.char.getCharacterEpisodes(char_id)
+    async def plan_character(char_id):
+        async with semaphore:
+            await planner.plan_character(char_id, deps=[icon_key])
 
-        VieableEpisodeFile = output_path / VieableEpisodeListPath / str(char_id)
-        save_json(char_episodes["Episodes"], VieableEpisodeFile)
-
-        for episode in char_episodes["Episodes"]:
-            MSceneId = episode["MSceneId"]
-            MAdultId = episode["MAdultId"]
-            Description = episode["Description"]
-
-            if MSceneId is None:
-                continue
-
-            if MAdultId == 0:
-                MAdultId = None
-
-            if not update_all_resources and MAdultId is None:
-                continue
-
-            log.info(f"正在下载章节资源: [{MSceneId} - {MAdultId}]")
-            await save_episode_res(
-                MSceneId,
-                MAdultId,
-                Description,
-                output_path,
-                update_output_path,
-                force_download,
-            )
-
-        request_res_task = [
-            FetchGameRes().save_chara_icon(char_id, output_path, force_download),
-            FetchGameRes().save_stand_image(char_id, output_path, force_download),
-        ]
-        await tqdm_asyncio.gather(*request_res_task)
-
-        if update_output_path is not None:
-            log.info(f"正在保存更新数据")
-            VieableEpisodeFile = (
-                update_output_path / VieableEpisodeListPath / str(char_id)
-            )
-            save_json(char_episodes["Episodes"], VieableEpisodeFile)
+    await tqdm_asyncio.gather(
+        *[plan_character(char_id) for char_id in diff_ids], desc="生成更新计划"
+    )
 
-            if len(res_special) != 0:
-                lg.saveDataSpecial(local_special, update_output_path)
+    plan = planner.plan
+    try:
+        AssetsVersion = await GameApi.resource.getAssetsLastVersion()
+    except Exception as e:
+        log.warning(f"获取资源版本失败 ({e!r})")
+        AssetsVersion = None
+
+    journal = UpdateJournal(
+        UpdateJournalPath,
+        {
+            "output_path": str(output_path),
+            "update_output_path": str(update_output_path or ""),
+            "force_download": force_download,
+            "assets_version": AssetsVersion,
+        },
+    ).load()
+    if journal.resumed:
+        log.info(f"跳过上次中断前已完成的任务: {plan.discard_completed(journal)}")
+
+    await plan.estimate_sizes(GameApi, await load_manifest(GameApi, AssetsVersion))
+    plan.log_summary()
+
+    if dry_run:
+        return plan
+
+    log.info(f"同时执行 [{update_task_workers}] 个更新任务")
+    errors = await plan.execute(update_task_workers, journal=journal)
+    missing_icons = await planner.save_chara_icons(errors)
+    if len(missing_icons) > 0:
+        log.warning(f"保存角色图标失败: {missing_icons}")
+    # 更新正常结束后不再续用记录, 失败的任务下次由更新计划重新检查
+    journal.finish()
+    if len(errors) > 0:
+        log.warning(f"[{len(errors)}] 个任务失败, 请重新运行更新")
+
+    coalesce_info = res_coalescer.info()
+    log.debug(f"合并重复资源请求: {coalesce_info['hits']}, 实际请求: {coalesce_info['misses']}")
+    return plan
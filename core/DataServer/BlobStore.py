@@ -0,0 +1,127 @@
+import os
+import re
+import hashlib
+
+from pathlib import Path
+
+from utils import AtomicFileWriter, log
+
+HASH_ALGORITHMS = {32: "md5", 40: "sha1", 64: "sha256"}
+
+
+def manifest_hash(value) -> str | None:
+    """取出 hash_data 中文件对应的 hash, 目录或未知格式返回 None"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        for key in ("hash", "md5", "sha1", "sha256"):
+            if isinstance(value.get(key), str):
+                return value[key]
+    return None
+
+
+def content_hash_matches(data: bytes, expected: str) -> bool | None:
+    """按 hash 长度推断算法校验内容, 无法推断算法时返回 None"""
+    expected = expected.lower()
+    algorithm = HASH_ALGORITHMS.get(len(expected))
+    if algorithm is None:
+        return None
+
+    if hashlib.new(algorithm, data).hexdigest() == expected:
+        return True
+
+    if algorithm == "sha1":
+        # git 的 blob hash
+        header = f"blob {len(data)}\0".encode()
+        return hashlib.sha1(header + data).hexdigest() == expected
+
+    return False
+
+
+class BlobStore:
+    """
+    以内容 hash 为 key 的本地文件缓存
+
+    超过 max_size 时按最近使用时间淘汰, verify 为 True 时每次读取都重新校验内容
+    """
+
+    def __init__(self, root: Path, max_size: int, verify: bool = False):
+        self.root = root
+        self.max_size = max_size
+        self.verify = verify
+        self._total_size: int = None
+
+    def _path(self, key: str) -> Path | None:
+        key = key.lower()
+        if not re.fullmatch(r"[0-9a-z]{8,128}", key):
+            return None
+        return self.root / key[:2] / key
+
+    def _scan(self):
+        for sub_dir in self.root.iterdir() if self.root.exists() else []:
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    yield entry
+
+    @property
+    def total_size(self) -> int:
+        if self._total_size is None:
+            self._total_size = sum(entry.stat().st_size for entry in self._scan())
+        return self._total_size
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+
+        data = path.read_bytes()
+        if self.verify and content_hash_matches(data, key) is False:
+            log.warning(f"缓存文件校验失败, 已删除: {path.name}")
+            self._remove(path)
+            return None
+
+        # 更新修改时间, 淘汰时按最近使用排序
+        os.utime(path)
+        return data
+
+    def put(self, key: str, data: bytes) -> bool:
+        path = self._path(key)
+        if path is None:
+            return False
+
+        if content_hash_matches(data, key) is False:
+            # 镜像返回的文件和 hash 不一致时不缓存
+            return False
+
+        total_size = self.total_size
+        if path.exists():
+            total_size -= path.stat().st_size
+        with AtomicFileWriter(path, buffer_size=64 * 1024) as f:
+            f.write(data)
+        self._total_size = total_size + len(data)
+
+        if self._total_size > self.max_size:
+            self.evict()
+        return True
+
+    def _remove(self, path: Path):
+        size = path.stat().st_size
+        path.unlink()
+        if self._total_size is not None:
+            self._total_size -= size
+
+    def evict(self, target_size: int = None):
+        """删除最久未使用的文件, 直到总大小低于 target_size (默认 max_size 的 90%)"""
+        if target_size is None:
+            target_size = int(self.max_size * 0.9)
+
+        entries = sorted(self._scan(), key=lambda x: x.stat().st_mtime)
+        total_size = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if total_size <= target_size:
+                break
+            total_size -= entry.stat().st_size
+            os.unlink(entry.path)
+        self._total_size = total_size
@@ -2,10 +2,12 @@ import time
 import asyncio
 import ujson as json
 
-from aiohttp import ClientSession, ClientTimeout
+from aiohttp import ClientTimeout
 from tenacity import retry, stop_after_attempt, wait_fixed, RetryCallState, _utils
 
-from utils import log
+from pathlib import Path
+
+from utils import log, SessionPool, AdaptiveLimiter, AtomicFileWriter
 from config import http_proxy, use_github_mirror
 
 
@@ -51,12 +53,14 @@ class GitHubFileFetcher:
 
         async def fetch_proxy_url(prox_info):
             start_time = time.time()
-            async with ClientSession(timeout=ClientTimeout(total=5)) as session:
-                try:
-                    async with session.options(prox_info["url"]) as response:
-                        return time.time() - start_time, prox_info
-                except Exception as e:
-                    return None
+            session = SessionPool.get(prox_info["url"])
+            try:
+                async with session.options(
+                    prox_info["url"], timeout=ClientTimeout(total=5)
+                ) as response:
+                    return time.time() - start_time, prox_info
+            except Exception as e:
+                return None
 
         tasks = [fetch_proxy_url(prox_info) for prox_info in github_prox_list]
         results = await asyncio.gather(*tasks)
@@ -84,11 +88,18 @@ class GitHubFileFetcher:
             "Authorization": f"token {self.auth_token}",
         }
 
-        async with ClientSession(timeout=ClientTimeout(total=2 * 60)) as session:
-            async with session.request("GET", url, headers=headers, proxy=self.http_proxy) as response:
-                if response.status != 200:
-                    return None
-                return await response.text()
+        session = SessionPool.get(url)
+        async with AdaptiveLimiter.get(url).slot() as slot, session.request(
+            "GET",
+            url,
+            headers=headers,
+            proxy=self.http_proxy,
+            timeout=ClientTimeout(total=2 * 60),
+        ) as response:
+            slot.record(response.status)
+            if response.status != 200:
+                return None
+            return await response.text()
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(1), before=retry_log)
     async def fetch_binary(
@@ -104,20 +115,107 @@ class GitHubFileFetcher:
             "Authorization": f"token {self.auth_token}",
         }
 
-        async with ClientSession(timeout=ClientTimeout(total=2 * 60)) as session:
-            async with session.request("GET", url, headers=headers, proxy=self.http_proxy) as response:
-                if response.status != 200:
-                    return None
+        session = SessionPool.get(url)
+        async with AdaptiveLimiter.get(url).slot() as slot, session.request(
+            "GET",
+            url,
+            headers=headers,
+            proxy=self.http_proxy,
+            timeout=ClientTimeout(total=2 * 60),
+        ) as response:
+            slot.record(response.status)
+            if response.status != 200:
+                return None
+
+            if chunk_handler is not None:
+                data_len = int(response.headers.get("Content-Length", 0))
+                data = bytearray()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    chunk_handler(chunk, data_len)
+                    data += chunk
+                return bytes(data)
+            else:
+                return await response.read()
+
+    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1), before=retry_log)
+    async def fetch_binary_conditional(
+        self,
+        file_name,
+        etag: str = None,
+        last_modified: str = None,
+        chunk_handler: callable = None,
+        chunk_size: int = 64 * 1024,
+    ):
+        """
+        条件请求, 返回 (status, data, headers)
+        文件未变化时 status 为 304, data 为 None
+        """
+        baseUrl = await self.get_github_file_url()
 
+        url = baseUrl + file_name
+        headers = {
+            "Authorization": f"token {self.auth_token}",
+        }
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        session = SessionPool.get(url)
+        async with AdaptiveLimiter.get(url).slot() as slot, session.request(
+            "GET",
+            url,
+            headers=headers,
+            proxy=self.http_proxy,
+            timeout=ClientTimeout(total=2 * 60),
+        ) as response:
+            slot.record(response.status)
+            if response.status != 200:
+                return response.status, None, response.headers
+
+            data_len = int(response.headers.get("Content-Length", 0))
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(chunk_size):
                 if chunk_handler is not None:
-                    data_len = int(response.headers.get("Content-Length", 0))
-                    data = b""
-                    async for chunk in response.content.iter_chunked(chunk_size):
+                    chunk_handler(chunk, data_len)
+                data += chunk
+            return response.status, bytes(data), response.headers
+
+    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1), before=retry_log)
+    async def fetch_to_file(
+        self,
+        file_name,
+        output_file: Path,
+        chunk_handler: callable = None,
+        chunk_size: int = 64 * 1024,
+    ) -> bool:
+        """流式下载到文件, 写完后原子替换, 返回是否成功"""
+        baseUrl = await self.get_github_file_url()
+
+        url = baseUrl + file_name
+        headers = {
+            "Authorization": f"token {self.auth_token}",
+        }
+
+        session = SessionPool.get(url)
+        async with AdaptiveLimiter.get(url).slot() as slot, session.request(
+            "GET",
+            url,
+            headers=headers,
+            proxy=self.http_proxy,
+            timeout=ClientTimeout(total=2 * 60),
+        ) as response:
+            slot.record(response.status)
+            if response.status != 200:
+                return False
+
+            data_len = int(response.headers.get("Content-Length", 0))
+            with AtomicFileWriter(output_file) as writer:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    if chunk_handler is not None:
                         chunk_handler(chunk, data_len)
-                        data += chunk
-                    return data
-                else:
-                    return await response.read()
+                    writer.write(chunk)
+            return True
 
 
 async def main():
@@ -129,6 +227,7 @@ async def main():
     file_name = "VieableEpisodeList/19931"
     data = await file_fetcher.fetch_json(file_name)
     print(data)
+    await SessionPool.close_all()
 
 
 if __name__ == "__main__":
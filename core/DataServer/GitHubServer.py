@@ -1,58 +1,62 @@
 import gzip
+import pickle
+import asyncio
 import ujson as json
 
 from pathlib import Path
 from tqdm import tqdm
 
-from utils import AsyncCache, save_json
+from utils import AsyncCache, AtomicFileWriter, log
 
 from .GitHubFileFetcher import GitHubFileFetcher
+from .BlobStore import BlobStore, manifest_hash
 
-from config import resource_repo, resource_branch, resource_token
-
-
-async def save_server_json(semaphore, file_name, server_path: str, output_path: Path):
-    res_server = GitHubServer()
-    async with semaphore:
-        res = await res_server.fetch_json(f"{server_path}{file_name}")
-        save_json(res, output_path / str(file_name))
+from config import (
+    resource_repo,
+    resource_branch,
+    resource_token,
+    HashSnapshotPath,
+    BlobCachePath,
+    blob_cache_max_size,
+    verify_blob_cache,
+)
 
 
 async def save_server_binary(
-    semaphore,
     file_name,
     server_path: str,
     output_path: Path,
     chunk_handler: callable = None,
-    chunk_size: int = 1024,
+    chunk_size: int = 64 * 1024,
 ):
     res_server = GitHubServer()
-    async with semaphore:
-        res = await res_server.fetch_binary(
-            f"{server_path}{file_name}", chunk_handler, chunk_size
-        )
-        with (output_path / str(file_name)).open("wb") as f:
-            f.write(res)
+    return await res_server.fetch_to_file(
+        f"{server_path}{file_name}",
+        output_path / str(file_name),
+        chunk_handler,
+        chunk_size,
+    )
 
 
 def str_path_to_dict(raw_data):
+    """把 "a\\b\\c": value 形式的扁平路径一次遍历构建为嵌套字典"""
     data = {}
     for key, value in raw_data.items():
-        if "\\" in key:
-            path, sub_key = key.split("\\", 1)
-            if path not in data:
-                data[path] = {}
-
-            data[path] = str_path_to_dict({**data[path], **{sub_key: value}})
-
-        else:
-            data[key] = value
+        *dirs, name = key.split("\\")
+        node = data
+        for path in dirs:
+            child = node.get(path)
+            if not isinstance(child, dict):
+                child = node[path] = {}
+            node = child
+        node[name] = value
     return data
 
 
 class GitHubServer(GitHubFileFetcher):
     _instance = None
     hash_data: dict = None
+    _init_lock: asyncio.Lock = None
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
@@ -62,13 +66,51 @@ class GitHubServer(GitHubFileFetcher):
     def __init__(self):
         if not hasattr(self, "_initialized"):
             super().__init__(resource_repo, resource_branch, resource_token, proxy=True)
+            self.blob_store = BlobStore(
+                BlobCachePath, blob_cache_max_size, verify_blob_cache
+            )
             self._initialized = True
 
+    def load_snapshot(self):
+        """读取本地保存的 hash 数据, 仓库或分支变化时忽略"""
+        if not HashSnapshotPath.exists():
+            return None
+        try:
+            with HashSnapshotPath.open("rb") as f:
+                snapshot = pickle.load(f)
+        except Exception:
+            log.warning("本地 hash 数据损坏, 重新获取")
+            return None
+
+        if snapshot.get("repo") != self.repo or snapshot.get("branch") != self.branch:
+            return None
+        return snapshot
+
+    def save_snapshot(self, etag, last_modified):
+        snapshot = {
+            "repo": self.repo,
+            "branch": self.branch,
+            "etag": etag,
+            "last_modified": last_modified,
+            "hash_data": self.hash_data,
+        }
+        with AtomicFileWriter(HashSnapshotPath) as f:
+            f.write(pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+
     async def init(self):
         if self.hash_data is not None:
             return
 
+        if self._init_lock is None:
+            self._init_lock = asyncio.Lock()
+
+        async with self._init_lock:
+            if self.hash_data is None:
+                await self._init()
+
+    async def _init(self):
         path = "hash.json.gz"
+        snapshot = self.load_snapshot() or {}
 
         pbar = tqdm(
             desc="Fetching server data", unit="B", unit_scale=True, unit_divisor=1024
@@ -78,9 +120,48 @@ class GitHubServer(GitHubFileFetcher):
             pbar.total = data_len
             pbar.update(len(chunk))
 
-        raw_data = await self.fetch_binary(path, chunk_handler=chunk_handler)
+        status, raw_data, headers = await self.fetch_binary_conditional(
+            path,
+            snapshot.get("etag"),
+            snapshot.get("last_modified"),
+            chunk_handler=chunk_handler,
+        )
+        pbar.close()
+
+        if raw_data is None and "hash_data" in snapshot:
+            if status != 304:
+                log.warning(f"获取服务器数据失败 ({status}), 使用本地缓存")
+            self.hash_data = snapshot["hash_data"]
+            return
+
         raw_data = json.loads(gzip.decompress(raw_data))
         self.hash_data = str_path_to_dict(raw_data)
+        self.save_snapshot(headers.get("ETag"), headers.get("Last-Modified"))
+
+    def file_hash(self, file_name: str) -> str | None:
+        """获取服务器文件在 hash_data 中的 hash"""
+        node = self.hash_data
+        for path in file_name.split("/"):
+            if not isinstance(node, dict):
+                return None
+            node = node.get(path)
+        return manifest_hash(node)
+
+    async def fetch_text(self, file_name):
+        """hash 没有变化的文件直接从本地缓存读取"""
+        await self.init()
+        file_hash = self.file_hash(file_name)
+        if file_hash is None:
+            return await super().fetch_text(file_name)
+
+        data = self.blob_store.get(file_hash)
+        if data is None:
+            data = await self.fetch_binary(file_name)
+            if data is None:
+                return None
+            self.blob_store.put(file_hash, data)
+
+        return data.decode("utf-8")
 
     @AsyncCache()
     async def getSpecials(self):
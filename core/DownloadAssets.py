@@ -0,0 +1,210 @@
+import os
+import mmap
+import asyncio
+import hashlib
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from tqdm.asyncio import tqdm_asyncio
+
+from utils import (
+    log,
+    parse_csv_from_string,
+    file_size_format,
+    load_json,
+    save_json,
+    AtomicFileWriter,
+)
+
+from core.OtogiFrontier import OtogiApi
+
+# 上次同步完成的 AssetBundlePatch 列表, 保存在素材目录下
+AssetPatchFileName = ".asset_patch.csv"
+# 已校验文件的 (size, mtime, md5), 文件没有变化时不再重新计算
+AssetVerifyFileName = ".asset_verify.json"
+# 加密资源 (AES-CBC) 的块大小
+AES_BLOCK_SIZE = 16
+
+
+def load_patch(csv_content: str):
+    """解析 AssetBundlePatch 列表为 {url_path: (md5, size)}"""
+    return {url_path: (md5, size) for url_path, md5, size in parse_csv_from_string(csv_content)}
+
+
+def load_applied_patch(out_path: Path):
+    path = out_path / AssetPatchFileName
+    if not path.exists():
+        return None
+    return load_patch(path.read_text(encoding="utf-8"))
+
+
+def save_applied_patch(out_path: Path, patch: dict):
+    lines = ["url_path,md5,size"]
+    lines += [f"{url_path},{md5},{size}" for url_path, (md5, size) in patch.items()]
+    with AtomicFileWriter(out_path / AssetPatchFileName) as f:
+        f.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def is_encrypted(url_path: str) -> bool:
+    return url_path.startswith("chara/still/")
+
+
+def local_size_matches(url_path: str, local_size: int, size: int) -> bool:
+    """
+    本地文件大小是否和列表一致
+
+    加密资源本地保存的是解密并去掉 PKCS7 填充 (1-16 字节) 后的内容, 比列表中的大小小
+    """
+    if is_encrypted(url_path):
+        return size - AES_BLOCK_SIZE <= local_size < size
+    return local_size == size
+
+
+def diff_patch(old_patch: dict | None, new_patch: dict, out_path: Path):
+    """
+    对比上次同步的列表和最新列表, 返回 (新增, 有修改, 已删除) 的 url_path
+
+    本地文件缺失或大小不一致时也会重新下载
+    没有上次的记录时, 本地大小一致的文件视为已同步
+    """
+    added, changed = [], []
+    for url_path, (md5, size) in new_patch.items():
+        file_path = out_path / url_path
+        if not file_path.exists() or not local_size_matches(
+            url_path, file_path.stat().st_size, size
+        ):
+            if old_patch is not None and url_path in old_patch:
+                changed.append(url_path)
+            else:
+                added.append(url_path)
+        elif old_patch is not None and url_path in old_patch and old_patch[url_path][0] != md5:
+            changed.append(url_path)
+
+    removed = [] if old_patch is None else [x for x in old_patch if x not in new_patch]
+    return added, changed, removed
+
+
+def file_md5(path: Path) -> str:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.md5().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return hashlib.md5(mm).hexdigest()
+
+
+def verify_entry(out_path: Path, url_path: str, md5: str, size: int, cached):
+    """校验单个文件, 返回 (是否一致, 缓存记录)"""
+    file_path = out_path / url_path
+    try:
+        stat = file_path.stat()
+    except FileNotFoundError:
+        return False, None
+
+    if stat.st_size != size:
+        return False, None
+
+    if cached is not None and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        file_hash = cached[2]
+    else:
+        file_hash = file_md5(file_path)
+    return file_hash == md5.lower(), [stat.st_size, stat.st_mtime_ns, file_hash]
+
+
+async def verify_assets(out_path: Path, patch: dict, workers: int = None):
+    """
+    并行校验本地文件的 md5, 返回不一致的 url_path
+
+    hashlib 计算时会释放 GIL, 用线程池即可利用多核
+    加密资源本地保存的是解密后的内容, 和列表中的 md5 不一致, 不做校验
+    """
+    index_path = out_path / AssetVerifyFileName
+    index = load_json(index_path) if index_path.exists() else {}
+
+    entries = [
+        (url_path, md5, size)
+        for url_path, (md5, size) in patch.items()
+        if not is_encrypted(url_path)
+    ]
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        tasks = [
+            loop.run_in_executor(
+                executor, verify_entry, out_path, url_path, md5, size, index.get(url_path)
+            )
+            for url_path, md5, size in entries
+        ]
+        results = await tqdm_asyncio.gather(*tasks, desc="校验资源")
+
+    mismatched = []
+    new_index = {}
+    for (url_path, _, _), (ok, record) in zip(entries, results):
+        if record is not None:
+            new_index[url_path] = record
+        if not ok:
+            mismatched.append(url_path)
+    save_json(new_index, index_path)
+    return mismatched
+
+
+async def download_assets(GameApi: OtogiApi, url_paths, out_path: Path):
+    """下载资源, 返回下载成功的 url_path, 并发数由 AdaptiveLimiter 按主机自动调整"""
+
+    async def download_one(url_path):
+        try:
+            return await GameApi.resource.saveAssetsFromPath(url_path, out_path / url_path)
+        except Exception as e:
+            log.warning(f"下载失败: {url_path} ({e!r})")
+            return False
+
+    tasks = [download_one(url_path) for url_path in url_paths]
+    results = await tqdm_asyncio.gather(*tasks, desc="下载资源")
+    return [url_path for url_path, ok in zip(url_paths, results) if ok]
+
+
+async def sync_all_assets(
+    GameApi: OtogiApi, out_path: Path, verify=False
+):
+    AssetsVersion = await GameApi.resource.getAssetsLastVersion()
+
+    log.info(f"正在获取AssetBundle列表 版本号:[{AssetsVersion}]")
+    AssetBundlePatch = await GameApi.resource.GetAssetBundlePatch(AssetsVersion)
+
+    out_path.mkdir(parents=True, exist_ok=True)
+    new_patch = load_patch(AssetBundlePatch.decode())
+    old_patch = load_applied_patch(out_path)
+
+    added, changed, removed = diff_patch(old_patch, new_patch, out_path)
+    log.info(f"资源总数: {len(new_patch)}, 新增: {len(added)}, 更新: {len(changed)}, 已删除: {len(removed)}")
+
+    url_paths = added + changed
+    if verify:
+        pending = set(url_paths)
+        mismatched = [x for x in await verify_assets(out_path, new_patch) if x not in pending]
+        log.info(f"校验不一致: {len(mismatched)}")
+        url_paths += mismatched
+
+    total_size = sum(size for _, size in new_patch.values())
+    fetch_size = sum(new_patch[x][1] for x in url_paths)
+    log.info(f"需要下载: {file_size_format(fetch_size)}, 跳过未变化的资源: {file_size_format(total_size - fetch_size)}")
+
+    done = set()
+    try:
+        if len(url_paths) > 0:
+            done.update(await download_assets(GameApi, url_paths, out_path))
+    finally:
+        # 下载失败的资源保留上次的记录, 下次同步时重试
+        fetched = set(url_paths)
+        applied = {}
+        for url_path, entry in new_patch.items():
+            if url_path not in fetched or url_path in done:
+                applied[url_path] = entry
+            elif old_patch is not None and url_path in old_patch:
+                applied[url_path] = old_patch[url_path]
+        save_applied_patch(out_path, applied)
+
+    failed = len(url_paths) - len(done)
+    if failed > 0:
+        log.warning(f"{failed} 个资源下载失败, 请重新运行")
+    return failed == 0
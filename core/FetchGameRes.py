@@ -1,9 +1,7 @@
-import UnityPy
-
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from tqdm import tqdm
-from utils import log, save_json, UnityEnv
+from utils import log, save_json, ProcessPool, AtomicDirectory, Error_Message
 
 from FileDataPath import (
     CharacterIconPath,
@@ -16,10 +14,28 @@ from FileDataPath import (
     ZH_MAdultsPath,
 )
 
-from config import http_proxy, CharaIconPath
+from config import http_proxy, BundleCachePath
 
 from core.OtogiFrontier import OtogiApi
 from core.FixHomeStandImage import FixHomeStandImage
+from core.CharaIconIndex import CharaIconIndex
+from core import UnityExtractor
+
+
+@asynccontextmanager
+async def fetch_bundle(GameApi: OtogiApi, url_path: str):
+    """
+    把资源包流式下载到缓存目录, 进程池按文件路径解包, 解包后删除
+
+    下载中断时保留 .part 文件, 下次更新从断点继续
+    """
+    bundle_path = BundleCachePath / url_path
+    if not await GameApi.resource.saveAssetsFromPath(url_path, bundle_path):
+        raise Error_Message(f"下载资源失败: {url_path}")
+    try:
+        yield bundle_path
+    finally:
+        bundle_path.unlink(missing_ok=True)
 
 
 class FetchGameRes:
@@ -28,105 +44,55 @@ class FetchGameRes:
     def __init__(self, GameApi: OtogiApi = None):
         self.GameApi = GameApi or OtogiApi(proxy=http_proxy)
 
-    async def save_chara_icon(self, char_id, save_path: Path, force_download=False):
-        icon_path = save_path / CharacterIconPath
-        icon_path.mkdir(parents=True, exist_ok=True)
-        icon_path = icon_path / f"{char_id}.png"
-        if not icon_path.exists() or force_download:
-            CharaIcon = UnityPy.load(CharaIconPath.read_bytes())
-            pbar = tqdm(CharaIcon.objects, desc="保存角色图标")
-            for obj in pbar:
-                if obj.type.name == "Sprite":
-                    data = obj.read()
-                    if data.name == str(char_id):
-                        data.image.save(icon_path)
-                        pbar.close()
-                        return True
-        return False
-
-    async def save_stand_image(self, char_id, save_path: Path, force_download=False):
-        charInfo = await self.GameApi.char.getCharacterInfo(char_id)
-        if charInfo is None:
-            return False
-
-        standimage_path = save_path / StandimagePath
-        pbar = tqdm(range(0, charInfo["r"]), desc="保存立绘")
-
-        for num in pbar:
-            img_id = char_id + num
-            standimage_img_path = standimage_path / f"{img_id}.png"
-            if not standimage_img_path.exists() or force_download:
-                standimage_img_path.parent.mkdir(parents=True, exist_ok=True)
-                standimage_data = (
-                    await self.GameApi.resource.getCharacterStandImageLarge(img_id)
+    async def save_missing_chara_icons(
+        self, save_path: Path, char_ids=None, force_download=False
+    ):
+        """一次导出所有缺少的角色图标"""
+        return await CharaIconIndex().save_missing_icons(
+            save_path / CharacterIconPath, char_ids, force_download
+        )
+
+    async def save_stand_image_file(self, img_id, save_path: Path, force_download=False):
+        standimage_img_path = save_path / StandimagePath / f"{img_id}.png"
+        if not standimage_img_path.exists() or force_download:
+            async with fetch_bundle(
+                self.GameApi, f"chara/standimagelarge/{img_id}"
+            ) as bundle_path, AtomicDirectory(
+                standimage_img_path.parent, merge=True, tag=str(img_id)
+            ) as temp_path:
+                await ProcessPool.run(
+                    UnityExtractor.extract_textures_to_file,
+                    bundle_path,
+                    temp_path / standimage_img_path.name,
                 )
-                standimage_env = UnityPy.load(standimage_data)
-                for obj in standimage_env.objects:
-                    if obj.type.name == "Texture2D":
-                        data = obj.read()
-                        data.image.save(standimage_img_path)
-        pbar.close()
-        return True
+            return True
+        return False
 
     async def save_chara_stand(self, char_id, save_path: Path, force_download=False):
         CharaStand_path = save_path / CharaStandPath / str(char_id)
         if not CharaStand_path.exists() or force_download:
-            CharaStand_path.mkdir(parents=True, exist_ok=True)
-            CharaStand_data = await self.GameApi.resource.getCharacterStand(char_id)
-            CharaStand_env = UnityPy.load(CharaStand_data)
-            # pbar = tqdm(CharaStand_env.objects, desc="保存剧情立绘")
-
-            for obj in CharaStand_env.objects:
-                if obj.byte_size < 600:
-                    continue
-
-                if obj.type.name == "Sprite":
-                    data = obj.read()
-                    data.image.save(CharaStand_path / f"{data.name}.png")
-
-                if obj.type.name == "Texture2D":
-                    data = obj.read()
-                    data_name = data.name
-                    if data_name.startswith("sactx-"):
-                        continue
-                    if data_name.isdigit():
-                        data_name = "body"
-
-                    data.image.save(CharaStand_path / f"{data_name}.png")
-            # pbar.close()
+            async with fetch_bundle(
+                self.GameApi, f"chara/stand/{char_id}"
+            ) as bundle_path, AtomicDirectory(CharaStand_path) as temp_path:
+                await ProcessPool.run(UnityExtractor.extract_stand, bundle_path, temp_path)
             return True
         return False
 
     async def save_home_stand(self, char_id, save_path: Path, force_download=False):
         homestand_path = save_path / HomeStandPath / str(char_id)
         if not homestand_path.exists() or force_download:
-            homestand_path.mkdir(parents=True, exist_ok=True)
-            homestand_data = await self.GameApi.resource.getCharacterHomestand(char_id)
-            homestand_env = UnityPy.load(homestand_data)
-
-            # pbar = tqdm(homestand_env.objects, desc="保存剧情立绘2")
-            for obj in homestand_env.objects:
-                if obj.byte_size < 600:
-                    continue
-
-                if obj.type.name == "Sprite":
-                    data = obj.read()
-                    if data.name == "_stand1":
-                        continue
-
-                    data.image.save(homestand_path / f"{data.name}.png")
-
-                if obj.type.name == "Texture2D":
-                    data = obj.read()
-                    data_name = data.name
-                    if data_name.startswith("sactx-"):
-                        continue
-                    if data_name.isdigit():
-                        data_name = "body"
-
-                    data.image.save(homestand_path / f"{data_name}.png")
-            # pbar.close()
-            await FixHomeStandImage(save_path / HomeStandPath, char_id).fix()
+            async with fetch_bundle(
+                self.GameApi, f"chara/homestand/{char_id}"
+            ) as bundle_path, AtomicDirectory(homestand_path) as temp_path:
+                await ProcessPool.run(
+                    UnityExtractor.extract_stand,
+                    bundle_path,
+                    temp_path,
+                    ("_stand1",),
+                )
+                await FixHomeStandImage(
+                    save_path / HomeStandPath, char_id, chara_path=temp_path
+                ).fix()
             return True
         return False
 
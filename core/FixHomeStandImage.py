@@ -1,23 +1,29 @@
+import numpy as np
+
 from pathlib import Path
 
 from PIL import Image
 
-from lib.flowery.flowery import Imager
+from lib.flowery.flowery import ExecutorRegistry
 
 from core.DataServer.GitHubServer import GitHubServer
+from core.UnityExtractor import save_image
 
 
 class FixHomeStandImage:
     root_path: Path
     char_id: str
+    chara_path: Path
     request: GitHubServer
     homestand_fix = None
     homestand_name = None
     homestand_no_fix = [21971, 22161]
 
-    def __init__(self, root_path: Path, char_id):
+    def __init__(self, root_path: Path, char_id, chara_path: Path = None):
         self.root_path = root_path
         self.char_id = str(char_id)
+        # 立绘所在目录, 默认是 root_path/char_id, 导出到临时目录时单独指定
+        self.chara_path = chara_path or root_path / self.char_id
         self.request = GitHubServer()
 
     async def init(self):
@@ -35,33 +41,58 @@ class FixHomeStandImage:
         if pos is None:
             return
 
-        chara_path = self.root_path / self.char_id
+        chara_path = self.chara_path
         if not chara_path.exists():
             return
 
-        base_im = Image.open(chara_path / "idle.png")
+        await ExecutorRegistry.run("image", self.fix_images, chara_path, pos)
+
+    def fix_images(self, chara_path: Path, pos: dict):
+        """idle/body 只读取一次尺寸, 所有表情差分依次放到 body 大小的透明画布上"""
+        # Image.open 只读取文件头, 尺寸不需要解码整张图
+        with Image.open(chara_path / "idle.png") as base_im:
+            base_size = base_im.size
+        with Image.open(chara_path / "body.png") as body_im:
+            body_size = body_im.size
 
         for name in self.homestand_name:
             im_path = chara_path / f"{name}.png"
             if not im_path.exists():
                 continue
 
-            body_im = Image.open(chara_path / "body.png")
-            overlay = Image.open(im_path)
-
-            if body_im.size == overlay.size:
-                continue
-
-            if self.char_id in ["21491"]:
-                base_x = base_im.size[0] - overlay.size[0]
-                base_y = base_im.size[1] - overlay.size[1]
-                x = pos["x"] + base_x
-                y = pos["y"] + base_y
-            else:
-                x = pos["x"]
-                y = pos["y"]
-
-            ima = Imager(Image.new("RGBA", body_im.size, (0, 0, 0, 0)))
-            overlay_ima = Imager(overlay)
-            await ima.paste(overlay_ima, (x, y))
-            await ima.save(im_path)
+            with Image.open(im_path) as overlay:
+                if overlay.size == body_size:
+                    continue
+
+                if self.char_id in ["21491"]:
+                    x = pos["x"] + base_size[0] - overlay.size[0]
+                    y = pos["y"] + base_size[1] - overlay.size[1]
+                else:
+                    x = pos["x"]
+                    y = pos["y"]
+
+                image = place_overlay(body_size, overlay, (x, y))
+            save_image(image, im_path)
+
+
+def place_overlay(size: tuple[int, int], overlay: Image.Image, pos: tuple[int, int]):
+    """
+    把 overlay 放到 size 大小的透明画布的 pos 位置, 超出画布的部分裁掉
+
+    结果与在透明画布上 alpha_composite 相同, 但只需要一次数组切片赋值
+    """
+    src = np.asarray(overlay.convert("RGBA"))
+    width, height = size
+    canvas = np.zeros((height, width, 4), dtype=np.uint8)
+
+    x, y = pos
+    src_x, src_y = max(-x, 0), max(-y, 0)
+    dst_x, dst_y = max(x, 0), max(y, 0)
+    w = min(src.shape[1] - src_x, width - dst_x)
+    h = min(src.shape[0] - src_y, height - dst_y)
+    if w > 0 and h > 0:
+        region = src[src_y : src_y + h, src_x : src_x + w]
+        # alpha_composite 的结果中完全透明的像素颜色为 0
+        canvas[dst_y : dst_y + h, dst_x : dst_x + w] = region * (region[..., 3:] > 0)
+
+    return Image.fromarray(canvas, "RGBA")
@@ -1,4 +1,3 @@
-import asyncio
 from pathlib import Path
 
 from tqdm.asyncio import tqdm_asyncio
@@ -6,12 +5,54 @@ from tqdm.asyncio import tqdm_asyncio
 from utils import log
 
 from core.DataServer.GitHubServer import GitHubServer, save_server_binary
+from core.DataServer.BlobStore import manifest_hash, content_hash_matches
 from core.LocalGame import LocalGame
 
-async def download(names, server_path, output_path, download_num=20):
-    semaphore = asyncio.Semaphore(download_num)
-    tasks = [save_server_binary(semaphore, name, server_path, output_path) for name in names]
-    await tqdm_asyncio.gather(*tasks)
+# 服务器上的离线版入口, 安装后重命名为 index.html
+OFFLINE_INDEX = "启动离线版.html"
+
+
+def flatten_hash_tree(tree: dict, prefix=""):
+    """把 hash_data 中的目录展开为 {"js/app.js": hash}"""
+    files = {}
+    for name, value in tree.items():
+        path = f"{prefix}{name}"
+        if isinstance(value, dict) and manifest_hash(value) is None:
+            files.update(flatten_hash_tree(value, f"{path}/"))
+        else:
+            files[path] = manifest_hash(value)
+    return files
+
+
+def local_name(name: str):
+    return "index.html" if name == OFFLINE_INDEX else name
+
+
+def is_up_to_date(path: Path, server_hash: str, local_hash: str):
+    if server_hash is None or not path.exists():
+        return False
+
+    matches = content_hash_matches(path.read_bytes(), server_hash)
+    if matches is None:
+        # 无法识别的 hash 格式, 只能对比上次安装的记录
+        return local_hash == server_hash
+    return matches
+
+
+async def download(names, server_path, output_path):
+    """下载文件, 返回下载成功的文件名, 并发数由 AdaptiveLimiter 按主机自动调整"""
+
+    async def download_one(name):
+        try:
+            return await save_server_binary(name, server_path, output_path)
+        except Exception as e:
+            log.warning(f"下载失败: {server_path}{name} ({e!r})")
+            return False
+
+    tasks = [download_one(name) for name in names]
+    results = await tqdm_asyncio.gather(*tasks)
+    return [name for name, ok in zip(names, results) if ok]
+
 
 async def install_client(lg: LocalGame, output_path: Path = None):
     if output_path is None:
@@ -21,13 +62,28 @@ async def install_client(lg: LocalGame, output_path: Path = None):
     res_server = GitHubServer()
     await res_server.init()
 
-    clients = res_server.hash_data['client'].keys()
-    await download(clients, "client/", output_path)
-    
+    clients = flatten_hash_tree(res_server.hash_data["client"])
+    if OFFLINE_INDEX in clients:
+        # 本地的 index.html 来自离线版入口
+        clients.pop("index.html", None)
+
+    client_hash = lg.getClientHash()
+    try:
+        names = []
+        for name, server_hash in clients.items():
+            if is_up_to_date(output_path / local_name(name), server_hash, client_hash.get(name)):
+                client_hash[name] = server_hash
+            else:
+                names.append(name)
+
+        log.info(f"客户端文件: {len(clients)}, 需要更新: {len(names)}")
+        if len(names) > 0:
+            for name in await download(names, "client/", output_path):
+                client_hash[name] = clients[name]
+    finally:
+        lg.saveClientHash(client_hash)
+
     index_html = output_path / "index.html"
-    index2_html = output_path / "启动离线版.html"
-    if index_html.exists() and index2_html.exists():
-        index_html.unlink()
-        index2_html.rename(index_html)
-        
-    
+    index2_html = output_path / OFFLINE_INDEX
+    if index2_html.exists():
+        index2_html.replace(index_html)
@@ -7,6 +7,8 @@ from FileDataPath import (
     ZH_MScenesPath,
     ZH_MAdultsPath,
     VieableEpisodeListPath,
+    TranslationHashPath,
+    ClientHashPath,
 )
 
 
@@ -76,3 +78,21 @@ class LocalGame:
 
     def getZH_MAdultIds(self):
         return get_path_ids(self.game_root / ZH_MAdultsPath)
+
+    def getTranslationHash(self, output_path: Path = None):
+        path = (output_path or self.game_root) / TranslationHashPath
+        if not path.exists():
+            return {}
+        return load_json(path)
+
+    def saveTranslationHash(self, hash_data, output_path: Path = None):
+        save_json(hash_data, (output_path or self.game_root) / TranslationHashPath)
+
+    def getClientHash(self):
+        path = self.game_root / ClientHashPath
+        if not path.exists():
+            return {}
+        return load_json(path)
+
+    def saveClientHash(self, hash_data):
+        save_json(hash_data, self.game_root / ClientHashPath)
@@ -36,22 +36,25 @@ class GameData(HTTPSessionApi):
         )
         return json.loads(gzip.decompress(res.data))
 
-    async def initCharacterData(self):
-        res_json = await self.getMMonstersData()
+    def setCharacterData(self, MMonstersData, MSpiritsData):
         data = {}
-        for item in res_json:
+        for item in MMonstersData:
             data[item["id"]] = item
         self.characterData = data
 
-        res_json = await self.getMSpiritsData()
         data = {}
-        for item in res_json:
+        for item in MSpiritsData:
             data[item["id"]] = item
 
         self.characterData.update(data)
 
         return data
 
+    async def initCharacterData(self):
+        MMonstersData = await self.getMMonstersData()
+        MSpiritsData = await self.getMSpiritsData()
+        return self.setCharacterData(MMonstersData, MSpiritsData)
+
     async def getCharacterRmids(self, ids):
         if self.characterData is None:
             await self.initCharacterData()
@@ -1,14 +1,8 @@
-import UnityPy
-
-from typing import List
-
-from UnityPy.tools.extractor import extract_assets
-
 from pathlib import Path
 
 from Crypto.Cipher import AES
 
-from utils.session import HTTPSessionApi, HTTPMethod
+from utils.session import HTTPSessionApi, HTTPMethod, SessionPool
 
 from FileDataPath import (
     CharacterIconPath,
@@ -22,6 +16,8 @@ from FileDataPath import (
 )
 
 API_HOST = "https://web-assets.otogi-frontier.com/prodassets/GeneralWebGL/Assets/"
+# 游戏资源主机沿用原来不校验证书的设置, 其他主机 (GitHub 和镜像等) 都校验证书
+SessionPool.skip_ssl_verify(API_HOST)
 
 AES_KEY = b"kms1kms2kms3kms4"
 AES_IV = b"nekonekonyannyan"
@@ -35,6 +31,30 @@ def decrypt(data: bytes, key, iv) -> bytes:
     return decrypted
 
 
+class StreamDecryptor:
+    """AES-CBC 分块解密, 最后一个块留到 finalize 时去除填充"""
+
+    block_size = AES.block_size
+
+    def __init__(self, key, iv):
+        self._cipher = AES.new(key, AES.MODE_CBC, iv)
+        self._pending = bytearray()
+
+    def update(self, chunk: bytes) -> bytes:
+        self._pending += chunk
+        size = (len(self._pending) - 1) // self.block_size * self.block_size
+        if size <= 0:
+            return b""
+        decrypted = self._cipher.decrypt(bytes(self._pending[:size]))
+        del self._pending[:size]
+        return decrypted
+
+    def finalize(self) -> bytes:
+        decrypted = self._cipher.decrypt(bytes(self._pending))
+        self._pending.clear()
+        return decrypted[: -decrypted[-1]]
+
+
 class GameResource(HTTPSessionApi):
     def __init__(self, proxy: str = ""):
         super().__init__(API_HOST, proxy)
@@ -44,6 +64,13 @@ class GameResource(HTTPSessionApi):
         res = await self.request_raw_data(url, method=HTTPMethod.OPTIONS)
         return int(res.headers.get("Content-Length", 0))
     
+    async def getAssetSize(self, url_path: str) -> int | None:
+        """用 HEAD 请求获取资源大小, 服务器没有返回时为 None"""
+        res = await self.request_raw_data(url_path, method=HTTPMethod.HEAD)
+        if res.status != 200 or "Content-Length" not in res.headers:
+            return None
+        return int(res.headers["Content-Length"])
+
     async def getAssetsLastVersion(self):
         url = f"https://otogi-rest.otogi-frontier.com/api/now"
         res = await self.request_raw_data(url, method=HTTPMethod.OPTIONS)
@@ -117,43 +144,9 @@ class GameResource(HTTPSessionApi):
             return None
         return decrypt(data, AES_KEY, AES_IV) if has_encrypt else data
 
-    async def ExtractAsset(self, url_path: str, out_path: Path) -> List[int]:
-        raw_data = await self.getAssetsFromPath(url_path)
-        if raw_data is None:
-            return []
-        
-        file_path = out_path / url_path
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        with file_path.open("wb") as f:
-            f.write(raw_data)
-            
-        # 全部解压效率低还大, 不如自己解包
-        # if url_path.startswith("chara/homestand/") or url_path.startswith("chara/stand/"):
-        #     file_path = out_path / "assets/assetbundleresources" / url_path
-        #     file_path.mkdir(parents=True, exist_ok=True)
-            
-        #     env = UnityPy.load(raw_data)
-
-        #     for obj in env.objects:
-        #         if obj.byte_size < 600:
-        #             continue
-
-        #         if obj.type.name == "Sprite":
-        #             data = obj.read()
-        #             if data.name == "_stand1":
-        #                 continue
-
-        #             data.image.save(file_path / f"{data.name}.png")
-
-        #         if obj.type.name == "Texture2D":
-        #             data = obj.read()
-        #             data_name = data.name
-        #             # if data_name.startswith("sactx-"):
-        #             #     continue
-        #             if data_name.isdigit():
-        #                 data_name = "body"
-
-        #             data.image.save(file_path / f"{data_name}.png")
-        #     return [1]
-
-        # return extract_assets(raw_data, out_path, ignore_first_container_dirs=None)
+    async def saveAssetsFromPath(self, url_path: str, file_path: Path) -> bool:
+        """流式下载资源到文件, 支持断点续传, 加密资源下载完整后再解密"""
+        has_encrypt = url_path.startswith("chara/still/")
+        decoder = StreamDecryptor(AES_KEY, AES_IV) if has_encrypt else None
+        res = await self.request_to_file(url_path, file_path, decoder=decoder)
+        return res.status in (200, 206)
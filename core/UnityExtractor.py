@@ -0,0 +1,205 @@
+"""
+在进程池中运行的 UnityPy 解包函数
+
+这些函数会被子进程导入, 所以这里只依赖 UnityPy 等第三方库,
+不要导入 config / utils 等带有副作用的模块。
+每个函数接收资源包的原始数据 (bytes) 或文件路径, 返回写出的文件列表。
+"""
+
+import re
+import ujson as json
+import UnityPy
+
+from pathlib import Path
+
+# 贴图输出设置, 主进程和进程池启动时由 set_output_profile 设置
+# format: png 或 webp (无损, 文件名不变, 浏览器和 PIL 按内容识别)
+DEFAULT_OUTPUT_PROFILE = {"format": "png", "compress_level": 1, "optimize": False}
+
+_output_profile = dict(DEFAULT_OUTPUT_PROFILE)
+
+
+def set_output_profile(profile: dict):
+    _output_profile.clear()
+    _output_profile.update(DEFAULT_OUTPUT_PROFILE)
+    _output_profile.update(profile)
+
+
+def save_image(image, file_path: Path, profile: dict = None):
+    """按输出设置保存贴图, 导出的贴图只会被本地浏览器读取, 默认用较快的压缩等级"""
+    profile = profile or _output_profile
+    if profile["format"] == "webp":
+        # 无损模式下 quality 为压缩力度, 0 最快
+        image.save(file_path, "WEBP", lossless=True, quality=0, method=0)
+    else:
+        image.save(
+            file_path,
+            "PNG",
+            compress_level=profile["compress_level"],
+            optimize=profile["optimize"],
+        )
+
+
+def _load(data: bytes | str | Path):
+    return UnityPy.load(str(data) if isinstance(data, Path) else data)
+
+
+def extract_voice(data: bytes, output_path: Path) -> list[Path]:
+    """导出 AudioClip"""
+    files = []
+    for obj in _load(data).objects:
+        if obj.type.name == "AudioClip":
+            clip = obj.read()
+            for name, sample in clip.samples.items():
+                file_path = output_path / name
+                with file_path.open("wb") as f:
+                    f.write(sample)
+                files.append(file_path)
+    return files
+
+
+def extract_container_textures(data: bytes, output_path: Path) -> list[Path]:
+    """按 container 名称导出 Texture2D, 用于背景图"""
+    files = []
+    for obj in _load(data).objects:
+        if obj.type.name == "Texture2D":
+            texture = obj.read()
+            file_path = output_path / Path(texture.container).name
+            save_image(texture.image, file_path)
+            files.append(file_path)
+    return files
+
+
+def extract_textures_to_file(data: bytes, file_path: Path) -> list[Path]:
+    """导出 Texture2D 到指定文件, 用于立绘大图"""
+    files = []
+    for obj in _load(data).objects:
+        if obj.type.name == "Texture2D":
+            save_image(obj.read().image, file_path)
+            files.append(file_path)
+    return files
+
+
+def extract_stand(
+    data: bytes, output_path: Path, skip_sprites: tuple[str, ...] = ()
+) -> list[Path]:
+    """导出立绘的 Sprite 与主体 Texture2D"""
+    files = []
+    for obj in _load(data).objects:
+        if obj.byte_size < 600:
+            continue
+
+        if obj.type.name == "Sprite":
+            sprite = obj.read()
+            if sprite.name in skip_sprites:
+                continue
+
+            file_path = output_path / f"{sprite.name}.png"
+            save_image(sprite.image, file_path)
+            files.append(file_path)
+
+        if obj.type.name == "Texture2D":
+            texture = obj.read()
+            data_name = texture.name
+            if data_name.startswith("sactx-"):
+                continue
+            if data_name.isdigit():
+                data_name = "body"
+
+            file_path = output_path / f"{data_name}.png"
+            save_image(texture.image, file_path)
+            files.append(file_path)
+    return files
+
+
+def spine_json_sorter(x):
+    if "_" in x:
+        f = re.findall(r"\d+", x.split("_")[-1])
+        return int(f[0] if f else 0)
+    return int(re.findall(r"\d+", x)[-1])
+
+
+def extract_spine(
+    data: bytes, output_path: Path, MAdultId, force_download=False
+) -> list[Path]:
+    """导出 Spine 贴图, atlas 和骨骼 json, 并生成骨骼列表"""
+    files = []
+    skel_json_list = []
+    for obj in _load(data).objects:
+        if obj.type.name == "Texture2D":
+            texture = obj.read()
+            file_path = output_path / f"{texture.name}.png"
+            save_image(texture.image, file_path)
+            files.append(file_path)
+        if obj.type.name == "TextAsset":
+            text_asset = obj.read()
+            data_name = Path(text_asset.container).name
+
+            if data_name == f"{MAdultId}.atlas.txt":
+                data_name = f"{MAdultId}.prefab.atlas.txt"
+
+            if data_name == f"{MAdultId}.json":
+                data_name = f"{MAdultId}.prefab.json"
+
+            file_path = output_path / data_name
+            try:
+                json.loads(text_asset.text)
+                skel_json_list.append(file_path.stem)
+            except:
+                pass
+
+            if not file_path.exists() or force_download:
+                with file_path.open("wb") as f:
+                    f.write(text_asset.script)
+                files.append(file_path)
+
+    if len(skel_json_list) != 0:
+        skel_json_list = sorted(skel_json_list, key=spine_json_sorter)
+        fake_skel_json = {
+            "skeleton": {"spine": "0.0.0"},
+            "skeleton_list": skel_json_list,
+        }
+        file_path = output_path / f"{MAdultId}.json"
+        with file_path.open("w", encoding="utf-8") as f:
+            json.dump(fake_skel_json, f, ensure_ascii=False)
+        files.append(file_path)
+    return files
+
+
+def _chara_icon_objects(bundle_path: Path) -> dict:
+    """
+    读取 chara_icon 的对象表, 按 path_id 返回
+
+    UnityPy.load 会读取整个文件并解压数据块, 对象内容在 read 时才解析。
+    不在工作进程中缓存, 导出完成后内存即释放; 图标每次更新只批量导出一次,
+    只有重建索引时会多解析一次, 可以用 test/BenchCharaIcon.py 测量这部分开销。
+    """
+    return {obj.path_id: obj for obj in _load(bundle_path).objects}
+
+
+def index_chara_icon(bundle_path: Path) -> dict:
+    """建立 chara_icon 的 Sprite 名称索引"""
+    sprites = {}
+    for path_id, obj in _chara_icon_objects(bundle_path).items():
+        if obj.type.name != "Sprite":
+            continue
+        if hasattr(obj, "peek_name"):
+            name = obj.peek_name()
+        else:
+            name = obj.read().name
+        sprites[name] = {"path_id": path_id}
+    return sprites
+
+
+def extract_chara_icons(bundle_path: Path, icons: list[tuple[int, Path]]) -> list[Path]:
+    """按 path_id 批量导出图标, 资源包只解析一次"""
+    objects = _chara_icon_objects(bundle_path)
+    files = []
+    for path_id, icon_path in icons:
+        obj = objects.get(path_id)
+        if obj is None:
+            continue
+        icon_path.parent.mkdir(parents=True, exist_ok=True)
+        save_image(obj.read().image, icon_path)
+        files.append(icon_path)
+    return files
@@ -0,0 +1,125 @@
+import time
+import ujson
+
+from pathlib import Path
+
+from utils import log, AtomicFileWriter
+
+
+class UpdateJournal:
+    """
+    更新任务的预写日志 (jsonl), 记录计划执行和已经完成的任务 key
+
+    每行一条记录:
+    {"op": "begin", "run": {...}, "time": ...}   本次更新的参数和开始时间, 参数不同或超过 max_age 时不续用
+    {"op": "plan", "keys": [...]}   执行前写入计划的任务
+    {"op": "done", "key": "..."}    任务完成后写入
+
+    更新中断后再次运行时跳过已完成的任务, 计划了但没有完成的任务重新执行,
+    更新正常结束 (无论有没有失败的任务) 后删除日志, 失败的任务下次由更新计划重新检查
+    """
+
+    # 中断后超过这个时间 (秒) 的记录不再续用
+    max_age: float = 24 * 60 * 60
+
+    def __init__(self, path: Path, run_info: dict):
+        self.path = Path(path)
+        self.run_info = run_info
+        self.started: float = None
+        self.planned: set[str] = set()
+        self.completed: set[str] = set()
+        self.resumed = False
+        self._file = None
+
+    def load(self) -> "UpdateJournal":
+        """读取上次中断的记录, 参数不同或没有记录时从头开始"""
+        self.planned.clear()
+        self.completed.clear()
+        self.started = None
+        self.resumed = False
+        if not self.path.exists():
+            return self
+
+        planned = set()
+        completed = set()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for index, line in enumerate(f):
+                try:
+                    entry = ujson.loads(line)
+                except ValueError:
+                    # 写入时中断的最后一行
+                    break
+                if index == 0:
+                    if entry.get("op") != "begin" or entry.get("run") != self.run_info:
+                        return self
+                    started = entry.get("time", 0)
+                    if time.time() - started > self.max_age:
+                        return self
+                elif entry["op"] == "plan":
+                    planned.update(entry["keys"])
+                elif entry["op"] == "done":
+                    completed.add(entry["key"])
+
+        self.planned = planned
+        self.completed = completed
+        self.started = started
+        self.resumed = True
+        return self
+
+    def is_done(self, key: str) -> bool:
+        return key in self.completed
+
+    def is_partial(self, key: str) -> bool:
+        """计划过但没有完成的任务"""
+        return key in self.planned and key not in self.completed
+
+    def _write(self, entry: dict):
+        self._file.write(ujson.dumps(entry, ensure_ascii=False, escape_forward_slashes=False) + "\n")
+        self._file.flush()
+
+    def start(self, keys):
+        """执行前写入计划的任务"""
+        if self.resumed:
+            log.info(
+                f"继续上次中断的更新, 已完成: {len(self.completed)}, "
+                f"未完成: {len(self.planned - self.completed)}"
+            )
+        if self.started is None:
+            self.started = time.time()
+        self._compact()
+        self._file = open(self.path, "a", encoding="utf-8")
+        self.resumed = True
+
+        keys = [key for key in keys if key not in self.planned]
+        if keys:
+            self._write({"op": "plan", "keys": keys})
+            self.planned.update(keys)
+
+    def _compact(self):
+        """重写日志, 合并之前的记录并去掉中断时写了一半的行"""
+        entries = [{"op": "begin", "run": self.run_info, "time": self.started}]
+        if self.planned:
+            entries.append({"op": "plan", "keys": sorted(self.planned)})
+        entries += [{"op": "done", "key": key} for key in sorted(self.completed)]
+        with AtomicFileWriter(self.path, buffer_size=64 * 1024) as f:
+            for entry in entries:
+                f.write((ujson.dumps(entry, ensure_ascii=False, escape_forward_slashes=False) + "\n").encode("utf-8"))
+
+    def done(self, key: str):
+        self.completed.add(key)
+        if self._file is not None:
+            self._write({"op": "done", "key": key})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def finish(self):
+        """更新结束, 删除日志"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+        self.planned.clear()
+        self.completed.clear()
+        self.started = None
+        self.resumed = False
@@ -0,0 +1,171 @@
+import asyncio
+
+from typing import Awaitable, Callable
+
+from tqdm import tqdm
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from utils import log, file_size_format, parse_csv_from_string
+
+from core.OtogiFrontier import OtogiApi
+from core.UpdateJournal import UpdateJournal
+
+
+class UpdateTask:
+    """
+    更新计划中的一项任务
+
+    key: 任务的唯一标识, 一般是资源地址, 相同 key 的任务只执行一次
+    kind: 任务类型, 用于统计
+    run: 执行任务的协程函数
+    urls: 任务需要下载的资源地址, 用于估算大小
+    deps: 需要先完成的任务 key
+    resumable: 更新中断后再次运行时, 上次已完成的任务是否可以跳过,
+        内容在两次运行之间可能变化的汇总任务 (图标数据, 报酬) 为 False
+    """
+
+    def __init__(
+        self,
+        key: str,
+        kind: str,
+        run: Callable[[], Awaitable],
+        urls: list[str] = None,
+        deps: list[str] = None,
+        name: str = None,
+        resumable: bool = True,
+    ):
+        self.key = key
+        self.kind = kind
+        self.run = run
+        self.urls = urls or []
+        self.deps = list(deps or [])
+        self.name = name
+        self.resumable = resumable
+        self.size: int = None
+
+
+class UpdatePlan:
+    """去重后的更新任务图"""
+
+    def __init__(self):
+        self.tasks: dict[str, UpdateTask] = {}
+
+    def add(self, task: UpdateTask) -> str:
+        """添加任务, 已有相同 key 的任务时合并依赖, 返回任务 key"""
+        exists = self.tasks.get(task.key)
+        if exists is None:
+            self.tasks[task.key] = task
+        else:
+            exists.deps += [x for x in task.deps if x not in exists.deps]
+        return task.key
+
+    def __len__(self):
+        return len(self.tasks)
+
+    @property
+    def total_size(self) -> int:
+        return sum(task.size or 0 for task in self.tasks.values())
+
+    def summary(self) -> dict:
+        """按任务类型统计数量和大小"""
+        kinds = {}
+        for task in self.tasks.values():
+            info = kinds.setdefault(task.kind, {"count": 0, "size": 0, "unknown": 0})
+            info["count"] += 1
+            if task.size is None and task.urls:
+                info["unknown"] += 1
+            info["size"] += task.size or 0
+        return kinds
+
+    def log_summary(self):
+        for kind, info in self.summary().items():
+            msg = f"{kind}: {info['count']}, 大小: {file_size_format(info['size'])}"
+            if info["unknown"] > 0:
+                msg += f" ({info['unknown']} 个未知大小)"
+            log.info(msg)
+        requests = sum(len(task.urls) for task in self.tasks.values())
+        log.info(f"共 {len(self)} 个任务, {requests} 个资源请求, 预计下载 {file_size_format(self.total_size)}")
+
+    async def estimate_sizes(self, GameApi: OtogiApi, manifest: dict[str, int] = None):
+        """
+        估算每个任务的下载大小
+        优先使用 AssetBundlePatch 列表中的大小, 列表中没有的资源用 HEAD 请求获取
+        """
+        manifest = manifest or {}
+        urls = {url for task in self.tasks.values() for url in task.urls}
+        missing = [url for url in urls if url not in manifest]
+
+        async def head(url):
+            try:
+                return url, await GameApi.resource.getAssetSize(url)
+            except Exception:
+                return url, None
+
+        sizes = dict(manifest)
+        for url, size in await asyncio.gather(*[head(url) for url in missing]):
+            sizes[url] = size
+
+        for task in self.tasks.values():
+            task_sizes = [sizes.get(url) for url in task.urls]
+            if task_sizes and all(size is not None for size in task_sizes):
+                task.size = sum(task_sizes)
+
+    def discard_completed(self, journal: UpdateJournal) -> int:
+        """去掉上次更新中断前已经完成的任务, 返回去掉的数量"""
+        keys = [
+            key for key, task in self.tasks.items() if task.resumable and journal.is_done(key)
+        ]
+        for key in keys:
+            del self.tasks[key]
+        return len(keys)
+
+    async def execute(
+        self, workers: int, desc="更新资源", journal: UpdateJournal = None
+    ) -> dict[str, BaseException]:
+        """
+        按依赖关系并行执行所有任务, 同时执行的任务数不超过 workers
+        依赖的任务失败时不执行, 返回失败任务的 key 和异常
+        有 journal 时先写入计划的任务, 每个任务完成后记录
+        """
+        if journal is not None:
+            journal.start(list(self.tasks))
+
+        semaphore = asyncio.Semaphore(max(workers, 1))
+        futures: dict[str, asyncio.Future] = {}
+        errors: dict[str, BaseException] = {}
+        pbar = tqdm(total=len(self), desc=desc)
+
+        async def run_task(task: UpdateTask):
+            try:
+                for dep in task.deps:
+                    if dep in futures:
+                        await asyncio.shield(futures[dep])
+                async with semaphore:
+                    await task.run()
+                if journal is not None:
+                    journal.done(task.key)
+            finally:
+                if task.name is not None:
+                    pbar.set_postfix_str(task.name)
+                pbar.update()
+
+        # 先创建所有任务, 依赖在执行时再等待, 不需要拓扑排序
+        for key, task in self.tasks.items():
+            futures[key] = asyncio.ensure_future(run_task(task))
+
+        with logging_redirect_tqdm(loggers=[log]):
+            results = await asyncio.gather(*futures.values(), return_exceptions=True)
+        pbar.close()
+        if journal is not None:
+            journal.close()
+
+        for key, result in zip(futures, results):
+            if isinstance(result, BaseException):
+                errors[key] = result
+                log.warning(f"任务失败: {key} ({result!r})")
+        return errors
+
+
+def load_manifest_sizes(AssetBundlePatch: bytes) -> dict[str, int]:
+    """从 AssetBundlePatch 列表中取出每个资源的大小"""
+    return {url_path: size for url_path, _, size in parse_csv_from_string(AssetBundlePatch.decode())}
@@ -1,9 +1,12 @@
 # from importlib.metadata import version
 
 from .image import Imager
+from .utils import ExecutorRegistry, awaitable
 
 # __version__ = version("flowery")
 
 __all__ = [
     "Imager",
+    "ExecutorRegistry",
+    "awaitable",
 ]
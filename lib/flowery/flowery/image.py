@@ -1,4 +1,5 @@
 import base64
+from functools import wraps
 from io import BytesIO
 from pathlib import Path
 from typing import Any, Literal
@@ -8,20 +9,92 @@ from PIL import ImageOps as PILOps
 from typing_extensions import Self
 
 from .typing import PILImage, T_Anchor, T_Color, T_Format, T_Mode, T_Resample
-from .utils import awaitable
+from .utils import DEFAULT_EXECUTOR, ExecutorRegistry, awaitable
+
+
+def lazy_op(func):
+    """可延迟执行的操作: 延迟模式下只记录操作, 否则在图像线程池中执行"""
+
+    @wraps(func)
+    async def wrapper(self: "Imager", *args: Any, **kwargs: Any) -> Any:
+        if self._pending is not None:
+            self._pending.append((func, args, kwargs))
+            return self
+        return await ExecutorRegistry.run(DEFAULT_EXECUTOR, func, self, *args, **kwargs)
+
+    return wrapper
+
+
+def _render_detached(imager: "Imager") -> tuple[PILImage, bool | None]:
+    """在子进程中执行记录的操作, 返回结果图像和透明度缓存"""
+    image = imager.image
+    return image, imager._transparency
+
+
+def _save_detached(imager: "Imager", fp: str | Path, kwargs: dict) -> None:
+    imager.image.save(fp, **kwargs)
 
 
 class Imager:
-    """图像处理器"""
+    """图像处理器
+
+    ### 说明
+        lazy 为 True 时, paste/rotate/flip/opacity/convert 等操作只记录不执行,
+        在 save 或访问 image 时于同一个线程中一次执行完, 连续的 paste 会合并处理。
+        render/save 指定进程池时, 图像和记录的操作 pickle 后在子进程中执行。
+    """
 
-    __slots__ = "_image"
+    __slots__ = ("_image", "_transparency", "_pending")
 
-    def __init__(self, image: Self | PILImage) -> None:
-        self._image = image.image.copy() if isinstance(image, Imager) else image
+    # 会直接修改像素的 PIL 方法, 通过 __getattr__ 调用时清除透明度缓存
+    _MUTATING_METHODS = frozenset(
+        {"paste", "putalpha", "putdata", "putpixel", "putpalette", "alpha_composite", "frombytes"}
+    )
+
+    def __init__(
+        self, image: Self | PILImage, transparent: bool | None = None, lazy: bool = False
+    ) -> None:
+        """
+        ### 参数
+            image: 图像或另一个 Imager。
+            transparent: 已知图像是否透明时传入, 跳过透明度检查。
+            lazy: 是否延迟执行操作。
+        """
+        self._pending: list | None = [] if lazy else None
+        if isinstance(image, Imager):
+            self._image = image.image.copy()
+            self._transparency = image._transparency if transparent is None else transparent
+        else:
+            self._image = image
+            self._transparency = transparent
 
     def __getattr__(self, name: str) -> Any:
+        # 私有属性和 Imager 自身的属性 (未初始化的 slot 导致 property 失败时) 不转发,
+        # 否则访问 _image 会无限递归
+        if name.startswith("_") or hasattr(type(self), name):
+            raise AttributeError(name)
+        if name in self._MUTATING_METHODS:
+            self._transparency = None
         return getattr(self.image, name)
 
+    def __getstate__(self) -> dict[str, Any]:
+        # 记录的操作保存为方法名, lazy_op 包装前的函数不能直接 pickle
+        pending = self._pending
+        if pending is not None:
+            pending = [(func.__name__, args, kwargs) for func, args, kwargs in pending]
+        return {"_image": self._image, "_transparency": self._transparency, "_pending": pending}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        pending = state["_pending"]
+        if pending is not None:
+            pending = [
+                (getattr(getattr(Imager, name), "__wrapped__", getattr(Imager, name)), args, kwargs)
+                for name, args, kwargs in pending
+            ]
+        self._image = state["_image"]
+        self._transparency = state["_transparency"]
+        self._pending = pending
+
     def __enter__(self) -> Self:
         return self
 
@@ -36,12 +109,15 @@ class Imager:
 
     @property
     def image(self) -> PILImage:
-        """PIL 图像对象"""
+        """PIL 图像对象, 延迟模式下先执行记录的操作"""
+        if self._pending:
+            self._flush()
         return self._image
 
     @image.setter
     def image(self, image: PILImage) -> None:
         self._image = image
+        self._transparency = None
 
     @property
     def width(self) -> int:
@@ -78,16 +154,105 @@ class Imager:
             y = y - int(0.5 * size_y)
         return x, y
 
+    @property
+    def lazy(self) -> bool:
+        """是否为延迟模式"""
+        return self._pending is not None
+
+    def _flush(self) -> None:
+        """执行记录的操作, 连续的 paste 合并为一次处理"""
+        pending, self._pending = self._pending, None
+        try:
+            index = 0
+            while index < len(pending):
+                func, args, kwargs = pending[index]
+                if func is not Imager.paste.__wrapped__:
+                    func(self, *args, **kwargs)
+                    index += 1
+                    continue
+
+                layers = []
+                while index < len(pending) and pending[index][0] is func:
+                    _, args, kwargs = pending[index]
+                    img, pos, anchor, reverse = self._paste_args(*args, **kwargs)
+                    if reverse:
+                        break
+                    layers.append((img, pos, anchor))
+                    index += 1
+                if layers:
+                    self._paste_layers(layers)
+                else:
+                    func(self, *args, **kwargs)
+                    index += 1
+        finally:
+            self._pending = []
+
+    async def render(self, executor: str = DEFAULT_EXECUTOR) -> Self:
+        """延迟模式下执行记录的操作
+
+        ### 参数
+            executor: 执行器名称。进程池中执行时把图像和记录的操作发送到子进程, 再取回结果图像,
+                等待期间新记录的操作保留到下次执行。
+        """
+        if ExecutorRegistry.kind(executor) != "process":
+            return await ExecutorRegistry.run(executor, Imager._render, self)
+
+        if self._pending:
+            count = len(self._pending)
+            image, transparency = await ExecutorRegistry.run(executor, _render_detached, self)
+            self._image, self._transparency = image, transparency
+            self._pending = self._pending[count:]
+        return self
+
+    def _render(self) -> Self:
+        self.image
+        return self
+
+    @staticmethod
+    def _paste_args(
+        img: Self, pos: tuple[int, int] = (0, 0), anchor: T_Anchor = "lt", reverse: bool = False
+    ) -> tuple[Self, tuple[int, int], T_Anchor, bool]:
+        return img, pos, anchor, reverse
+
+    def _paste_layers(self, layers: list[tuple[Self, tuple[int, int], T_Anchor]]) -> None:
+        """
+        依次粘贴多张图像
+
+        转为 RGBA 后直接合成到目标区域, 不再为每张图像创建整张图大小的图层,
+        目标已经是 RGBA 时不透明的图像合成结果与直接粘贴相同, 不需要再检查透明度
+        """
+        for img, pos, anchor in layers:
+            pos = self._calculate_position(img.size, pos, anchor)
+            if self._image.mode != "RGBA":
+                if not (self.has_transparency(img) or self.has_transparency(self)):
+                    self._image.paste(img.image, pos)
+                    continue
+                self.image = self._image.convert("RGBA")
+
+            source = img.image if img.mode == "RGBA" else img.image.convert("RGBA")
+            self._image.alpha_composite(source, pos)
+            self._transparency = None
+
     def convert(self, mode: T_Mode) -> Self:
         """转换图像模式
 
+        ### 说明
+            已经是目标模式时不转换, 延迟模式下只记录操作。
+
         ### 参数
             mode: 图像模式。
         """
-        self.image = self.image.convert(mode)
+        if self._pending is not None:
+            self._pending.append((Imager._convert, (mode,), {}))
+            return self
+        return self._convert(mode)
+
+    def _convert(self, mode: T_Mode) -> Self:
+        if self.image.mode != mode:
+            self.image = self.image.convert(mode)
         return self
 
-    @awaitable
+    @lazy_op
     def paste(
         self,
         img: Self,
@@ -111,6 +276,7 @@ class Imager:
         if not (self.has_transparency(img) or self.has_transparency(self)):
             if reverse:
                 return self
+            # 两张图都不透明, 结果也不透明, 保留缓存
             self.image.paste(img.image, pos)
             return self
 
@@ -127,7 +293,7 @@ class Imager:
 
         return self
 
-    @awaitable
+    @lazy_op
     def apply_mask(self, mask: Self) -> Self:
         """将蒙版应用于图像
 
@@ -138,9 +304,10 @@ class Imager:
             mask: 蒙版图像。
         """
         self.image.putalpha(mask.image.convert("L"))
+        self._transparency = None
         return self
 
-    @awaitable
+    @lazy_op
     def invert(self) -> Self:
         """反色图像"""
         if self.mode == "RGBA":
@@ -148,13 +315,13 @@ class Imager:
         self.image = PILOps.invert(self.image)
         return self
 
-    @awaitable
+    @lazy_op
     def grayscale(self) -> Self:
         """灰度图像"""
         self.image = PILOps.grayscale(self.image)
         return self
 
-    @awaitable
+    @lazy_op
     def rotate(
         self,
         angle: float,
@@ -185,7 +352,7 @@ class Imager:
         )
         return self
 
-    @awaitable
+    @lazy_op
     def flip(self, axis: Literal["x", "y", "xy"]) -> Self:
         """
         翻转图像
@@ -203,7 +370,7 @@ class Imager:
 
         return self
 
-    @awaitable
+    @lazy_op
     def opacity(self, alpha: int | float) -> Self:
         """调整图像不透明度"""
         if isinstance(alpha, float):
@@ -217,6 +384,7 @@ class Imager:
             raise TypeError("不透明度必须是整数或小数")
 
         self.image.putalpha(alpha)
+        self._transparency = alpha < 255
         return self
 
     @awaitable
@@ -229,9 +397,20 @@ class Imager:
         """显示图像"""
         self.image.show(title)
 
-    @awaitable
-    def save(self, fp: str | bytes | Path, **kwargs) -> None:
-        """保存图像"""
+    async def save(self, fp: str | bytes | Path, executor: str = DEFAULT_EXECUTOR, **kwargs) -> None:
+        """保存图像
+
+        ### 参数
+            fp: 文件路径或文件对象, 使用进程池时只能是文件路径。
+            executor: 执行器名称。进程池中执行时在子进程中执行记录的操作并编码保存,
+                当前对象不变, 记录的操作仍然保留。
+        """
+        if ExecutorRegistry.kind(executor) == "process":
+            await ExecutorRegistry.run(executor, _save_detached, self, fp, kwargs)
+        else:
+            await ExecutorRegistry.run(executor, Imager._save, self, fp, **kwargs)
+
+    def _save(self, fp: str | bytes | Path, **kwargs) -> None:
         self.image.save(fp, **kwargs)
 
     def to_bytes(self) -> bytes:
@@ -266,17 +445,41 @@ class Imager:
         return cls(PILImg.new(mode, size, color or 0))
 
     @classmethod
-    def has_transparency(cls, image: Self) -> bool:
-        """检查图像是否具有透明度"""
+    def has_transparency(cls, image: Self | PILImage) -> bool:
+        """检查图像是否具有透明度
+
+        ### 说明
+            Imager 的检查结果会被缓存, 图像被替换或修改后重新检查。
+        """
+        if isinstance(image, Imager):
+            # 延迟模式下先执行记录的操作, 缓存才是最新的
+            pil_image = image.image
+            if image._transparency is None:
+                image._transparency = cls._scan_transparency(pil_image)
+            return image._transparency
+        return cls._scan_transparency(image)
+
+    @staticmethod
+    def _scan_transparency(image: PILImage) -> bool:
+        """先根据模式和 PNG 的透明色信息判断, 无法判断时才扫描像素"""
         if image.mode == "P":
-            transparent = image.info.get("transparency", -1)
+            transparent = image.info.get("transparency")
+            if transparent is None:
+                # 调色板没有透明色
+                return False
+            if isinstance(transparent, bytes):
+                # tRNS 为每个调色板索引的透明度
+                indexes = {index for index, alpha in enumerate(transparent) if alpha < 255}
+            else:
+                indexes = {transparent}
+            if not indexes:
+                return False
             if colors := image.getcolors():
                 for _, index in colors:
-                    if index == transparent:
+                    if index in indexes:
                         return True
         elif image.mode == "RGBA":
-            extrema = image.getextrema()
-            if extrema[3][0] < 255:
-                return True
+            # 只统计透明通道
+            return image.getchannel("A").getextrema()[0] < 255
 
         return False
@@ -1,15 +1,164 @@
 import asyncio
+import time
 from collections.abc import Callable, Coroutine
-from functools import wraps
-from typing import ParamSpec, TypeVar
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial, wraps
+from typing import Any, Literal, ParamSpec, TypeVar
 
 P = ParamSpec("P")
 R = TypeVar("R")
 
+T_ExecutorKind = Literal["thread", "process"]
 
-def awaitable(func: Callable[P, R]) -> Callable[P, Coroutine[None, None, R]]:
-    @wraps(func)
-    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
-        return await asyncio.to_thread(func, *args, **kwargs)
+DEFAULT_EXECUTOR = "image"
 
-    return wrapper
+
+def _timed_call(func: Callable[..., R], args: tuple, kwargs: dict) -> tuple[R, float, float]:
+    """在执行器中运行并记录开始和结束时间, 进程池中也能使用"""
+    start = time.time()
+    result = func(*args, **kwargs)
+    return result, start, time.time()
+
+
+class ExecutorStats:
+    """执行器的排队和忙碌时间统计"""
+
+    __slots__ = ("submitted", "completed", "failed", "in_flight", "busy_time", "wait_time")
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+
+
+class ExecutorRegistry:
+    """
+    图像处理使用的执行器, 与 asyncio 默认线程池 (文件 I/O 等) 分开, 可以单独设置大小
+
+    ### 说明
+        默认的 "image" 为线程池, Imager 的操作会修改对象本身, 只能在线程中执行。
+        可以 pickle 的纯函数可以注册到进程池, 例如:
+        ExecutorRegistry.configure("image_process", "process", 4)
+        延迟模式的 Imager 可以用 render/save 的 executor 参数在进程池中执行记录的操作。
+    """
+
+    _configs: dict[str, tuple[T_ExecutorKind, int | None]] = {DEFAULT_EXECUTOR: ("thread", None)}
+    _executors: dict[str, Executor] = {}
+    _stats: dict[str, ExecutorStats] = {}
+
+    @classmethod
+    def configure(
+        cls, name: str = DEFAULT_EXECUTOR, kind: T_ExecutorKind = "thread", max_workers: int | None = None
+    ) -> None:
+        """设置执行器类型和线程/进程数, None 或 0 为默认数量, 已创建的执行器会在下次使用时重建"""
+        if kind not in ("thread", "process"):
+            raise ValueError(f"未知的执行器类型: {kind}")
+        if name == DEFAULT_EXECUTOR and kind != "thread":
+            raise ValueError(
+                "Imager 的操作会修改对象本身, \"image\" 只能使用线程池, "
+                "进程池请注册其他名称, 通过 Imager.render/save 的 executor 参数使用"
+            )
+        cls._configs[name] = (kind, max_workers or None)
+        if (executor := cls._executors.pop(name, None)) is not None:
+            executor.shutdown(wait=False)
+
+    @classmethod
+    def get(cls, name: str = DEFAULT_EXECUTOR) -> Executor:
+        if (executor := cls._executors.get(name)) is not None:
+            return executor
+        if name not in cls._configs:
+            raise KeyError(f"未注册的执行器: {name}")
+
+        kind, max_workers = cls._configs[name]
+        if kind == "process":
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"flowery-{name}")
+        cls._executors[name] = executor
+        return executor
+
+    @classmethod
+    def kind(cls, name: str = DEFAULT_EXECUTOR) -> T_ExecutorKind:
+        if name not in cls._configs:
+            raise KeyError(f"未注册的执行器: {name}")
+        return cls._configs[name][0]
+
+    @classmethod
+    def max_workers(cls, name: str = DEFAULT_EXECUTOR) -> int:
+        return cls.get(name)._max_workers  # type: ignore[attr-defined]
+
+    @classmethod
+    async def run(cls, name: str, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """在指定的执行器中运行函数, 不阻塞事件循环"""
+        executor = cls.get(name)
+        stats = cls._stats.setdefault(name, ExecutorStats())
+        stats.submitted += 1
+        stats.in_flight += 1
+        submit = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            result, start, end = await loop.run_in_executor(executor, partial(_timed_call, func, args, kwargs))
+        except BaseException:
+            stats.failed += 1
+            raise
+        finally:
+            stats.in_flight -= 1
+        stats.completed += 1
+        stats.wait_time += max(start - submit, 0.0)
+        stats.busy_time += end - start
+        return result
+
+    @classmethod
+    def stats(cls, name: str = DEFAULT_EXECUTOR) -> dict[str, Any]:
+        """
+        ### 返回
+            queued: 等待空闲线程/进程的任务数 (按 in_flight 超出 workers 的部分估算)。
+            busy_time: 任务实际执行时间之和, 除以运行时间和 workers 即为利用率。
+            avg_wait: 任务提交到开始执行的平均等待时间。
+        """
+        stats = cls._stats.get(name, ExecutorStats())
+        kind, max_workers = cls._configs.get(name, ("thread", None))
+        workers = cls.max_workers(name) if name in cls._executors else max_workers
+        return {
+            "name": name,
+            "kind": kind,
+            "workers": workers,
+            "submitted": stats.submitted,
+            "completed": stats.completed,
+            "failed": stats.failed,
+            "in_flight": stats.in_flight,
+            "queued": max(stats.in_flight - (workers or 0), 0) if workers else 0,
+            "busy_time": stats.busy_time,
+            "avg_wait": stats.wait_time / stats.completed if stats.completed else 0.0,
+        }
+
+    @classmethod
+    def all_stats(cls) -> list[dict[str, Any]]:
+        return [cls.stats(name) for name in cls._stats]
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """关闭所有执行器"""
+        for executor in cls._executors.values():
+            executor.shutdown()
+        cls._executors.clear()
+
+
+def awaitable(
+    func: Callable[P, R] | None = None, *, executor: str = DEFAULT_EXECUTOR
+) -> Any:
+    """在 ExecutorRegistry 的执行器中运行同步函数, 默认使用 "image" 线程池"""
+
+    def decorator(func: Callable[P, R]) -> Callable[P, Coroutine[None, None, R]]:
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            return await ExecutorRegistry.run(executor, func, *args, **kwargs)
+
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import inspect
+import timeit
+
+from utils.cache import AsyncCache, make_key_func
+
+NUMBER = 100_000
+
+
+def old_get_func_key(func, *fn_args, **fn_kwargs):
+    bound = inspect.signature(func).bind(*fn_args, **fn_kwargs)
+    bound.apply_defaults()
+    bound.arguments.pop("self", None)
+    return hash(f"{func.__name__}@{bound.arguments}")
+
+
+class Server:
+    async def getMScenes(self, MSceneId):
+        return None
+
+    async def getCharacterEpisodes(self, character_id, page=1):
+        return None
+
+
+def bench(name, stmt):
+    seconds = timeit.timeit(stmt, number=NUMBER)
+    print(f"{name:<40} {seconds / NUMBER * 1e6:8.3f} us/call")
+
+
+def main():
+    server = Server()
+    key_positional = make_key_func(Server.getMScenes)
+    key_default = make_key_func(Server.getCharacterEpisodes)
+
+    print("cache key (per call)")
+    bench("old: positional", lambda: old_get_func_key(Server.getMScenes, server, 221491))
+    bench("new: positional (fast path)", lambda: key_positional(server, 221491))
+    bench(
+        "old: default arg",
+        lambda: old_get_func_key(Server.getCharacterEpisodes, server, 21491),
+    )
+    bench("new: default arg", lambda: key_default(server, 21491))
+
+    cached = AsyncCache()(Server.getMScenes)
+
+    async def hits():
+        await cached(server, 221491)
+        for _ in range(NUMBER):
+            await cached(server, 221491)
+
+    loop = asyncio.new_event_loop()
+    seconds = timeit.timeit(lambda: loop.run_until_complete(hits()), number=1)
+    loop.close()
+    print(f"{'AsyncCache hit':<40} {seconds / NUMBER * 1e6:8.3f} us/call")
+
+
+if __name__ == "__main__":
+    main()
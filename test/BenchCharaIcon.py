@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import time
+
+from pathlib import Path
+
+from core.UnityExtractor import _chara_icon_objects, index_chara_icon, extract_chara_icons
+
+
+def main():
+    """
+    usage: python test/BenchCharaIcon.py [chara_icon 资源包] [导出数量]
+
+    默认使用 update_cache/chara_icon (运行一次更新后才有), 默认导出 100 个图标
+    """
+    bundle_path = Path(sys.argv[1] if len(sys.argv) > 1 else "update_cache/chara_icon")
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    if not bundle_path.exists():
+        print(f"找不到资源包: {bundle_path}")
+        return
+
+    print(f"资源包 {bundle_path.stat().st_size / 1024 / 1024:.1f} MB\n")
+
+    start = time.perf_counter()
+    objects = _chara_icon_objects(bundle_path)
+    parse = time.perf_counter() - start
+    print(f"{'解析资源包':<24} {parse * 1e3:9.1f} ms  {len(objects)} 个对象")
+    del objects
+
+    start = time.perf_counter()
+    sprites = index_chara_icon(bundle_path)
+    print(f"{'建立索引 (含解析)':<24} {(time.perf_counter() - start) * 1e3:9.1f} ms  {len(sprites)} 个图标")
+
+    names = list(sprites)[:count]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        icons = [(sprites[name]["path_id"], Path(temp_dir) / f"{name}.png") for name in names]
+
+        start = time.perf_counter()
+        extract_chara_icons(bundle_path, icons)
+        batch = time.perf_counter() - start
+        print(f"{'批量导出 (含解析)':<24} {batch * 1e3:9.1f} ms  {len(icons)} 个图标")
+
+    print(f"\n每个角色单独导出时约为 {(parse + batch / max(len(icons), 1)) * 1e3:.1f} ms/个")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from pathlib import Path
+
+from PIL import Image
+
+from lib.flowery.flowery import Imager
+from core.FixHomeStandImage import FixHomeStandImage, place_overlay
+
+CHAR_ID = "21491"
+POS = {"x": 412, "y": 236}
+NAMES = [f"face_{index}" for index in range(8)]
+BODY_SIZE = (2048, 2048)
+OVERLAY_SIZE = (512, 384)
+NUMBER = 3
+
+
+def make_fixture(path: Path):
+    """生成测试用角色: idle/body 和 8 张需要修正的表情差分"""
+    rng = np.random.default_rng(0)
+    path.mkdir(parents=True, exist_ok=True)
+
+    def make_image(size):
+        # 渐变加少量噪点, 椭圆外透明, 接近实际的立绘
+        yy, xx = np.mgrid[0 : size[1], 0 : size[0]]
+        data = np.stack(
+            [xx * 255 // size[0], yy * 255 // size[1], (xx + yy) % 256, np.full_like(xx, 255)],
+            axis=-1,
+        ).astype(np.uint8)
+        data[..., :3] += rng.integers(0, 8, (size[1], size[0], 3), dtype=np.uint8)
+        outside = ((xx - size[0] / 2) / (size[0] / 2)) ** 2 + ((yy - size[1] / 2) / (size[1] / 2)) ** 2 > 1
+        data[outside] = 0
+        return Image.fromarray(data, "RGBA")
+
+    make_image(BODY_SIZE).save(path / "idle.png", compress_level=1)
+    make_image(BODY_SIZE).save(path / "body.png", compress_level=1)
+    for name in NAMES:
+        make_image(OVERLAY_SIZE).save(path / f"{name}.png", compress_level=1)
+
+
+async def old_fix(chara_path: Path, char_id, pos, names):
+    """修改前的实现"""
+    base_im = Image.open(chara_path / "idle.png")
+
+    for name in names:
+        im_path = chara_path / f"{name}.png"
+        if not im_path.exists():
+            continue
+
+        body_im = Image.open(chara_path / "body.png")
+        overlay = Image.open(im_path)
+
+        if body_im.size == overlay.size:
+            continue
+
+        if char_id in ["21491"]:
+            base_x = base_im.size[0] - overlay.size[0]
+            base_y = base_im.size[1] - overlay.size[1]
+            x = pos["x"] + base_x
+            y = pos["y"] + base_y
+        else:
+            x = pos["x"]
+            y = pos["y"]
+
+        ima = Imager(Image.new("RGBA", body_im.size, (0, 0, 0, 0)))
+        overlay_ima = Imager(overlay)
+        await ima.paste(overlay_ima, (x, y))
+        await ima.save(im_path)
+
+
+async def new_fix(chara_path: Path, char_id, pos, names):
+    fixer = FixHomeStandImage(chara_path.parent, char_id, chara_path=chara_path)
+    fixer.homestand_fix = {char_id: pos}
+    fixer.homestand_name = names
+    await fixer.fix()
+
+
+def bench_composite(fixture: Path):
+    """只比较合成部分, 不包括 PNG 编码"""
+    x, y = POS["x"], POS["y"]
+    overlays = [Image.open(fixture / f"{name}.png") for name in NAMES]
+    for overlay in overlays:
+        overlay.load()
+
+    async def old_composite():
+        for overlay in overlays:
+            ima = Imager(Image.new("RGBA", BODY_SIZE, (0, 0, 0, 0)))
+            await ima.paste(Imager(overlay), (x, y))
+
+    def new_composite():
+        for overlay in overlays:
+            place_overlay(BODY_SIZE, overlay, (x, y))
+
+    start = time.perf_counter()
+    for _ in range(NUMBER):
+        asyncio.run(old_composite())
+    old_seconds = (time.perf_counter() - start) / NUMBER
+
+    start = time.perf_counter()
+    for _ in range(NUMBER):
+        new_composite()
+    new_seconds = (time.perf_counter() - start) / NUMBER
+
+    print(f"{'old: composite only':<40} {old_seconds * 1e3:8.1f} ms/character")
+    print(f"{'new: composite only':<40} {new_seconds * 1e3:8.1f} ms/character")
+    print(f"composite speedup: {old_seconds / new_seconds:.1f}x")
+
+
+def bench(name, func, fixture: Path, work_root: Path):
+    total = 0.0
+    for index in range(NUMBER):
+        chara_path = work_root / f"{name}_{index}" / CHAR_ID
+        shutil.copytree(fixture, chara_path)
+        start = time.perf_counter()
+        asyncio.run(func(chara_path, CHAR_ID, POS, NAMES))
+        total += time.perf_counter() - start
+    seconds = total / NUMBER
+    print(f"{name:<40} {seconds * 1e3:8.1f} ms/character")
+    return seconds, work_root / f"{name}_0" / CHAR_ID
+
+
+def main():
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = Path(temp_dir)
+        fixture = root / "fixture" / CHAR_ID
+        make_fixture(fixture)
+
+        print(f"body {BODY_SIZE}, {len(NAMES)} overlays {OVERLAY_SIZE}")
+        bench_composite(fixture)
+
+        old_seconds, old_path = bench("old: Imager.paste", old_fix, fixture, root)
+        new_seconds, new_path = bench("new: numpy", new_fix, fixture, root)
+        # 端到端时间主要是 body 大小的 PNG 编码, 加速比低于只比较合成的部分
+        print(f"speedup: {old_seconds / new_seconds:.1f}x")
+
+        for name in NAMES:
+            old_data = np.asarray(Image.open(old_path / f"{name}.png"))
+            new_data = np.asarray(Image.open(new_path / f"{name}.png"))
+            assert (old_data == new_data).all(), name
+        print("output identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+import time
+
+import numpy as np
+import UnityPy
+
+from pathlib import Path
+
+from PIL import Image
+
+from core.UnityExtractor import save_image
+
+PROFILES = {
+    "png level 6 (旧默认)": {"format": "png", "compress_level": 6, "optimize": False},
+    "png level 1 (默认)": {"format": "png", "compress_level": 1, "optimize": False},
+    "png level 0": {"format": "png", "compress_level": 0, "optimize": False},
+    "webp lossless": {"format": "webp", "compress_level": 1, "optimize": False},
+}
+
+
+def load_textures(bundle_paths: list[Path]) -> list[Image.Image]:
+    """解码资源包中的所有 Texture2D, 只计编码时间"""
+    images = []
+    for bundle_path in bundle_paths:
+        for obj in UnityPy.load(str(bundle_path)).objects:
+            if obj.type.name == "Texture2D":
+                image = obj.read().image
+                image.load()
+                images.append(image)
+    return images
+
+
+def make_textures() -> list[Image.Image]:
+    """没有资源包时生成类似立绘的贴图: 渐变加少量噪点, 椭圆外透明"""
+    rng = np.random.default_rng(0)
+    images = []
+    for width, height in [(2048, 2048), (1024, 1024), (512, 512)]:
+        yy, xx = np.mgrid[0:height, 0:width]
+        data = np.stack(
+            [xx * 255 // width, yy * 255 // height, (xx + yy) % 256, np.full_like(xx, 255)],
+            axis=-1,
+        ).astype(np.uint8)
+        data[..., :3] += rng.integers(0, 8, (height, width, 3), dtype=np.uint8)
+        data[((xx - width / 2) / (width / 2)) ** 2 + ((yy - height / 2) / (height / 2)) ** 2 > 1] = 0
+        images.append(Image.fromarray(data, "RGBA"))
+    return images
+
+
+def main():
+    """
+    usage: python test/BenchPngProfile.py [资源包文件 ...]
+
+    资源包可以用 update_cache/chara_icon 或从游戏下载的 chara/stand/xxx 等文件
+    """
+    bundle_paths = [Path(x) for x in sys.argv[1:]]
+    if bundle_paths:
+        images = load_textures(bundle_paths)
+        print(f"{len(bundle_paths)} 个资源包, {len(images)} 张贴图")
+    else:
+        images = make_textures()
+        print(f"没有指定资源包, 使用生成的 {len(images)} 张贴图")
+
+    pixels = sum(image.width * image.height for image in images)
+    print(f"共 {pixels / 1e6:.1f} M 像素\n")
+
+    baseline = None
+    for name, profile in PROFILES.items():
+        size = 0
+        start = time.perf_counter()
+        for image in images:
+            buffer = io.BytesIO()
+            save_image(image, buffer, profile)
+            size += buffer.tell()
+        seconds = time.perf_counter() - start
+        if baseline is None:
+            baseline = seconds
+        print(
+            f"{name:<24} {seconds * 1e3:9.1f} ms  {size / 1024 / 1024:8.2f} MB"
+            f"  {baseline / seconds:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from core.DataServer.BlobStore import BlobStore, content_hash_matches, manifest_hash
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_put_get(self):
+        store = BlobStore(self.root, 1024)
+        data = b"MScenes"
+        self.assertTrue(store.put(sha256(data), data))
+        self.assertEqual(store.get(sha256(data)), data)
+        self.assertEqual(store.get(sha256(data).upper()), data)
+        self.assertEqual(store.total_size, len(data))
+        self.assertIsNone(store.get(sha256(b"missing")))
+
+    def test_reject_bad_key_and_content(self):
+        store = BlobStore(self.root, 1024)
+        self.assertFalse(store.put(sha256(b"a"), b"b"))
+        self.assertFalse(store.put("../../index.html", b"a"))
+        self.assertIsNone(store.get("../../index.html"))
+        self.assertEqual(list(self.root.iterdir()), [])
+
+        # git blob hash 也可以通过校验
+        data = b"client"
+        git_hash = hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+        self.assertTrue(store.put(git_hash, data))
+
+    def test_verify_on_read(self):
+        data = b"jsoncn"
+        key = sha256(data)
+        BlobStore(self.root, 1024).put(key, data)
+        (self.root / key[:2] / key).write_bytes(b"broken")
+
+        self.assertEqual(BlobStore(self.root, 1024).get(key), b"broken")
+        store = BlobStore(self.root, 1024, verify=True)
+        self.assertIsNone(store.get(key))
+        self.assertFalse((self.root / key[:2] / key).exists())
+        self.assertEqual(store.total_size, 0)
+
+    def test_lru_eviction(self):
+        store = BlobStore(self.root, 250)
+        blobs = {name: name.encode() * 100 for name in "abc"}
+        keys = {name: sha256(data) for name, data in blobs.items()}
+
+        store.put(keys["a"], blobs["a"])
+        store.put(keys["b"], blobs["b"])
+        os.utime(self.root / keys["a"][:2] / keys["a"], (1000, 1000))
+        os.utime(self.root / keys["b"][:2] / keys["b"], (2000, 2000))
+
+        # 读取后 a 变为最近使用, 超过大小时先淘汰 b
+        self.assertEqual(store.get(keys["a"]), blobs["a"])
+        store.put(keys["c"], blobs["c"])
+
+        self.assertIsNone(store.get(keys["b"]))
+        self.assertEqual(store.get(keys["a"]), blobs["a"])
+        self.assertEqual(store.get(keys["c"]), blobs["c"])
+        self.assertEqual(store.total_size, 200)
+
+
+class TestManifestHash(unittest.TestCase):
+    def test_manifest_hash(self):
+        self.assertEqual(manifest_hash("abc"), "abc")
+        self.assertEqual(manifest_hash({"hash": "abc", "size": 1}), "abc")
+        self.assertIsNone(manifest_hash({"1": "abc"}))
+
+    def test_unknown_algorithm(self):
+        self.assertIsNone(content_hash_matches(b"a", "abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
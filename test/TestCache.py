@@ -0,0 +1,150 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import datetime
+import unittest
+
+from utils.cache import AsyncCache, Cache, make_key_func
+
+
+class TestAsyncCache(unittest.IsolatedAsyncioTestCase):
+    async def test_cache_none_result(self):
+        calls = []
+
+        @AsyncCache()
+        async def fetch(key):
+            calls.append(key)
+            return None
+
+        self.assertIsNone(await fetch(1))
+        self.assertIsNone(await fetch(1))
+        self.assertEqual(calls, [1])
+        self.assertEqual(fetch.cache_info()["hits"], 1)
+
+    async def test_single_flight(self):
+        calls = []
+
+        @AsyncCache()
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return [key]
+
+        results = await asyncio.gather(*[fetch(1) for _ in range(10)])
+        self.assertEqual(results, [[1]] * 10)
+        self.assertEqual(calls, [1])
+
+    async def test_single_flight_error(self):
+        calls = []
+
+        @AsyncCache()
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            raise ValueError(key)
+
+        results = await asyncio.gather(
+            *[fetch(1) for _ in range(3)], return_exceptions=True
+        )
+        self.assertTrue(all(isinstance(x, ValueError) for x in results))
+        self.assertEqual(calls, [1])
+
+        with self.assertRaises(ValueError):
+            await fetch(1)
+        self.assertEqual(calls, [1, 1])
+
+    async def test_cancel_first_caller(self):
+        calls = []
+
+        @AsyncCache()
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0.02)
+            return key
+
+        first = asyncio.ensure_future(fetch(1))
+        second = asyncio.ensure_future(fetch(1))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        self.assertEqual(await second, 1)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(await fetch(1), 1)
+        self.assertEqual(calls, [1])
+
+    async def test_lru_eviction(self):
+        calls = []
+
+        @AsyncCache(maxsize=2)
+        async def fetch(key):
+            calls.append(key)
+            return key
+
+        for key in [1, 2, 1, 3, 1, 2]:
+            await fetch(key)
+        self.assertEqual(calls, [1, 2, 3, 2])
+        self.assertEqual(fetch.cache_info()["size"], 2)
+
+    async def test_ttl(self):
+        calls = []
+
+        @AsyncCache(ttl=datetime.timedelta(seconds=0))
+        async def fetch(key):
+            calls.append(key)
+            return key
+
+        await fetch(1)
+        await asyncio.sleep(0.001)
+        await fetch(1)
+        self.assertEqual(calls, [1, 1])
+
+
+class TestCache(unittest.TestCase):
+    def test_method_shares_cache(self):
+        calls = []
+
+        class Api:
+            @Cache
+            def get(self, key, page=1):
+                calls.append((key, page))
+                return {}
+
+        self.assertEqual(Api().get("a"), {})
+        self.assertEqual(Api().get("a", page=1), {})
+        self.assertEqual(Api().get("a", 2), {})
+        self.assertEqual(calls, [("a", 1), ("a", 2)])
+
+
+class TestCacheKey(unittest.TestCase):
+    def test_fast_path_matches_bound_key(self):
+        def get(self, key, page=1):
+            pass
+
+        get_key = make_key_func(get)
+        key = get_key(object(), "a", 1)
+        self.assertEqual(get_key(object(), "a"), key)
+        self.assertEqual(get_key(object(), key="a", page=1), key)
+
+    def test_scalar_types_differ(self):
+        def get(key, page=1):
+            pass
+
+        get_key = make_key_func(get)
+        keys = {get_key(1), get_key(True), get_key(1.0), get_key("1")}
+        self.assertEqual(len(keys), 4)
+        self.assertNotEqual(get_key([1], page={"a": 1}), get_key([True], page={"a": True}))
+
+    def test_unhashable_args(self):
+        def get(ids, **kwargs):
+            pass
+
+        get_key = make_key_func(get)
+        self.assertEqual(get_key([1, 2], a={"b": 1}), get_key([1, 2], a={"b": 1}))
+        self.assertNotEqual(get_key([1, 2]), get_key((1, 2)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import tempfile
+import unittest
+
+from unittest import mock
+
+from pathlib import Path
+
+from core import CheckTranslate
+from core.CheckTranslate import check_translate, diff_translation, sync_translation
+from core.LocalGame import LocalGame
+from FileDataPath import ZH_MScenesPath, ZH_MAdultsPath, TranslationHashPath
+
+
+class TestDiffTranslation(unittest.TestCase):
+    def test_diff(self):
+        server_hashes = {"1": "a", "2": "b", "3": "c"}
+        local_hashes = {"1": "a", "2": "old", "4": "d"}
+        added, changed, removed = diff_translation(server_hashes, local_hashes, ["1", "2", "4"])
+        self.assertEqual(added, ["3"])
+        self.assertEqual(changed, ["2"])
+        self.assertEqual(removed, ["4"])
+
+    def test_unrecorded_local_file_is_changed(self):
+        added, changed, removed = diff_translation({"1": "a"}, {}, ["1"])
+        self.assertEqual((added, changed, removed), ([], ["1"], []))
+
+
+class TestSyncTranslation(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    async def sync(self, server_data, local_hashes, prune=False):
+        async def download(ids, server_path, output_path):
+            self.downloaded.extend(ids)
+            for id in ids:
+                (output_path / id).write_text(server_path)
+            return ids
+
+        self.downloaded = []
+        with mock.patch.object(CheckTranslate, "download", side_effect=download):
+            return await sync_translation(
+                "test", "jsoncn/", self.root, server_data, local_hashes, prune, exclude_ids=("MStory",)
+            )
+
+    async def test_first_run_downloads_once(self):
+        # 首次运行: 本地已有旧文件但没有 hash 记录
+        (self.root / "1").write_text("old")
+        server_data = {"1": "a", "2": {"hash": "b"}, "MStory": "x", "sub": {"3": "c"}}
+
+        local_hashes = await self.sync(server_data, {})
+        self.assertEqual(sorted(self.downloaded), ["1", "2"])
+        self.assertEqual(local_hashes, {"1": "a", "2": "b"})
+        self.assertEqual((self.root / "1").read_text(), "jsoncn/")
+
+        local_hashes = await self.sync(server_data, local_hashes)
+        self.assertEqual(self.downloaded, [])
+
+    async def test_first_run_seeds_from_content(self):
+        (self.root / "1").write_bytes(b'{"a": 1}')
+        (self.root / "2").write_bytes(b'{"b": 1}')
+        server_data = {
+            "1": hashlib.sha1(b'{"a": 1}').hexdigest(),
+            "2": hashlib.sha1(b'{"b": 2}').hexdigest(),
+        }
+
+        local_hashes = await self.sync(server_data, {})
+        self.assertEqual(self.downloaded, ["2"])
+        self.assertEqual(local_hashes, server_data)
+
+    async def test_prune(self):
+        (self.root / "1").write_text("old")
+        local_hashes = await self.sync({}, {"1": "a"}, prune=True)
+        self.assertEqual(local_hashes, {})
+        self.assertFalse((self.root / "1").exists())
+
+
+class TestCheckTranslate(unittest.IsolatedAsyncioTestCase):
+    async def test_manifest_next_to_output(self):
+        with tempfile.TemporaryDirectory() as game_root, tempfile.TemporaryDirectory() as output:
+            lg = LocalGame(Path(game_root))
+            (lg.game_root / ZH_MScenesPath).mkdir(parents=True)
+            (lg.game_root / ZH_MAdultsPath).mkdir(parents=True)
+
+            server = mock.Mock(init=mock.AsyncMock())
+            server.hash_data = {"typeadv": {"MScenes_TW": {"1": "a"}}, "jsoncn": {"2": "b"}}
+
+            async def download(ids, server_path, output_path):
+                return ids
+
+            with mock.patch.object(CheckTranslate, "GitHubServer", return_value=server), mock.patch.object(
+                CheckTranslate, "download", side_effect=download
+            ):
+                await check_translate(lg, Path(output))
+
+            self.assertFalse((lg.game_root / TranslationHashPath).exists())
+            self.assertEqual(
+                lg.getTranslationHash(Path(output)), {ZH_MScenesPath: {"1": "a"}, ZH_MAdultsPath: {"2": "b"}}
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import unittest
+
+from utils.coalescer import RequestCoalescer
+
+
+class TestRequestCoalescer(unittest.IsolatedAsyncioTestCase):
+    async def test_coalesce_in_flight_and_completed(self):
+        coalescer = RequestCoalescer()
+        calls = []
+
+        @coalescer.coalesce("bg/adventure/{bg_id}")
+        async def save_bg(bg_id, output_path=None):
+            calls.append(bg_id)
+            await asyncio.sleep(0.01)
+            return bg_id
+
+        results = await asyncio.gather(save_bg("a"), save_bg("a"), save_bg("b"))
+        self.assertEqual(results, ["a", "a", "b"])
+        self.assertEqual(await save_bg(bg_id="a"), "a")
+        self.assertEqual(sorted(calls), ["a", "b"])
+        self.assertEqual(coalescer.info(), {"hits": 2, "misses": 2, "size": 2})
+
+        coalescer.reset()
+        await save_bg("a")
+        self.assertEqual(sorted(calls), ["a", "a", "b"])
+
+    async def test_failure_not_remembered(self):
+        coalescer = RequestCoalescer()
+        calls = []
+
+        @coalescer.coalesce("sound/bgm/{name}")
+        async def save_bgm(name):
+            calls.append(name)
+            await asyncio.sleep(0.01)
+            if len(calls) == 1:
+                raise ValueError(name)
+            return name
+
+        results = await asyncio.gather(save_bgm("x"), save_bgm("x"), return_exceptions=True)
+        self.assertTrue(all(isinstance(x, ValueError) for x in results))
+        self.assertEqual(await save_bgm("x"), "x")
+        self.assertEqual(calls, ["x", "x"])
+
+    async def test_cancel_one_waiter(self):
+        coalescer = RequestCoalescer()
+
+        @coalescer.coalesce("chara/res/{char_id}")
+        async def save_chara(char_id):
+            await asyncio.sleep(0.02)
+            return char_id
+
+        first = asyncio.ensure_future(save_chara(1))
+        second = asyncio.ensure_future(save_chara(1))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import hashlib
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from core.DownloadAssets import (
+    AssetVerifyFileName,
+    diff_patch,
+    load_applied_patch,
+    save_applied_patch,
+    verify_assets,
+)
+
+
+class TestDiffPatch(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.out_path = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, url_path, size):
+        path = self.out_path / url_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"0" * size)
+
+    def test_first_sync_uses_size(self):
+        self.write("bg/1", 3)
+        self.write("bg/2", 5)
+        new_patch = {"bg/1": ("a", 3), "bg/2": ("b", 4), "bg/3": ("c", 1)}
+        self.assertEqual(diff_patch(None, new_patch, self.out_path), (["bg/2", "bg/3"], [], []))
+
+    def test_delta(self):
+        self.write("bg/1", 3)
+        self.write("bg/2", 3)
+        self.write("bg/4", 3)
+        old_patch = {"bg/1": ("a", 3), "bg/2": ("b", 3), "bg/4": ("d", 3), "bg/5": ("e", 3)}
+        new_patch = {"bg/1": ("a", 3), "bg/2": ("x", 3), "bg/3": ("c", 3), "bg/5": ("e", 3)}
+        added, changed, removed = diff_patch(old_patch, new_patch, self.out_path)
+        self.assertEqual(added, ["bg/3"])
+        # bg/5 本地缺失
+        self.assertEqual(changed, ["bg/2", "bg/5"])
+        self.assertEqual(removed, ["bg/4"])
+
+    def test_encrypted_size(self):
+        # 本地保存的是解密后去掉填充的内容, 比列表中的大小小 1-16 字节
+        self.write("chara/still/1", 30)
+        self.write("chara/still/2", 32)
+        self.write("chara/still/3", 15)
+        patch = {"chara/still/1": ("a", 32), "chara/still/2": ("b", 32), "chara/still/3": ("c", 32)}
+        self.assertEqual(diff_patch(patch, patch, self.out_path), ([], ["chara/still/2", "chara/still/3"], []))
+
+    def test_save_and_load(self):
+        patch = {"chara/still/1": ("a", 3), "bg/2": ("b", 10)}
+        save_applied_patch(self.out_path, patch)
+        self.assertEqual(load_applied_patch(self.out_path), patch)
+
+
+class TestVerifyAssets(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.out_path = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_verify(self):
+        (self.out_path / "bg").mkdir()
+        (self.out_path / "bg/1").write_bytes(b"abc")
+        (self.out_path / "bg/2").write_bytes(b"abd")
+        (self.out_path / "bg/3").write_bytes(b"")
+        md5 = hashlib.md5(b"abc").hexdigest()
+        patch = {
+            "bg/1": (md5, 3),
+            "bg/2": (md5, 3),
+            "bg/3": (hashlib.md5().hexdigest(), 0),
+            "bg/4": (md5, 3),
+        }
+        self.assertEqual(asyncio.run(verify_assets(self.out_path, patch)), ["bg/2", "bg/4"])
+        self.assertTrue((self.out_path / AssetVerifyFileName).exists())
+
+        # 文件没有变化时使用缓存的 md5
+        (self.out_path / AssetVerifyFileName).write_text(
+            '{"bg/1": [3, %d, "%s"]}' % ((self.out_path / "bg/1").stat().st_mtime_ns, "0" * 32)
+        )
+        self.assertEqual(asyncio.run(verify_assets(self.out_path, {"bg/1": (md5, 3)})), ["bg/1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
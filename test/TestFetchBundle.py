@@ -0,0 +1,70 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+
+from types import SimpleNamespace
+from unittest import mock
+
+from pathlib import Path
+
+from core import FetchGameRes
+from core.FetchGameRes import fetch_bundle
+from utils import Error_Message
+
+
+class StubResource:
+    def __init__(self, status_ok=True):
+        self.status_ok = status_ok
+        self.paths = []
+
+    async def saveAssetsFromPath(self, url_path: str, file_path: Path) -> bool:
+        self.paths.append(url_path)
+        if not self.status_ok:
+            return False
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(b"bundle")
+        return True
+
+
+class TestFetchBundle(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(
+            FetchGameRes, "BundleCachePath", Path(self.temp_dir.name)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    async def test_file_removed_after_extract(self):
+        resource = StubResource()
+        GameApi = SimpleNamespace(resource=resource)
+        async with fetch_bundle(GameApi, "bg/adventure/1") as bundle_path:
+            # 解包函数拿到的是文件路径, 不是整个资源包的数据
+            self.assertIsInstance(bundle_path, Path)
+            self.assertEqual(bundle_path.read_bytes(), b"bundle")
+        self.assertFalse(bundle_path.exists())
+        self.assertEqual(resource.paths, ["bg/adventure/1"])
+
+    async def test_file_removed_on_error(self):
+        GameApi = SimpleNamespace(resource=StubResource())
+        with self.assertRaises(ValueError):
+            async with fetch_bundle(GameApi, "sound/bgm/1") as bundle_path:
+                raise ValueError
+        self.assertFalse(bundle_path.exists())
+
+    async def test_download_failed(self):
+        GameApi = SimpleNamespace(resource=StubResource(status_ok=False))
+        with self.assertRaises(Error_Message):
+            async with fetch_bundle(GameApi, "chara/stand/1"):
+                self.fail("下载失败时不应该解包")
+
+
+if __name__ == "__main__":
+    unittest.main()
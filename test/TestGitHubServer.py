@@ -0,0 +1,57 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import unittest
+
+from core.DataServer.GitHubServer import str_path_to_dict
+
+
+def recursive_str_path_to_dict(raw_data):
+    # 旧版实现, 用于对比结果
+    data = {}
+    for key, value in raw_data.items():
+        if "\\" in key:
+            path, sub_key = key.split("\\", 1)
+            if path not in data:
+                data[path] = {}
+
+            data[path] = recursive_str_path_to_dict({**data[path], **{sub_key: value}})
+
+        else:
+            data[key] = value
+    return data
+
+
+def make_manifest(count):
+    raw_data = {"hash.json.gz": "0"}
+    for i in range(count):
+        raw_data[f"typeadv\\MScenes\\{i}"] = f"a{i}"
+        raw_data[f"typeadv\\MScenes_TW\\{i}"] = f"b{i}"
+        raw_data[f"json\\{i}"] = f"c{i}"
+        raw_data[f"client\\js\\{i}.js"] = f"d{i}"
+    return raw_data
+
+
+class TestStrPathToDict(unittest.TestCase):
+    def test_same_as_recursive(self):
+        raw_data = make_manifest(200)
+        self.assertEqual(str_path_to_dict(raw_data), recursive_str_path_to_dict(raw_data))
+
+    def test_access(self):
+        hash_data = str_path_to_dict(make_manifest(10))
+        self.assertEqual(hash_data["typeadv"]["MScenes"]["3"], "a3")
+        self.assertEqual(hash_data["client"]["js"]["9.js"], "d9")
+        self.assertEqual(hash_data["hash.json.gz"], "0")
+
+    def test_linear_time(self):
+        raw_data = make_manifest(20000)
+        start = time.perf_counter()
+        str_path_to_dict(raw_data)
+        self.assertLess(time.perf_counter() - start, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,190 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import copy
+import pickle
+import asyncio
+import tempfile
+import unittest
+
+import numpy as np
+
+from unittest import mock
+
+from PIL import Image
+
+from lib.flowery.flowery import Imager, ExecutorRegistry
+
+
+class TestImagerTransparency(unittest.IsolatedAsyncioTestCase):
+    def test_short_circuit_without_scan(self):
+        rgb = Image.new("RGB", (8, 8))
+        palette = Image.new("P", (8, 8))
+        with mock.patch.object(Image.Image, "getextrema") as getextrema, mock.patch.object(
+            Image.Image, "getcolors"
+        ) as getcolors:
+            self.assertFalse(Imager.has_transparency(Imager(rgb)))
+            self.assertFalse(Imager.has_transparency(Imager(palette)))
+            self.assertTrue(Imager.has_transparency(Imager(Image.new("RGBA", (8, 8)), transparent=True)))
+        getextrema.assert_not_called()
+        getcolors.assert_not_called()
+
+    def test_palette_transparency(self):
+        image = Image.new("P", (8, 8), 1)
+        image.info["transparency"] = 1
+        self.assertTrue(Imager.has_transparency(image))
+        image.info["transparency"] = bytes([255, 0])
+        self.assertTrue(Imager.has_transparency(image))
+        image.info["transparency"] = bytes([0, 255])
+        self.assertFalse(Imager.has_transparency(image))
+
+    def test_cache_and_invalidate(self):
+        ima = Imager(Image.new("RGBA", (8, 8), (0, 0, 0, 255)))
+        with mock.patch.object(Imager, "_scan_transparency", wraps=Imager._scan_transparency) as scan:
+            self.assertFalse(Imager.has_transparency(ima))
+            self.assertFalse(Imager.has_transparency(ima))
+            self.assertEqual(scan.call_count, 1)
+
+            ima.putalpha(0)
+            self.assertTrue(Imager.has_transparency(ima))
+            self.assertEqual(scan.call_count, 2)
+
+            ima.image = Image.new("RGB", (8, 8))
+            self.assertFalse(Imager.has_transparency(ima))
+            self.assertEqual(scan.call_count, 3)
+
+    async def test_opacity_sets_cache(self):
+        ima = Imager(Image.new("RGBA", (8, 8), (0, 0, 0, 255)))
+        await ima.opacity(0.5)
+        self.assertTrue(ima._transparency)
+        self.assertEqual(ima.getpixel((0, 0))[3], 127)
+
+    def test_private_attribute_guard(self):
+        ima = Imager.__new__(Imager)
+        with self.assertRaises(AttributeError):
+            ima._image
+        with self.assertRaises(AttributeError):
+            ima.size
+        self.assertEqual(copy.copy(Imager(Image.new("RGB", (4, 2)))).size, (4, 2))
+
+
+def random_rgba(size, seed):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 256, (size[1], size[0], 4), dtype=np.uint8)
+    data[..., 3][::3] = 255
+    return Image.fromarray(data, "RGBA")
+
+
+def visible(image: Image.Image):
+    """完全透明的像素颜色不影响显示, 比较前置为 0"""
+    data = np.asarray(image.convert("RGBA")).copy()
+    data[data[..., 3] == 0] = 0
+    return data
+
+
+async def build_imager(lazy):
+    ima = Imager(Image.new("RGB", (64, 48), (10, 20, 30)), lazy=lazy)
+    ima.convert("RGBA")
+    await ima.paste(Imager(random_rgba((20, 10), 1)), (5, 5))
+    await ima.paste(Imager(random_rgba((30, 30), 2)), (50, 40))
+    await ima.paste(Imager(random_rgba((16, 16), 3)), (-4, -6))
+    await ima.paste(Imager(random_rgba((64, 48), 4)), reverse=True)
+    await ima.flip("y")
+    await ima.paste(Imager(Image.new("RGB", (8, 8), (255, 0, 0))), (32, 24), "mm")
+    await ima.opacity(200)
+    return ima
+
+
+class TestImagerLazy(unittest.IsolatedAsyncioTestCase):
+
+    async def test_same_result_as_eager(self):
+        eager = await build_imager(lazy=False)
+        lazy = await build_imager(lazy=True)
+        self.assertEqual(len(lazy._pending), 8)
+        self.assertTrue((visible(lazy.image) == visible(eager.image)).all())
+        self.assertEqual(lazy._pending, [])
+
+    async def test_single_thread_hop(self):
+        before = ExecutorRegistry.stats()["submitted"]
+        ima = await build_imager(lazy=True)
+        with mock.patch.object(Image.Image, "save") as save:
+            await ima.save("out.png")
+        self.assertEqual(ExecutorRegistry.stats()["submitted"] - before, 1)
+        save.assert_called_once()
+
+    async def test_convert_skips_same_mode(self):
+        ima = Imager(Image.new("RGBA", (8, 8)), lazy=True)
+        ima.convert("RGBA")
+        await ima.paste(Imager(Image.new("RGBA", (4, 4), (1, 2, 3, 128))))
+        with mock.patch.object(Image.Image, "convert") as convert:
+            await ima.render()
+        convert.assert_not_called()
+
+    async def test_pickle_pending(self):
+        ima = await build_imager(lazy=True)
+        restored = pickle.loads(pickle.dumps(ima))
+        self.assertEqual(len(restored._pending), 8)
+        self.assertTrue((visible(restored.image) == visible(ima.image)).all())
+
+
+class TestImagerProcess(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        ExecutorRegistry.configure("test_image_process", "process", 1)
+
+    def tearDown(self):
+        ExecutorRegistry.shutdown()
+
+    async def test_render_in_process(self):
+        eager = await build_imager(lazy=False)
+        ima = await build_imager(lazy=True)
+        await ima.render(executor="test_image_process")
+        self.assertEqual(ima._pending, [])
+        self.assertTrue((visible(ima.image) == visible(eager.image)).all())
+        self.assertEqual(ExecutorRegistry.stats("test_image_process")["completed"], 1)
+
+    async def test_save_in_process(self):
+        eager = await build_imager(lazy=False)
+        ima = await build_imager(lazy=True)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_path = os.path.join(temp_dir, "out.png")
+            await ima.save(file_path, executor="test_image_process", compress_level=1)
+            with Image.open(file_path) as saved:
+                self.assertTrue((visible(saved) == visible(eager.image)).all())
+        # 子进程中执行, 当前对象的操作仍然保留
+        self.assertEqual(len(ima._pending), 8)
+
+
+def square(x):
+    return x * x
+
+
+class TestExecutorRegistry(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        ExecutorRegistry.shutdown()
+
+    async def test_thread_stats(self):
+        ExecutorRegistry.configure("test_thread", "thread", 1)
+        results = await asyncio.gather(*[ExecutorRegistry.run("test_thread", square, x) for x in range(4)])
+        self.assertEqual(results, [0, 1, 4, 9])
+
+        stats = ExecutorRegistry.stats("test_thread")
+        self.assertEqual(stats["workers"], 1)
+        self.assertEqual(stats["completed"], 4)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["queued"], 0)
+        self.assertGreaterEqual(stats["busy_time"], 0)
+
+    async def test_process_pool(self):
+        ExecutorRegistry.configure("test_process", "process", 1)
+        self.assertEqual(await ExecutorRegistry.run("test_process", square, 3), 9)
+        self.assertEqual(ExecutorRegistry.stats("test_process")["kind"], "process")
+
+    def test_image_executor_must_be_thread(self):
+        with self.assertRaises(ValueError):
+            ExecutorRegistry.configure("image", "process")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import tempfile
+import unittest
+
+from unittest import mock
+
+from pathlib import Path
+
+from aiohttp import web
+
+from utils import SessionPool
+from core import InstallClient
+from core.InstallClient import OFFLINE_INDEX, flatten_hash_tree, is_up_to_date
+from core.LocalGame import LocalGame
+from core.DataServer.GitHubFileFetcher import GitHubFileFetcher
+
+OLD_INDEX = b"<html>old</html>"
+NEW_INDEX = b"<html>" + b"new" * 10000 + b"</html>"
+APP_JS = b"console.log('app')"
+
+
+def sha1(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+class TestIsUpToDate(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.temp_dir.name) / "index.html"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_missing_file(self):
+        self.assertFalse(is_up_to_date(self.path, sha1(OLD_INDEX), sha1(OLD_INDEX)))
+        self.path.write_bytes(OLD_INDEX)
+        self.assertFalse(is_up_to_date(self.path, None, None))
+
+    def test_content_hash(self):
+        self.path.write_bytes(OLD_INDEX)
+        self.assertTrue(is_up_to_date(self.path, sha1(OLD_INDEX), None))
+        self.assertTrue(is_up_to_date(self.path, hashlib.md5(OLD_INDEX).hexdigest(), None))
+        # 本地文件被改动时即使记录一致也需要更新
+        self.assertFalse(is_up_to_date(self.path, sha1(NEW_INDEX), sha1(NEW_INDEX)))
+
+    def test_unknown_hash_uses_record(self):
+        self.path.write_bytes(OLD_INDEX)
+        self.assertTrue(is_up_to_date(self.path, "v1", "v1"))
+        self.assertFalse(is_up_to_date(self.path, "v2", "v1"))
+
+    def test_flatten_hash_tree(self):
+        tree = {"index.html": "a", "js": {"app.js": {"hash": "b"}, "lib": {"x.js": "c"}}}
+        self.assertEqual(
+            flatten_hash_tree(tree), {"index.html": "a", "js/app.js": "b", "js/lib/x.js": "c"}
+        )
+
+
+class TestInstallClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.interrupt = True
+
+        async def handler(request: web.Request):
+            name = request.match_info["name"]
+            data = {OFFLINE_INDEX: NEW_INDEX, "js/app.js": APP_JS}[name]
+            resp = web.StreamResponse(headers={"Content-Length": str(len(data))})
+            await resp.prepare(request)
+            if name == OFFLINE_INDEX and self.interrupt:
+                # 只发送一半数据后断开连接
+                await resp.write(data[: len(data) // 2])
+                request.transport.close()
+                return resp
+            await resp.write(data)
+            await resp.write_eof()
+            return resp
+
+        app = web.Application()
+        app.router.add_get("/client/{name:.+}", handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        base_url = f"http://127.0.0.1:{self.runner.addresses[0][1]}/"
+
+        fetcher = GitHubFileFetcher("repo", "main", "", proxy=False)
+        fetcher.get_github_file_url = mock.AsyncMock(return_value=base_url)
+
+        async def save_server_binary(name, server_path, output_path):
+            return await fetcher.fetch_to_file(f"{server_path}{name}", output_path / name)
+
+        server = mock.Mock(init=mock.AsyncMock())
+        server.hash_data = {
+            "client": {
+                "index.html": sha1(OLD_INDEX),
+                OFFLINE_INDEX: sha1(NEW_INDEX),
+                "js": {"app.js": sha1(APP_JS)},
+            }
+        }
+        self.patches = [
+            mock.patch.object(InstallClient, "GitHubServer", return_value=server),
+            mock.patch.object(InstallClient, "save_server_binary", side_effect=save_server_binary),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.game_root = Path(self.temp_dir.name)
+        (self.game_root / "index.html").write_bytes(OLD_INDEX)
+        self.lg = LocalGame(self.game_root)
+
+    async def asyncTearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        await SessionPool.close_all()
+        await self.runner.cleanup()
+        self.temp_dir.cleanup()
+
+    async def test_interrupted_fetch_keeps_old_index(self):
+        await InstallClient.install_client(self.lg)
+
+        self.assertEqual((self.game_root / "index.html").read_bytes(), OLD_INDEX)
+        self.assertFalse((self.game_root / OFFLINE_INDEX).exists())
+        self.assertEqual((self.game_root / "js" / "app.js").read_bytes(), APP_JS)
+        self.assertEqual(
+            sorted(x.name for x in self.game_root.iterdir()), ["index.html", "js", "update_manifest"]
+        )
+        self.assertEqual(self.lg.getClientHash(), {"js/app.js": sha1(APP_JS)})
+
+        self.interrupt = False
+        await InstallClient.install_client(self.lg)
+        self.assertEqual((self.game_root / "index.html").read_bytes(), NEW_INDEX)
+        self.assertFalse((self.game_root / OFFLINE_INDEX).exists())
+        self.assertIn(OFFLINE_INDEX, self.lg.getClientHash())
+
+
+if __name__ == "__main__":
+    unittest.main()
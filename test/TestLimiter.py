@@ -0,0 +1,70 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import unittest
+
+from utils.limiter import AdaptiveLimiter
+
+
+class TestAdaptiveLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrency_within_limit(self):
+        limiter = AdaptiveLimiter("http://test", initial_limit=3, max_limit=3)
+        running = 0
+        max_running = 0
+
+        async def request():
+            nonlocal running, max_running
+            async with limiter.slot() as slot:
+                running += 1
+                max_running = max(max_running, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+                slot.record(200)
+
+        await asyncio.gather(*[request() for _ in range(20)])
+        self.assertEqual(max_running, 3)
+        self.assertEqual(limiter.stats()["completed"], 20)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_additive_increase(self):
+        limiter = AdaptiveLimiter("http://test", initial_limit=2, max_limit=10)
+        for _ in range(10):
+            async with limiter.slot() as slot:
+                slot.record(200)
+        self.assertGreater(limiter.limit, 2)
+        self.assertLessEqual(limiter.limit, 10)
+
+    async def test_multiplicative_decrease(self):
+        limiter = AdaptiveLimiter("http://test", initial_limit=8, max_limit=10)
+        async with limiter.slot() as slot:
+            slot.record(429)
+        self.assertEqual(limiter.stats()["limit"], 4)
+
+        # 同一轮的失败只减半一次
+        async with limiter.slot() as slot:
+            slot.record(503)
+        self.assertEqual(limiter.stats()["limit"], 4)
+        self.assertEqual(limiter.stats()["throttled"], 2)
+
+    async def test_timeout_backs_off(self):
+        limiter = AdaptiveLimiter("http://test", initial_limit=4, min_limit=1)
+        with self.assertRaises(asyncio.TimeoutError):
+            async with limiter.slot():
+                raise asyncio.TimeoutError()
+        self.assertEqual(limiter.stats()["limit"], 2)
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_shared_per_host(self):
+        self.assertIs(
+            AdaptiveLimiter.get("https://a.com/x"), AdaptiveLimiter.get("https://a.com/y")
+        )
+        self.assertIsNot(
+            AdaptiveLimiter.get("https://a.com/x"), AdaptiveLimiter.get("https://b.com/x")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from aiohttp import web
+
+from utils.session import HTTPSessionApi, SessionPool, parse_content_range
+
+DATA = bytes(range(256)) * 1024
+ETAG = '"v1"'
+
+
+class TestParseContentRange(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_content_range("bytes 100-199/1000"), (100, 1000))
+        self.assertEqual(parse_content_range("bytes 100-199/*"), (100, None))
+        self.assertEqual(parse_content_range("invalid"), (None, None))
+
+
+class TestResumeDownload(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests = []
+        self.fail_first = True
+
+        async def handler(request: web.Request):
+            self.requests.append(dict(request.headers))
+            start = 0
+            if "Range" in request.headers and request.headers.get("If-Range") == ETAG:
+                start = int(request.headers["Range"][len("bytes=") : -1])
+
+            resp = web.StreamResponse(status=206 if start else 200)
+            resp.headers["ETag"] = ETAG
+            resp.content_length = len(DATA) - start
+            if start:
+                resp.headers["Content-Range"] = f"bytes {start}-{len(DATA) - 1}/{len(DATA)}"
+            await resp.prepare(request)
+
+            if self.fail_first:
+                # 只发送一半数据后断开连接
+                self.fail_first = False
+                await resp.write(DATA[start : len(DATA) // 2])
+                request.transport.close()
+                return resp
+
+            await resp.write(DATA[start:])
+            await resp.write_eof()
+            return resp
+
+        app = web.Application()
+        app.router.add_get("/file", handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+
+        self.api = HTTPSessionApi(f"http://127.0.0.1:{port}/")
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    async def asyncTearDown(self):
+        await SessionPool.close_all()
+        await self.runner.cleanup()
+        self.temp_dir.cleanup()
+
+    async def test_resume(self):
+        file_path = Path(self.temp_dir.name) / "file"
+        res = await self.api.request_to_file("file", file_path)
+
+        self.assertEqual(res.status, 206)
+        self.assertEqual(file_path.read_bytes(), DATA)
+        self.assertEqual(len(self.requests), 2)
+        self.assertNotIn("Range", self.requests[0])
+        self.assertEqual(self.requests[1]["Range"], f"bytes={len(DATA) // 2}-")
+        self.assertEqual(os.listdir(self.temp_dir.name), ["file"])
+
+    async def test_without_resume(self):
+        file_path = Path(self.temp_dir.name) / "file"
+        res = await self.api.request_to_file("file", file_path, resume=False)
+
+        self.assertEqual(res.status, 200)
+        self.assertEqual(file_path.read_bytes(), DATA)
+        self.assertNotIn("Range", self.requests[1])
+
+    async def test_close_session_keeps_other_hosts(self):
+        session = SessionPool.get(self.api.host)
+        other = SessionPool.get("http://localhost:1/")
+        await self.api.close_session()
+
+        self.assertTrue(session.closed)
+        self.assertFalse(other.closed)
+        self.assertIsNot(SessionPool.get(self.api.host), session)
+
+    async def test_ssl_verify_per_origin(self):
+        SessionPool.skip_ssl_verify("https://assets.example.com/a/")
+        try:
+            self.assertIs(SessionPool.get("https://assets.example.com/b")._connector._ssl, False)
+            self.assertIs(SessionPool.get("https://raw.githubusercontent.com/x")._connector._ssl, True)
+        finally:
+            SessionPool._insecure_origins.discard("https://assets.example.com")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from aiohttp import web
+
+from utils import AdaptiveLimiter, SegmentedDownloader, SessionPool
+from utils.helper import Error_Message
+
+DATA = os.urandom(300 * 1024 + 7)
+ETAG = '"v1"'
+
+
+class TestSegmentedDownloader(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.ranges = []
+        self.support_range = True
+        self.throttle = 0
+        self.etag = ETAG
+
+        async def handler(request: web.Request):
+            if not self.support_range or "Range" not in request.headers:
+                return web.Response(body=DATA)
+            if request.headers.get("If-Range", self.etag) != self.etag:
+                return web.Response(body=DATA, headers={"ETag": self.etag})
+            if self.throttle > 0 and request.headers["Range"] != "bytes=0-0":
+                self.throttle -= 1
+                return web.Response(status=503, headers={"Retry-After": "0"})
+
+            start, end = request.headers["Range"][len("bytes=") :].split("-")
+            start, end = int(start), int(end or len(DATA) - 1)
+            self.ranges.append((start, end))
+            return web.Response(
+                status=206,
+                body=DATA[start : end + 1],
+                headers={
+                    "ETag": self.etag,
+                    "Content-Range": f"bytes {start}-{end}/{len(DATA)}",
+                },
+            )
+
+        app = web.Application()
+        app.router.add_get("/chara_icon", handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self.runner.addresses[0][1]}/chara_icon"
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.file_path = Path(self.temp_dir.name) / "chara_icon"
+
+    async def asyncTearDown(self):
+        await SessionPool.close_all()
+        await self.runner.cleanup()
+        self.temp_dir.cleanup()
+
+    async def test_segments(self):
+        progress = []
+        downloader = SegmentedDownloader(
+            self.url,
+            self.file_path,
+            segments=4,
+            min_segment_size=64 * 1024,
+            progress_handler=lambda done, total: progress.append((done, total)),
+        )
+        await downloader.download()
+
+        self.assertEqual(self.file_path.read_bytes(), DATA)
+        # 第一个是获取文件大小的请求
+        self.assertEqual(len(self.ranges), 5)
+        self.assertEqual(progress[-1], (len(DATA), len(DATA)))
+        self.assertEqual(AdaptiveLimiter.get(self.url).completed, 5)
+        self.assertEqual(os.listdir(self.temp_dir.name), ["chara_icon"])
+
+    async def test_resume(self):
+        downloader = SegmentedDownloader(
+            self.url, self.file_path, segments=2, min_segment_size=64 * 1024
+        )
+        half = len(DATA) // 2
+        downloader._save_meta(
+            {
+                "validator": {"etag": ETAG, "last_modified": None, "length": len(DATA)},
+                "ranges": [[0, half - 1], [half, len(DATA) - 1]],
+            }
+        )
+        downloader._part_path(0).write_bytes(DATA[:half])
+        downloader._part_path(1).write_bytes(DATA[half : half + 100])
+
+        await downloader.download()
+
+        self.assertEqual(self.file_path.read_bytes(), DATA)
+        self.assertEqual(self.ranges[1:], [(half + 100, len(DATA) - 1)])
+
+    def save_half(self, downloader):
+        half = len(DATA) // 2
+        downloader._save_meta(
+            {
+                "validator": {"etag": ETAG, "last_modified": None, "length": len(DATA)},
+                "ranges": [[0, half - 1], [half, len(DATA) - 1]],
+            }
+        )
+        downloader._part_path(0).write_bytes(DATA[:half])
+        downloader._part_path(1).write_bytes(DATA[half : half + 100])
+
+    async def test_retry_throttled_segment(self):
+        self.throttle = 2
+        downloader = SegmentedDownloader(
+            self.url, self.file_path, segments=2, min_segment_size=64 * 1024
+        )
+        self.save_half(downloader)
+
+        await downloader.download()
+        self.assertEqual(self.file_path.read_bytes(), DATA)
+        self.assertEqual(self.throttle, 0)
+
+    async def test_throttled_keeps_parts(self):
+        self.throttle = 100
+        downloader = SegmentedDownloader(
+            self.url, self.file_path, segments=2, min_segment_size=64 * 1024, retries=2
+        )
+        self.save_half(downloader)
+
+        with self.assertRaises(Error_Message):
+            await downloader.download()
+        self.assertTrue(downloader.meta_path.exists())
+        self.assertEqual(downloader._part_path(1).stat().st_size, 100)
+
+    async def test_changed_file_clears_parts(self):
+        downloader = SegmentedDownloader(
+            self.url, self.file_path, segments=2, min_segment_size=64 * 1024
+        )
+        self.save_half(downloader)
+        # 探测后服务器文件变化, If-Range 不匹配时返回 200
+        probe = downloader._probe
+
+        async def probe_then_change(session):
+            result = await probe(session)
+            self.etag = '"v2"'
+            return result
+
+        downloader._probe = probe_then_change
+        with self.assertRaises(Error_Message):
+            await downloader.download()
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    async def test_merge_size_mismatch_clears_parts(self):
+        downloader = SegmentedDownloader(
+            self.url, self.file_path, segments=2, min_segment_size=64 * 1024
+        )
+        half = len(DATA) // 2
+        downloader._save_meta(
+            {
+                "validator": {"etag": ETAG, "last_modified": None, "length": len(DATA)},
+                "ranges": [[0, half - 1], [half, len(DATA) - 1]],
+            }
+        )
+        # 分段文件比范围长, 合并后大小不一致
+        downloader._part_path(0).write_bytes(DATA[:half] + b"xx")
+
+        with self.assertRaises(Error_Message):
+            await downloader.download()
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+        await downloader.download()
+        self.assertEqual(self.file_path.read_bytes(), DATA)
+
+    async def test_without_range(self):
+        self.support_range = False
+        await SegmentedDownloader(self.url, self.file_path).download()
+        self.assertEqual(self.file_path.read_bytes(), DATA)
+
+
+if __name__ == "__main__":
+    unittest.main()
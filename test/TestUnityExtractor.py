@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from PIL import Image
+
+from core import UnityExtractor
+
+
+class TestOutputProfile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.image = Image.new("RGBA", (32, 16), (10, 20, 30, 128))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        UnityExtractor.set_output_profile({})
+
+    def test_default_png(self):
+        file_path = self.root / "body.png"
+        UnityExtractor.save_image(self.image, file_path)
+        with Image.open(file_path) as image:
+            self.assertEqual(image.format, "PNG")
+            self.assertEqual(image.getpixel((0, 0)), (10, 20, 30, 128))
+
+    def test_webp_keeps_file_name(self):
+        UnityExtractor.set_output_profile({"format": "webp"})
+        file_path = self.root / "body.png"
+        UnityExtractor.save_image(self.image, file_path)
+        with Image.open(file_path) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.getpixel((0, 0)), (10, 20, 30, 128))
+
+
+if __name__ == "__main__":
+    unittest.main()
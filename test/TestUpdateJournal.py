@@ -0,0 +1,154 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+
+from unittest import mock
+
+from pathlib import Path
+
+from utils import AtomicDirectory
+from core.UpdatePlan import UpdatePlan, UpdateTask
+from core.UpdateJournal import UpdateJournal
+
+
+RUN_INFO = {"output_path": "game", "update_output_path": "", "force_download": False}
+
+
+class TestUpdateJournal(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.journal_path = self.root / "update_journal.jsonl"
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_plan(self, ran, fail=()):
+        def make_run(key):
+            async def run():
+                if key in fail:
+                    raise ValueError(key)
+                ran.append(key)
+
+            return run
+
+        plan = UpdatePlan()
+        plan.add(UpdateTask("bg/a", "背景", make_run("bg/a")))
+        plan.add(UpdateTask("bg/b", "背景", make_run("bg/b")))
+        plan.add(UpdateTask("character/1", "角色", make_run("character/1"), deps=["bg/a", "bg/b"]))
+        return plan
+
+    async def test_resume_skips_completed(self):
+        ran = []
+        journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        errors = await self.make_plan(ran, fail={"bg/b"}).execute(2, journal=journal)
+        self.assertEqual(set(errors), {"bg/b", "character/1"})
+        self.assertEqual(ran, ["bg/a"])
+
+        # 模拟写入时中断留下的半行
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"op": "done", "ke')
+
+        ran = []
+        journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        self.assertTrue(journal.resumed)
+        self.assertTrue(journal.is_done("bg/a"))
+        self.assertTrue(journal.is_partial("bg/b"))
+        self.assertTrue(journal.is_partial("character/1"))
+
+        plan = self.make_plan(ran)
+        self.assertEqual(plan.discard_completed(journal), 1)
+        self.assertEqual(await plan.execute(2, journal=journal), {})
+        self.assertEqual(ran, ["bg/b", "character/1"])
+
+        journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        self.assertEqual(journal.completed, {"bg/a", "bg/b", "character/1"})
+
+        journal.finish()
+        self.assertFalse(self.journal_path.exists())
+
+    async def test_aggregate_tasks_not_skipped(self):
+        async def run():
+            pass
+
+        def make_plan():
+            plan = UpdatePlan()
+            plan.add(UpdateTask("chara_icon", "图标数据", run, resumable=False))
+            plan.add(UpdateTask("bg/a", "背景", run))
+            return plan
+
+        journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        await make_plan().execute(2, journal=journal)
+
+        journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        self.assertTrue(journal.is_done("chara_icon"))
+        plan = make_plan()
+        self.assertEqual(plan.discard_completed(journal), 1)
+        self.assertEqual(list(plan.tasks), ["chara_icon"])
+
+    async def test_expired(self):
+        journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        await self.make_plan([]).execute(2, journal=journal)
+
+        with mock.patch("time.time", return_value=journal.started + UpdateJournal.max_age + 1):
+            journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        self.assertFalse(journal.resumed)
+
+    async def test_different_run_starts_over(self):
+        journal = UpdateJournal(self.journal_path, RUN_INFO).load()
+        await self.make_plan([]).execute(2, journal=journal)
+
+        journal = UpdateJournal(self.journal_path, {**RUN_INFO, "force_download": True}).load()
+        self.assertFalse(journal.resumed)
+        self.assertEqual(journal.completed, set())
+
+
+class TestAtomicDirectory(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_replace(self):
+        target = self.root / "still" / "100"
+        target.mkdir(parents=True)
+        (target / "old.png").write_bytes(b"old")
+
+        with AtomicDirectory(target) as temp_path:
+            (temp_path / "new.png").write_bytes(b"new")
+            self.assertTrue((target / "old.png").exists())
+
+        self.assertEqual([x.name for x in target.iterdir()], ["new.png"])
+        self.assertEqual([x.name for x in target.parent.iterdir()], ["100"])
+
+    def test_abort_keeps_target_missing(self):
+        target = self.root / "voice" / "100"
+        with self.assertRaises(ValueError):
+            with AtomicDirectory(target) as temp_path:
+                (temp_path / "1.m4a").write_bytes(b"half")
+                raise ValueError("interrupted")
+
+        self.assertFalse(target.exists())
+        self.assertEqual(list(target.parent.iterdir()), [])
+
+    def test_merge_and_stale_cleanup(self):
+        target = self.root / "bg"
+        target.mkdir()
+        (target / "a.png").write_bytes(b"a")
+        # 上次中断留下的临时目录
+        (target / ".b.stale.tmp").mkdir()
+
+        with AtomicDirectory(target, merge=True, tag="b") as temp_path:
+            (temp_path / "b.png").write_bytes(b"b")
+
+        self.assertEqual(sorted(x.name for x in target.iterdir()), ["a.png", "b.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
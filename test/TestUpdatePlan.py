@@ -0,0 +1,89 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncio
+import unittest
+
+from core.UpdatePlan import UpdatePlan, UpdateTask
+
+
+class FakeResource:
+    def __init__(self, sizes):
+        self.sizes = sizes
+        self.requests = []
+
+    async def getAssetSize(self, url_path):
+        self.requests.append(url_path)
+        return self.sizes.get(url_path)
+
+
+class FakeApi:
+    def __init__(self, sizes):
+        self.resource = FakeResource(sizes)
+
+
+class TestUpdatePlan(unittest.IsolatedAsyncioTestCase):
+    async def test_dedup_and_dependency_order(self):
+        order = []
+
+        def make_run(key, delay=0):
+            async def run():
+                await asyncio.sleep(delay)
+                order.append(key)
+
+            return run
+
+        plan = UpdatePlan()
+        plan.add(UpdateTask("character/1", "角色", make_run("character/1"), deps=["bg/a"]))
+        plan.add(UpdateTask("bg/a", "背景", make_run("bg/a", 0.02)))
+        plan.add(UpdateTask("bg/a", "背景", make_run("bg/a")))
+        plan.add(UpdateTask("character/1", "角色", make_run("character/1"), deps=["bgm/b"]))
+        plan.add(UpdateTask("bgm/b", "BGM", make_run("bgm/b", 0.01)))
+
+        self.assertEqual(len(plan), 3)
+        self.assertEqual(plan.tasks["character/1"].deps, ["bg/a", "bgm/b"])
+
+        self.assertEqual(await plan.execute(workers=4), {})
+        self.assertEqual(order, ["bgm/b", "bg/a", "character/1"])
+
+    async def test_failed_dependency(self):
+        ran = []
+
+        async def fail():
+            raise ValueError("bg")
+
+        async def run():
+            ran.append(1)
+
+        plan = UpdatePlan()
+        plan.add(UpdateTask("bg/a", "背景", fail))
+        plan.add(UpdateTask("character/1", "角色", run, deps=["bg/a"]))
+
+        errors = await plan.execute(workers=2)
+        self.assertEqual(set(errors), {"bg/a", "character/1"})
+        self.assertEqual(ran, [])
+
+    async def test_estimate_sizes(self):
+        async def run():
+            pass
+
+        plan = UpdatePlan()
+        plan.add(UpdateTask("chara/res/1", "角色立绘", run, urls=["chara/stand/1", "chara/homestand/1"]))
+        plan.add(UpdateTask("bg/a", "背景", run, urls=["bg/adventure/a"]))
+        plan.add(UpdateTask("bg/b", "背景", run, urls=["bg/adventure/b"]))
+        plan.add(UpdateTask("character/1", "角色", run))
+
+        api = FakeApi({"chara/homestand/1": 20, "bg/adventure/a": 5})
+        await plan.estimate_sizes(api, {"chara/stand/1": 10})
+
+        self.assertEqual(sorted(api.resource.requests), ["bg/adventure/a", "bg/adventure/b", "chara/homestand/1"])
+        self.assertEqual(plan.tasks["chara/res/1"].size, 30)
+        self.assertIsNone(plan.tasks["bg/b"].size)
+        self.assertEqual(plan.total_size, 35)
+        self.assertEqual(plan.summary()["背景"], {"count": 2, "size": 5, "unknown": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,266 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tempfile
+import unittest
+
+from unittest import mock
+
+from pathlib import Path
+
+from core import CheckUpdate
+from core.CheckUpdate import UpdatePlanner, check_game_update
+from core.UpdatePlan import UpdatePlan
+from core.UpdateJournal import UpdateJournal
+from FileDataPath import BGPath
+
+CHARACTERS = {1001: {"n": "角色A", "r": 2}, 2001: {"n": "角色B", "r": 1}}
+
+EPISODES = {
+    1001: {
+        "Episodes": [
+            {"MSceneId": 10, "MAdultId": 20, "Description": "第一话"},
+            {"MSceneId": None, "MAdultId": 0, "Description": "未开放"},
+            # 没有侍寝的剧情, update_all_resources 为 False 时跳过
+            {"MSceneId": 11, "MAdultId": 0, "Description": "第二话"},
+        ]
+    },
+    2001: {"Episodes": [{"MSceneId": 12, "MAdultId": 21, "Description": "第一话"}]},
+}
+
+MSCENES = {
+    10: {
+        "MSceneDetails": [
+            {"MMonsterId": 1001, "BackgroundImage": "bg_a", "BGM": "bgm_a"},
+            {"MMonsterId": 3001, "BackgroundImage": "bg_a", "BGM": None},
+        ]
+    },
+    11: {"MSceneDetails": [{"MMonsterId": 1001, "BackgroundImage": "bg_c", "BGM": None}]},
+    12: {
+        "MSceneDetails": [
+            {"MMonsterId": 2001, "BackgroundImage": "bg_a", "BGM": "bgm_b"},
+        ]
+    },
+}
+
+MADULTS = {
+    20: {"MAdultDetails": [{"BGM": "bgm_a"}, {"BGM": None}]},
+    21: {"MAdultDetails": [{"BGM": "bgm_b"}]},
+}
+
+CHARACTER_1001_KEYS = {
+    "chara/res/1001",
+    "chara/standimagelarge/1001",
+    "chara/standimagelarge/1002",
+    "MScenes/10",
+    "MAdults/20",
+    "chara/res/3001",
+    "bg/adventure/bg_a",
+    "sound/bgm/bgm_a",
+    "sound/voice/adventure/voice_adventure_10",
+    "sound/voice/still/voice_still_20",
+    "chara/still/20",
+}
+
+
+class StubChar:
+    def __init__(self):
+        self.requests = []
+        self.Specials = []
+
+    async def getCharacterInfo(self, char_id):
+        return CHARACTERS.get(char_id)
+
+    async def getCharacterEpisodes(self, char_id):
+        return EPISODES[char_id]
+
+    async def getMScenes(self, MSceneId):
+        self.requests.append(MSceneId)
+        return MSCENES.get(MSceneId)
+
+    async def getMAdults(self, MAdultId):
+        return MADULTS.get(MAdultId)
+
+    async def getMMonstersData(self):
+        return []
+
+    async def getMSpiritsData(self):
+        return []
+
+    def setCharacterData(self, MMonstersData, MSpiritsData):
+        pass
+
+    async def getUserCharacterIDS(self):
+        return list(CHARACTERS)
+
+
+class StubResource:
+    proxy = ""
+
+    def __init__(self):
+        # 下载资源的请求, 生成计划时不应该有
+        self.downloads = []
+
+    async def getAllCharacterIconDataSize(self):
+        return 100
+
+    async def getAssetsLastVersion(self):
+        return 1
+
+    async def GetAssetBundlePatch(self, AssetsVersion):
+        return b"url,md5,size\nbg/adventure/bg_a,0,10\n"
+
+    async def getAssetSize(self, url_path):
+        return 1
+
+    async def saveAssetsFromPath(self, url_path, file_path):
+        self.downloads.append(url_path)
+        return False
+
+
+class StubApi:
+    def __init__(self):
+        self.char = StubChar()
+        self.resource = StubResource()
+
+
+class StubLocalGame:
+    def __init__(self, game_root: Path):
+        self.game_root = game_root
+
+    def getCharacterIDS(self):
+        return []
+
+    def getSpecial(self):
+        return {"Episodes": []}
+
+
+class TestUpdatePlanner(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.output_path = self.root / "game"
+        self.output_path.mkdir()
+        self.GameApi = StubApi()
+
+        for name, value in [
+            ("CharaIconPath", self.root / "chara_icon"),
+            ("UpdateJournalPath", self.root / "update_journal.jsonl"),
+            ("update_all_resources", False),
+        ]:
+            patcher = mock.patch.object(CheckUpdate, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    async def plan(self, *char_ids) -> UpdatePlanner:
+        planner = UpdatePlanner(self.GameApi, self.output_path)
+        icon_key = await planner.add_chara_icon_cache()
+        for char_id in char_ids:
+            await planner.plan_character(char_id, deps=[icon_key])
+        return planner
+
+    async def test_plan_character(self):
+        planner = await self.plan(1001)
+        tasks = planner.plan.tasks
+
+        self.assertEqual(
+            set(tasks), CHARACTER_1001_KEYS | {"chara_icon", "character/1001"}
+        )
+        # 角色任务在所有资源和图标数据之后执行
+        self.assertEqual(
+            set(tasks["character/1001"].deps), CHARACTER_1001_KEYS | {"chara_icon"}
+        )
+        self.assertEqual(tasks["character/1001"].name, "角色A")
+        self.assertEqual(
+            tasks["chara/res/1001"].urls,
+            ["chara/stand/1001", "chara/homestand/1001"],
+        )
+        self.assertEqual(planner.characters, [1001])
+        # 没有侍寝的剧情和未开放的剧情不获取
+        self.assertEqual(self.GameApi.char.requests, [10])
+        self.assertEqual(self.GameApi.resource.downloads, [])
+
+    async def test_dedupe_shared_resources(self):
+        planner = await self.plan(1001, 2001)
+        tasks = planner.plan.tasks
+
+        self.assertEqual(
+            [x for x in tasks if x == "bg/adventure/bg_a"], ["bg/adventure/bg_a"]
+        )
+        for char_id in (1001, 2001):
+            self.assertIn("bg/adventure/bg_a", tasks[f"character/{char_id}"].deps)
+        # 角色 2001 的立绘同时被自己和剧情引用, 只有一个任务
+        self.assertEqual(tasks["character/2001"].deps.count("chara/res/2001"), 1)
+        character_2001_keys = {
+            "chara/res/2001",
+            "chara/standimagelarge/2001",
+            "MScenes/12",
+            "MAdults/21",
+            "sound/bgm/bgm_b",
+            "sound/voice/adventure/voice_adventure_12",
+            "sound/voice/still/voice_still_21",
+            "chara/still/21",
+        }
+        self.assertEqual(
+            set(tasks),
+            CHARACTER_1001_KEYS
+            | character_2001_keys
+            | {"chara_icon", "character/1001", "character/2001"},
+        )
+
+    async def test_skip_existing_files(self):
+        (self.output_path / BGPath).mkdir(parents=True)
+        (self.output_path / BGPath / "bg_a.png").touch()
+
+        tasks = (await self.plan(1001)).plan.tasks
+        self.assertNotIn("bg/adventure/bg_a", tasks)
+        self.assertNotIn("bg/adventure/bg_a", tasks["character/1001"].deps)
+
+    async def test_journal_skips_completed(self):
+        run_info = {"output_path": str(self.output_path)}
+        journal = UpdateJournal(CheckUpdate.UpdateJournalPath, run_info).load()
+        journal.start(list((await self.plan(1001)).plan.tasks))
+        journal.done("bg/adventure/bg_a")
+        journal.done("chara_icon")
+        journal.close()
+
+        plan = (await self.plan(1001)).plan
+        journal = UpdateJournal(CheckUpdate.UpdateJournalPath, run_info).load()
+        self.assertTrue(journal.resumed)
+        self.assertEqual(plan.discard_completed(journal), 1)
+        self.assertNotIn("bg/adventure/bg_a", plan.tasks)
+        # 图标数据在两次运行之间可能变化, 不跳过
+        self.assertIn("chara_icon", plan.tasks)
+
+    async def test_dry_run_without_io(self):
+        run = mock.AsyncMock()
+        with mock.patch.object(
+            CheckUpdate, "OtogiApi", return_value=self.GameApi
+        ), mock.patch.object(
+            CheckUpdate, "save_json"
+        ) as save_json, mock.patch.object(
+            CheckUpdate.ProcessPool, "run", run
+        ):
+            plan = await check_game_update(
+                StubLocalGame(self.output_path), dry_run=True
+            )
+
+        self.assertIsInstance(plan, UpdatePlan)
+        self.assertIn("character/1001", plan.tasks)
+        self.assertIn("character/2001", plan.tasks)
+        self.assertEqual(plan.tasks["bg/adventure/bg_a"].size, 10)
+        save_json.assert_not_called()
+        run.assert_not_called()
+        self.assertEqual(self.GameApi.resource.downloads, [])
+        self.assertEqual(list(self.output_path.iterdir()), [])
+        self.assertFalse(CheckUpdate.UpdateJournalPath.exists())
+        self.assertFalse(CheckUpdate.CharaIconPath.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,10 +4,15 @@ from .menu_tools import Menu
 from .arg_require import ArgRequire, ArgRequireOption
 from .simple_config import SimpleConfig
 from .cache import Cache, AsyncCache
-from .aria2c import Aria2c
+from .file_writer import AtomicFileWriter, AtomicDirectory, PartFileWriter
+from .process_pool import ProcessPool
+from .downloader import SegmentedDownloader
+from .limiter import AdaptiveLimiter
+from .coalescer import RequestCoalescer
 from .session import (
     HTTPMethod,
     HTTPSession,
+    SessionPool,
     HTTPSessionApi,
     RespondJson,
     RespondRawData,
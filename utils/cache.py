@@ -1,76 +1,187 @@
+import asyncio
 import datetime
 import functools
 import inspect
+import time
 
-cache_data = {}
+from collections import OrderedDict
 
+_MISSING = object()
 
-def get_func_key(func, *fn_args, **fn_kwargs):
-    bound = inspect.signature(func).bind(*fn_args, **fn_kwargs)
-    bound.apply_defaults()
-    bound.arguments.pop("self", None)
-    return hash(f"{func.__name__}@{bound.arguments}")
 
+_POSITIONAL_KINDS = (
+    inspect.Parameter.POSITIONAL_ONLY,
+    inspect.Parameter.POSITIONAL_OR_KEYWORD,
+)
 
-def cache_decorator(ttl=None, is_async=False):
+
+_SCALAR_TYPES = frozenset((str, int, float, bool, bytes, type(None)))
+
+
+def _freeze(value):
+    """把参数转换为可哈希的等价形式, 带上类型, 1, True 和 1.0 不会得到相同的 key"""
+    cls = type(value)
+    if cls in _SCALAR_TYPES:
+        return (cls, value)
+
+    if isinstance(value, dict):
+        return (dict, tuple((_freeze(k), _freeze(v)) for k, v in sorted(value.items(), key=repr)))
+    if isinstance(value, (list, tuple)):
+        return (cls, tuple(_freeze(x) for x in value))
+    if isinstance(value, (set, frozenset)):
+        return (set, frozenset(_freeze(x) for x in value))
+
+    try:
+        hash(value)
+        return (cls, value)
+    except TypeError:
+        return (cls, repr(value))
+
+
+def make_key_func(func):
+    """
+    预先解析函数签名, 返回计算缓存 key 的函数
+
+    key 为按参数顺序排列的 _freeze 后的参数值元组 (不含 self)。
+    只传入完整位置参数时直接使用参数, 不再绑定签名。
+    """
+    signature = inspect.signature(func)
+    params = list(signature.parameters.values())
+    has_self = len(params) > 0 and params[0].name == "self"
+    skip = 1 if has_self else 0
+    param_count = len(params)
+    all_positional = all(p.kind in _POSITIONAL_KINDS for p in params)
+
+    def get_key(*fn_args, **fn_kwargs):
+        if all_positional and not fn_kwargs and len(fn_args) == param_count:
+            values = fn_args[skip:] if skip else fn_args
+        else:
+            bound = signature.bind(*fn_args, **fn_kwargs)
+            bound.apply_defaults()
+            values = iter(bound.arguments.values())
+            if has_self:
+                next(values)
+        return tuple(_freeze(value) for value in values)
+
+    return get_key
+
+
+class CacheStore:
+    """带 TTL 的有界 LRU 缓存, 记录命中次数"""
+
+    def __init__(self, maxsize: int = None, ttl: datetime.timedelta = None):
+        self.maxsize = maxsize
+        self.ttl = ttl.total_seconds() if ttl is not None else None
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        """返回缓存值, 未缓存或已过期返回 _MISSING"""
+        item = self._data.get(key, _MISSING)
+        if item is _MISSING:
+            self.misses += 1
+            return _MISSING
+
+        expires, value = item
+        if expires is not None and expires < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return _MISSING
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+def cache_decorator(ttl=None, is_async=False, maxsize=4096):
     """
+    缓存函数结果, None 和空值同样会被缓存
+    异步函数同时发起的相同调用只会执行一次, 其余调用等待同一个结果
+
     example:
     @cache_decorator
     @cache_decorator(ttl=datetime.timedelta(hours=1))
-    @cache_decorator(is_async=True)
+    @cache_decorator(is_async=True, maxsize=256)
+
+    func.cache_info() 查看命中情况, func.cache_clear() 清空缓存
     """
 
     def wrap(func):
+        store = CacheStore(maxsize, ttl)
+        in_flight: dict = {}
+        get_key = make_key_func(func)
+
+        def on_done(ins_key, future: asyncio.Future):
+            if in_flight.get(ins_key) is future:
+                del in_flight[ins_key]
+            if future.cancelled():
+                return
+            # 没有其他等待者时避免 "exception was never retrieved"
+            if future.exception() is None:
+                store.set(ins_key, future.result())
+
         @functools.wraps(func)
         async def async_wrapper(*fn_args, **fn_kwargs):
             if fn_kwargs.get("no_cache", False):
                 return await func(*fn_args, **fn_kwargs)
 
-            ins_key = get_func_key(func, *fn_args, **fn_kwargs)
-            now = datetime.datetime.now()
-            default_data = {"time": None, "value": None}
-
-            data = cache_data.get(ins_key, default_data)
+            ins_key = get_key(*fn_args, **fn_kwargs)
 
-            if ttl is None:
-                if not data["value"]:
-                    data["value"] = await func(*fn_args, **fn_kwargs)
-                    cache_data[ins_key] = data
-            else:
-                if not data["time"] or now - data["time"] > ttl:
-                    data["value"] = await func(*fn_args, **fn_kwargs)
-                    data["time"] = now
-                    cache_data[ins_key] = data
+            value = store.get(ins_key)
+            if value is not _MISSING:
+                return value
 
-            return data["value"]
+            future = in_flight.get(ins_key)
+            if future is None:
+                future = asyncio.ensure_future(func(*fn_args, **fn_kwargs))
+                future.add_done_callback(functools.partial(on_done, ins_key))
+                in_flight[ins_key] = future
+            # 函数作为独立的任务运行, 单个调用方被取消时不影响其他等待者
+            return await asyncio.shield(future)
 
         @functools.wraps(func)
         def sync_wrapper(*fn_args, **fn_kwargs):
             if fn_kwargs.get("no_cache", False):
                 return func(*fn_args, **fn_kwargs)
 
-            ins_key = get_func_key(func, *fn_args, **fn_kwargs)
-            now = datetime.datetime.now()
-            default_data = {"time": None, "value": None}
-
-            data = cache_data.get(ins_key, default_data)
-
-            if ttl is None:
-                if not data["value"]:
-                    data["value"] = func(*fn_args, **fn_kwargs)
-                    cache_data[ins_key] = data
-            else:
-                if not data["time"] or now - data["time"] > ttl:
-                    data["value"] = func(*fn_args, **fn_kwargs)
-                    data["time"] = now
-                    cache_data[ins_key] = data
+            ins_key = get_key(*fn_args, **fn_kwargs)
 
-            return data["value"]
+            value = store.get(ins_key)
+            if value is _MISSING:
+                value = func(*fn_args, **fn_kwargs)
+                store.set(ins_key, value)
+            return value
 
-        return async_wrapper if is_async else sync_wrapper
+        wrapper = async_wrapper if is_async else sync_wrapper
+        wrapper.cache_info = store.info
+        wrapper.cache_clear = store.clear
+        return wrapper
 
     if callable(ttl):
-        return wrap(ttl)
+        func, ttl = ttl, None
+        return wrap(func)
     return wrap
 
 
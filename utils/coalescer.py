@@ -0,0 +1,75 @@
+import asyncio
+import functools
+import inspect
+
+
+class RequestCoalescer:
+    """
+    按资源地址合并一次更新内的重复请求
+
+    同一地址正在处理时, 之后的调用等待同一个 future; 处理完成后直接返回结果,
+    直到 reset 为止. 失败的请求不会保留, 下次调用重新执行
+
+    example:
+    coalescer = RequestCoalescer()
+
+    @coalescer.coalesce("bg/adventure/{bg_id}")
+    async def save_adventure_bg(GameApi, bg_id, output_path):
+        ...
+    """
+
+    def __init__(self):
+        self._futures: dict[str, asyncio.Future] = {}
+        self._loop: asyncio.AbstractEventLoop = None
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        """开始新一轮更新时清空记录"""
+        self._futures.clear()
+        self._loop = None
+        self.hits = 0
+        self.misses = 0
+
+    def _discard(self, key: str, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+
+    async def run(self, key: str, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 上一次运行的事件循环中的 future 不能再使用
+            self.reset()
+            self._loop = loop
+
+        future = self._futures.get(key)
+        if future is None:
+            self.misses += 1
+            future = asyncio.ensure_future(func(*args, **kwargs))
+            future.add_done_callback(functools.partial(self._discard, key))
+            self._futures[key] = future
+        else:
+            self.hits += 1
+        # 单个调用方被取消时不影响其他等待者
+        return await asyncio.shield(future)
+
+    def coalesce(self, key_format: str):
+        """用函数参数格式化 key_format 作为合并的 key"""
+
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = key_format.format(**bound.arguments)
+                return await self.run(key, func, *args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def info(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._futures)}
@@ -0,0 +1,232 @@
+import ujson
+import asyncio
+import aiohttp
+
+from pathlib import Path
+from typing import Callable, Optional
+
+from .helper import Error_Message
+from .file_writer import AtomicFileWriter
+from .session import SessionPool, parse_content_range, resume_validator
+from .limiter import AdaptiveLimiter
+from .logger import Logger
+
+log = Logger("NET").logger
+
+
+class RemoteFileChanged(Error_Message):
+    """服务器文件已变化, 已下载的分段不能再续传"""
+
+
+class RetryableStatus(Exception):
+    """服务器限流或暂时错误 (429/5xx), 等待后重试"""
+
+    def __init__(self, status: int, retry_after: Optional[str] = None):
+        super().__init__(status)
+        self.status = status
+        self.retry_after = retry_after
+
+    def delay(self, attempt: int) -> float:
+        if self.retry_after is not None and self.retry_after.isdigit():
+            return min(int(self.retry_after), 60)
+        return min(2 ** (attempt - 1), 30)
+
+
+class SegmentedDownloader:
+    """
+    多连接分段下载, 每段用 Range 请求并行下载到各自的 .partN 文件, 完成后合并并原子替换目标文件
+
+    中断后再次下载时, 服务器文件没有变化 (ETag/Last-Modified) 的话各段从已下载的位置继续
+    服务器不支持 Range 时退化为单连接下载
+    每个请求都占用 AdaptiveLimiter 的名额, 分段数超过主机当前并发限制时多出的分段排队等待
+
+    example:
+    downloader = SegmentedDownloader(url, path, progress_handler=lambda done, total: ...)
+    await downloader.download()
+    """
+
+    def __init__(
+        self,
+        url: str,
+        file_path: Path,
+        segments: int = 8,
+        proxy: str = "",
+        headers: dict = None,
+        progress_handler: Optional[Callable[[int, int], None]] = None,
+        min_segment_size: int = 1024 * 1024,
+        chunk_size: int = 64 * 1024,
+        retries: int = 5,
+    ):
+        self.url = url
+        self.file_path = Path(file_path)
+        self.segments = max(segments, 1)
+        self.proxy = proxy or None
+        self.headers = headers or {}
+        self.progress_handler = progress_handler
+        self.min_segment_size = min_segment_size
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.meta_path = self.file_path.with_name(self.file_path.name + ".parts.json")
+        self.total = 0
+        self.completed = 0
+
+    def _part_path(self, index: int) -> Path:
+        return self.file_path.with_name(f"{self.file_path.name}.part{index}")
+
+    def _load_meta(self) -> Optional[dict]:
+        if not self.meta_path.exists():
+            return None
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return ujson.load(f)
+        except ValueError:
+            return None
+
+    def _save_meta(self, meta: dict):
+        with AtomicFileWriter(self.meta_path, buffer_size=4096) as f:
+            f.write(ujson.dumps(meta).encode("utf-8"))
+
+    def _clear_parts(self, count: int):
+        for index in range(count):
+            self._part_path(index).unlink(missing_ok=True)
+        self.meta_path.unlink(missing_ok=True)
+
+    def _report(self, size: int):
+        self.completed += size
+        if self.progress_handler is not None:
+            self.progress_handler(self.completed, self.total)
+
+    def _split(self, total: int) -> list[list[int]]:
+        count = min(self.segments, max(total // self.min_segment_size, 1))
+        size = total // count
+        ranges = [[index * size, (index + 1) * size - 1] for index in range(count)]
+        ranges[-1][1] = total - 1
+        return ranges
+
+    async def _probe(self, session: aiohttp.ClientSession) -> tuple[int, Optional[dict]]:
+        """获取文件大小和续传校验信息, 不支持 Range 时校验信息为 None"""
+        headers = {**self.headers, "Range": "bytes=0-0"}
+        async with AdaptiveLimiter.get(self.url).slot() as slot, session.get(
+            self.url, headers=headers, proxy=self.proxy
+        ) as resp:
+            slot.record(resp.status)
+            if resp.status == 206:
+                _, total = parse_content_range(resp.headers.get("Content-Range", ""))
+                if total is not None:
+                    return total, resume_validator(resp.headers, total)
+            if resp.status not in (200, 206):
+                raise Error_Message(f"下载失败 ({resp.status}): {self.url}")
+            return int(resp.headers.get("Content-Length", 0)), None
+
+    async def _download_segment(
+        self, session: aiohttp.ClientSession, index: int, start: int, end: int, if_range: str
+    ):
+        part_path = self._part_path(index)
+        for attempt in range(1, self.retries + 1):
+            offset = start + (part_path.stat().st_size if part_path.exists() else 0)
+            if offset > end:
+                return
+
+            headers = {**self.headers, "Range": f"bytes={offset}-{end}"}
+            if if_range:
+                headers["If-Range"] = if_range
+            try:
+                async with AdaptiveLimiter.get(self.url).slot() as slot, session.get(
+                    self.url, headers=headers, proxy=self.proxy
+                ) as resp:
+                    slot.record(resp.status)
+                    if resp.status == 429 or resp.status >= 500:
+                        raise RetryableStatus(resp.status, resp.headers.get("Retry-After"))
+                    if resp.status in (200, 412):
+                        # If-Range 不匹配时服务器返回完整文件
+                        raise RemoteFileChanged(f"服务器文件已变化 ({resp.status})")
+                    if resp.status != 206:
+                        raise Error_Message(f"分段下载失败 ({resp.status}): {self.url}")
+                    resp_start, total = parse_content_range(resp.headers.get("Content-Range", ""))
+                    if resp_start != offset or total != self.total:
+                        raise RemoteFileChanged("分段下载位置或文件大小不一致")
+
+                    with open(part_path, "ab") as f:
+                        async for chunk in resp.content.iter_chunked(self.chunk_size):
+                            f.write(chunk)
+                            self._report(len(chunk))
+            except RetryableStatus as e:
+                if attempt == self.retries:
+                    raise Error_Message(f"下载失败 ({e.status}): {self.url}")
+                log.debug(f"分段 {index} 重试次数: {attempt} (状态码 {e.status})")
+                await asyncio.sleep(e.delay(attempt))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    raise
+                log.debug(f"分段 {index} 重试次数: {attempt} ({e!r})")
+                await asyncio.sleep(1)
+
+    async def _download_single(self, session: aiohttp.ClientSession):
+        """服务器不支持 Range 时单连接下载"""
+        async with AdaptiveLimiter.get(self.url).slot() as slot, session.get(
+            self.url, headers=self.headers, proxy=self.proxy
+        ) as resp:
+            slot.record(resp.status)
+            if resp.status != 200:
+                raise Error_Message(f"下载失败 ({resp.status}): {self.url}")
+            with AtomicFileWriter(self.file_path) as writer:
+                async for chunk in resp.content.iter_chunked(self.chunk_size):
+                    writer.write(chunk)
+                    self._report(len(chunk))
+
+    def _merge(self, count: int):
+        with AtomicFileWriter(self.file_path) as writer:
+            for index in range(count):
+                with open(self._part_path(index), "rb") as f:
+                    while chunk := f.read(writer.buffer_size):
+                        writer.write(chunk)
+            if writer.size != self.total:
+                # 分段数据有误, 不能再续传, 下次重新下载
+                self._clear_parts(count)
+                raise Error_Message(f"下载不完整 ({writer.size}/{self.total})")
+        self._clear_parts(count)
+
+    async def download(self):
+        session = SessionPool.get(self.url)
+        self.total, validator = await self._probe(session)
+        self.completed = 0
+
+        if validator is None:
+            self._report(0)
+            await self._download_single(session)
+            return
+
+        meta = self._load_meta()
+        if meta is not None and meta["validator"] == validator:
+            ranges = meta["ranges"]
+        else:
+            if meta is not None:
+                self._clear_parts(len(meta["ranges"]))
+            ranges = self._split(self.total)
+            self._save_meta({"validator": validator, "ranges": ranges})
+
+        # 已下载的部分计入进度
+        for index in range(len(ranges)):
+            part_path = self._part_path(index)
+            if part_path.exists():
+                self.completed += part_path.stat().st_size
+        self._report(0)
+
+        if_range = validator["etag"] or validator["last_modified"]
+        tasks = [
+            asyncio.create_task(self._download_segment(session, index, start, end, if_range))
+            for index, (start, end) in enumerate(ranges)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException as e:
+            # 任意一段失败时停止其他分段, 已下载的部分保留到下次继续
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if isinstance(e, RemoteFileChanged):
+                # 服务器文件已变化, 下次重新下载
+                self._clear_parts(len(ranges))
+            raise
+
+        await asyncio.to_thread(self._merge, len(ranges))
@@ -0,0 +1,288 @@
+import os
+import json
+import shutil
+import tempfile
+
+from pathlib import Path
+from types import TracebackType
+from typing import Optional, Type
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+_free_buffers: list[bytearray] = []
+
+
+def _acquire_buffer(size: int) -> bytearray:
+    for index, buffer in enumerate(_free_buffers):
+        if len(buffer) == size:
+            return _free_buffers.pop(index)
+    return bytearray(size)
+
+
+def _release_buffer(buffer: bytearray):
+    if len(_free_buffers) < 64:
+        _free_buffers.append(buffer)
+
+
+class AtomicFileWriter:
+    """
+    先写入同目录下的临时文件, 完成后 fsync 并原子替换目标文件
+
+    小块数据先拷贝进可复用的缓冲区, 攒满后一次写入, 大块数据直接写入文件,
+    整个过程内存占用只有一个缓冲区的大小
+
+    example:
+    with AtomicFileWriter(path) as f:
+        for chunk in chunks:
+            f.write(chunk)
+    """
+
+    def __init__(self, path: Path, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.path = Path(path)
+        self.buffer_size = buffer_size
+        self.size = 0
+        self._file = None
+        self._temp_path: Path = None
+        self._buffer: bytearray = None
+        self._view: memoryview = None
+        self._pos = 0
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent
+        )
+        self._temp_path = Path(temp_path)
+        self._file = os.fdopen(fd, "wb", buffering=0)
+        self._buffer = _acquire_buffer(self.buffer_size)
+        self._view = memoryview(self._buffer)
+        self._pos = 0
+        self.size = 0
+        return self
+
+    def write(self, chunk: bytes):
+        length = len(chunk)
+        if length == 0:
+            return
+        if self._pos + length > self.buffer_size:
+            self.flush()
+        if length >= self.buffer_size:
+            self._file.write(chunk)
+        else:
+            self._view[self._pos : self._pos + length] = chunk
+            self._pos += length
+        self.size += length
+
+    def flush(self):
+        if self._pos > 0:
+            self._file.write(self._view[: self._pos])
+            self._pos = 0
+
+    def _close(self):
+        if self._view is not None:
+            self._view.release()
+            _release_buffer(self._buffer)
+            self._view = self._buffer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def commit(self):
+        """写入剩余数据, 落盘后替换目标文件"""
+        try:
+            self.flush()
+            os.fsync(self._file.fileno())
+        except BaseException:
+            self.abort()
+            raise
+        self._close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        """放弃写入, 删除临时文件"""
+        self._close()
+        if self._temp_path is not None and self._temp_path.exists():
+            self._temp_path.unlink()
+
+    def __enter__(self) -> "AtomicFileWriter":
+        return self.open()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class AtomicDirectory:
+    """
+    先写入临时目录, 完成后再提交到目标目录, 中断时目标目录中不会留下不完整的内容
+
+    默认整个替换目标目录; merge 为 True 时把临时目录中的文件逐个原子移动到目标目录,
+    用于多个任务共用的输出目录 (背景, BGM 等), 此时 tag 用来区分各任务的临时目录
+
+    example:
+    with AtomicDirectory(path) as temp_path:
+        extract(data, temp_path)
+    """
+
+    def __init__(self, path: Path, merge=False, tag: str = None):
+        self.path = Path(path)
+        self.merge = merge
+        self.tag = tag or self.path.name
+        self.temp_path: Path = None
+
+    @property
+    def _temp_root(self) -> Path:
+        return self.path if self.merge else self.path.parent
+
+    def _clear_stale(self):
+        """删除上次中断时留下的临时目录"""
+        for suffix in ("tmp", "old"):
+            for stale in self._temp_root.glob(f".{self.tag}.*.{suffix}"):
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def open(self) -> Path:
+        self._temp_root.mkdir(parents=True, exist_ok=True)
+        self._clear_stale()
+        self.temp_path = Path(
+            tempfile.mkdtemp(prefix=f".{self.tag}.", suffix=".tmp", dir=self._temp_root)
+        )
+        return self.temp_path
+
+    def commit(self):
+        if self.merge:
+            for item in self.temp_path.iterdir():
+                target = self.path / item.name
+                if item.is_dir() and target.exists():
+                    shutil.rmtree(target)
+                os.replace(item, target)
+            self.temp_path.rmdir()
+        elif self.path.exists():
+            # 目录不能直接覆盖, 先把旧目录移开
+            old_path = self.temp_path.with_suffix(".old")
+            os.replace(self.path, old_path)
+            os.replace(self.temp_path, self.path)
+            shutil.rmtree(old_path, ignore_errors=True)
+        else:
+            os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        if self.temp_path is not None:
+            shutil.rmtree(self.temp_path, ignore_errors=True)
+
+    def __enter__(self) -> Path:
+        return self.open()
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class PartFileWriter:
+    """
+    断点续传用的写入器, 数据追加写入同目录下的 .part 文件
+
+    中断时保留已写入的部分和校验信息 (.part.json), 下次从 offset 继续写入,
+    完整后再替换目标文件
+
+    example:
+    writer = PartFileWriter(path)
+    writer.open(writer.offset, validator)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    finally:
+        writer.close()
+    writer.commit()
+    """
+
+    def __init__(self, path: Path, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self.path = Path(path)
+        self.part_path = self.path.with_name(self.path.name + ".part")
+        self.meta_path = self.path.with_name(self.path.name + ".part.json")
+        self.buffer_size = buffer_size
+        self.size = 0
+        self._file = None
+
+    @property
+    def offset(self) -> int:
+        """可以续传的位置, 没有可用的校验信息时从头下载"""
+        if self.validator is None or not self.part_path.exists():
+            return 0
+        return self.part_path.stat().st_size
+
+    @property
+    def validator(self) -> Optional[dict]:
+        if not self.meta_path.exists():
+            return None
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except ValueError:
+            return None
+
+    def open(self, offset: int, validator: Optional[dict] = None):
+        """从 offset 开始写入, offset 为 0 时重新下载"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if offset == 0:
+            self.meta_path.unlink(missing_ok=True)
+            self._file = open(self.part_path, "wb", buffering=self.buffer_size)
+            if validator:
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump(validator, f)
+        else:
+            self._file = open(self.part_path, "r+b", buffering=self.buffer_size)
+            self._file.seek(offset)
+            self._file.truncate()
+        self.size = offset
+        return self
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def close(self):
+        """关闭文件, 保留已写入的部分"""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def commit(self, decoder=None):
+        """
+        替换目标文件
+
+        decoder: 可选的分块解码器, 需要实现 update(chunk) -> bytes 和 finalize() -> bytes,
+        下载的是原始数据, 完整后再解码写入目标文件
+        """
+        self.close()
+        if decoder is None:
+            os.replace(self.part_path, self.path)
+        else:
+            with AtomicFileWriter(self.path, self.buffer_size) as writer:
+                with open(self.part_path, "rb") as f:
+                    while chunk := f.read(self.buffer_size):
+                        writer.write(decoder.update(chunk))
+                writer.write(decoder.finalize())
+            self.part_path.unlink()
+        self.meta_path.unlink(missing_ok=True)
+
+    def discard(self):
+        """删除已下载的部分"""
+        self.close()
+        self.part_path.unlink(missing_ok=True)
+        self.meta_path.unlink(missing_ok=True)
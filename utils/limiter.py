@@ -0,0 +1,180 @@
+import time
+import asyncio
+import aiohttp
+
+from collections import deque
+from types import TracebackType
+from typing import Optional, Type
+from urllib.parse import urlsplit
+
+
+class LimiterSlot:
+    """
+    一次请求占用的并发名额, 收到响应头时调用 record 记录状态码和延迟
+
+    example:
+    async with AdaptiveLimiter.get(url).slot() as slot:
+        async with session.get(url) as resp:
+            slot.record(resp.status)
+    """
+
+    def __init__(self, limiter: "AdaptiveLimiter"):
+        self.limiter = limiter
+        self.status: int = None
+        self.latency: float = None
+        self._start: float = None
+
+    def record(self, status: int):
+        self.status = status
+        self.latency = time.monotonic() - self._start
+
+    async def __aenter__(self) -> "LimiterSlot":
+        await self.limiter.acquire()
+        self._start = time.monotonic()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        try:
+            if self.status is not None and (self.status == 429 or self.status >= 500):
+                self.limiter.on_throttled()
+            elif exc_type is not None and issubclass(
+                exc_type, (asyncio.TimeoutError, aiohttp.ClientError)
+            ):
+                self.limiter.on_throttled()
+            elif self.status is not None:
+                self.limiter.on_success(self.latency)
+        finally:
+            self.limiter.release()
+
+
+class AdaptiveLimiter:
+    """
+    按主机共享的自适应并发限制 (AIMD)
+
+    请求成功且延迟正常时每轮并发 +1, 遇到 429/5xx/超时/连接错误时并发减半,
+    延迟超过基准延迟的 latency_factor 倍时不再增加
+    """
+
+    initial_limit: int = 8
+    min_limit: int = 1
+    max_limit: int = 30
+    latency_factor: float = 3.0
+    _limiters: dict[str, tuple[asyncio.AbstractEventLoop, "AdaptiveLimiter"]] = {}
+
+    def __init__(
+        self,
+        host: str,
+        initial_limit: int = None,
+        min_limit: int = None,
+        max_limit: int = None,
+    ):
+        self.host = host
+        self.min_limit = min_limit or self.min_limit
+        self.max_limit = max(max_limit or self.max_limit, self.min_limit)
+        self.limit = float(min(max(initial_limit or self.initial_limit, self.min_limit), self.max_limit))
+        self.in_flight = 0
+        self.completed = 0
+        self.throttled = 0
+        self.base_latency: float = None
+        self.avg_latency: float = None
+        self._last_decrease = 0.0
+        self._start = time.monotonic()
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @classmethod
+    def configure(cls, initial_limit: int = None, min_limit: int = None, max_limit: int = None):
+        """设置默认参数, 仅对之后新建的限制器生效"""
+        if initial_limit is not None:
+            cls.initial_limit = initial_limit
+        if min_limit is not None:
+            cls.min_limit = min_limit
+        if max_limit is not None:
+            cls.max_limit = max_limit
+
+    @staticmethod
+    def origin(url: str) -> str:
+        parsed = urlsplit(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    @classmethod
+    def get(cls, url: str) -> "AdaptiveLimiter":
+        """获取url所属主机的共享限制器"""
+        key = cls.origin(url)
+        loop = asyncio.get_running_loop()
+        limiter_loop, limiter = cls._limiters.get(key, (None, None))
+        if limiter is None or limiter_loop is not loop:
+            limiter = cls(key)
+            cls._limiters[key] = (loop, limiter)
+        return limiter
+
+    @classmethod
+    def all_stats(cls) -> list[dict]:
+        return [limiter.stats() for _, limiter in cls._limiters.values()]
+
+    def slot(self) -> LimiterSlot:
+        return LimiterSlot(self)
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                # 已被唤醒但取消了, 把名额交给下一个
+                self._wake()
+                raise
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                free -= 1
+
+    def on_success(self, latency: float):
+        self.completed += 1
+        if self.base_latency is None or latency < self.base_latency:
+            self.base_latency = latency
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = self.avg_latency * 0.9 + latency * 0.1
+
+        if self.avg_latency <= self.base_latency * self.latency_factor + 0.05:
+            # 加性增长, 每轮 (limit 个请求) 增加 1
+            self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+
+    def on_throttled(self):
+        self.throttled += 1
+        now = time.monotonic()
+        # 同一轮请求的多次失败只减半一次
+        if now - self._last_decrease < (self.avg_latency or 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.limit / 2, self.min_limit)
+
+    def stats(self) -> dict:
+        elapsed = max(time.monotonic() - self._start, 1e-6)
+        return {
+            "host": self.host,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "throttled": self.throttled,
+            "throughput": self.completed / elapsed,
+            "avg_latency": self.avg_latency,
+        }
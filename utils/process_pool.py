@@ -0,0 +1,51 @@
+import asyncio
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+
+class ProcessPool:
+    """
+    CPU 密集任务 (贴图解码, PNG 编码) 使用的进程池
+
+    提交的函数和参数必须可以被 pickle, 函数所在模块不能有导入副作用
+    """
+
+    max_workers: int = None
+    initializer: Callable = None
+    initargs: tuple = ()
+    _executor: ProcessPoolExecutor = None
+
+    @classmethod
+    def configure(cls, max_workers: int = None, initializer: Callable = None, initargs: tuple = ()):
+        """
+        设置进程数, 0 或 None 为 CPU 核心数, 仅对之后新建的进程池生效
+
+        initializer: 每个子进程启动时调用, 用于把设置传给子进程
+        """
+        cls.max_workers = max_workers or None
+        cls.initializer = initializer
+        cls.initargs = initargs
+
+    @classmethod
+    def executor(cls) -> ProcessPoolExecutor:
+        if cls._executor is None:
+            cls._executor = ProcessPoolExecutor(
+                max_workers=cls.max_workers,
+                initializer=cls.initializer,
+                initargs=cls.initargs,
+            )
+        return cls._executor
+
+    @classmethod
+    async def run(cls, func: Callable, *args: Any) -> Any:
+        """在进程池中运行函数, 不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.executor(), func, *args)
+
+    @classmethod
+    def shutdown(cls):
+        """关闭进程池"""
+        if cls._executor is not None:
+            cls._executor.shutdown()
+            cls._executor = None
@@ -1,3 +1,4 @@
+import re
 import functools
 import ujson
 import asyncio
@@ -6,9 +7,13 @@ from pydantic import BaseModel
 from aiohttp import client_exceptions
 from tenacity import retry, stop_after_attempt, wait_fixed, RetryCallState, _utils
 from enum import Enum
+from pathlib import Path
 from types import TracebackType
 from typing import Any, Optional, Type, TypeVar
+from urllib.parse import urlsplit
 from .helper import Error_Message
+from .file_writer import AtomicFileWriter, PartFileWriter
+from .limiter import AdaptiveLimiter
 from .logger import Logger
 
 T = TypeVar("T")
@@ -22,29 +27,127 @@ def retry_log(retry_state: "RetryCallState"):
         log.debug(fn_name + " 重试次数: %s" % retry_state.attempt_number)
 
 
+def parse_content_range(content_range: str):
+    """解析 Content-Range, 返回 (起始位置, 总长度), 总长度未知时为 None"""
+    match = re.fullmatch(r"bytes (\d+)-\d+/(\d+|\*)", content_range.strip())
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return int(start), None if total == "*" else int(total)
+
+
+def resume_validator(headers, total: Optional[int]) -> Optional[dict]:
+    """续传时 If-Range 使用的校验信息, 服务器不支持时返回 None"""
+    if "Content-Encoding" in headers:
+        # aiohttp 会自动解压, 续传位置和压缩前的数据对不上
+        return None
+    etag = headers.get("ETag")
+    if etag is not None and etag.startswith("W/"):
+        # If-Range 只能使用强校验的 ETag
+        etag = None
+    last_modified = headers.get("Last-Modified")
+    if etag is None and last_modified is None:
+        return None
+    return {"etag": etag, "last_modified": last_modified, "length": total}
+
+
 class HTTPMethod(Enum):
     OPTIONS = "OPTIONS"
+    HEAD = "HEAD"
     GET = "GET"
     POST = "POST"
 
 
-class HTTPSession:
-    def __init__(self, headers=None):
-        self.headers = headers
-        self._session = None
+class SessionPool:
+    """
+    进程内共享的aiohttp会话池, 按 scheme://host 复用连接 (keep-alive)
+
+    默认校验证书, 只有用 skip_ssl_verify 登记的主机 (游戏资源主机) 不校验
+    """
+
+    limit: int = 100
+    limit_per_host: int = 30
+    keepalive_timeout: float = 60
+    _sessions: dict[str, tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+    _insecure_origins: set[str] = set()
+
+    @classmethod
+    def configure(
+        cls,
+        limit: int = None,
+        limit_per_host: int = None,
+        keepalive_timeout: float = None,
+    ):
+        """设置连接池参数, 仅对之后新建的会话生效"""
+        if limit is not None:
+            cls.limit = limit
+        if limit_per_host is not None:
+            cls.limit_per_host = limit_per_host
+        if keepalive_timeout is not None:
+            cls.keepalive_timeout = keepalive_timeout
+
+    @classmethod
+    def skip_ssl_verify(cls, url: str):
+        """不校验url所属主机的证书, 仅对之后新建的会话生效"""
+        cls._insecure_origins.add(cls.origin(url))
 
-    async def _create(self) -> aiohttp.ClientSession:
+    @staticmethod
+    def origin(url: str) -> str:
+        parsed = urlsplit(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    @classmethod
+    def _create(cls, key: str) -> aiohttp.ClientSession:
         """创建aiohttp客户端会话"""
         return aiohttp.ClientSession(
-            headers=self.headers,
-            connector=aiohttp.TCPConnector(ssl=False),
+            connector=aiohttp.TCPConnector(
+                ssl=key not in cls._insecure_origins,
+                limit=cls.limit,
+                limit_per_host=cls.limit_per_host,
+                keepalive_timeout=cls.keepalive_timeout,
+            ),
             json_serialize=ujson.dumps,
             timeout=aiohttp.ClientTimeout(total=5 * 60 * 60),
         )
 
+    @classmethod
+    def get(cls, url: str) -> aiohttp.ClientSession:
+        """获取url所属主机的共享会话, 不存在或已失效时重新创建"""
+        key = cls.origin(url)
+        loop = asyncio.get_running_loop()
+        session_loop, session = cls._sessions.get(key, (None, None))
+        if session is None or session.closed or session_loop is not loop:
+            session = cls._create(key)
+            cls._sessions[key] = (loop, session)
+        return session
+
+    @classmethod
+    async def close(cls, url: str):
+        """关闭url所属主机的共享会话"""
+        session_loop, session = cls._sessions.pop(cls.origin(url), (None, None))
+        if session is not None and session_loop is asyncio.get_running_loop() and not session.closed:
+            await session.close()
+
+    @classmethod
+    async def close_all(cls):
+        """关闭所有共享会话"""
+        loop = asyncio.get_running_loop()
+        sessions = list(cls._sessions.values())
+        cls._sessions.clear()
+        for session_loop, session in sessions:
+            if session_loop is loop and not session.closed:
+                await session.close()
+
+
+class HTTPSession:
+    def __init__(self, host: str = "", headers=None):
+        self.host = host
+        self.headers = headers
+        self._session = None
+
     async def __aenter__(self) -> aiohttp.ClientSession:
-        self._session = await self._create()
-        return await self._session.__aenter__()
+        self._session = SessionPool.get(self.host)
+        return self._session
 
     async def __aexit__(
         self,
@@ -52,7 +155,8 @@ class HTTPSession:
         exc_val: Optional[BaseException],
         exc_tb: Optional[TracebackType],
     ) -> None:
-        await self._session.close()
+        # 会话由 SessionPool 统一管理, 这里不关闭以复用连接
+        pass
 
     @staticmethod
     def Session(f):
@@ -64,8 +168,10 @@ class HTTPSession:
             **kwargs: Any,
         ) -> T:
             if session is None:
-                async with self._session as session:
-                    return await f(self, *args, session=session, **kwargs)
+                path = kwargs.get("path", args[1] if len(args) > 1 else "")
+                host = kwargs.get("host") or self.host
+                url = path if path.startswith("http") else host
+                session = SessionPool.get(url)
             return await f(self, *args, session=session, **kwargs)
 
         return wrapper
@@ -92,11 +198,11 @@ class HTTPSessionApi:
     def __init__(self, host: str, proxy: str = ""):
         self.host = host
         self.proxy = proxy
-        self._session = HTTPSession()
+        self._session = HTTPSession(host)
 
     async def close_session(self):
-        """关闭客户端会话"""
-        await self._session._session.close()
+        """关闭本接口所属主机的会话, 其他主机的会话由 run_async 结束时统一关闭"""
+        await SessionPool.close(self.host)
 
     @retry(
         stop=stop_after_attempt(5), wait=wait_fixed(1), before=retry_log, reraise=True
@@ -132,6 +238,42 @@ class HTTPSessionApi:
             **kwargs,
         )
 
+    @retry(
+        stop=stop_after_attempt(5), wait=wait_fixed(1), before=retry_log, reraise=True
+    )
+    async def request_to_file(
+        self,
+        path: str,
+        file_path: Path,
+        method: HTTPMethod = None,
+        chunk_handler: Optional[callable] = None,
+        chunk_size: int = 64 * 1024,
+        decoder=None,
+        resume: bool = True,
+        **kwargs,
+    ) -> RespondRawData:
+        """
+        流式下载到文件, 数据不在内存中累积
+
+        decoder: 可选的分块解码器, 需要实现 update(chunk) -> bytes 和 finalize() -> bytes
+        resume: 下载中断时保留 .part 文件, 重试时用 Range 请求继续下载
+        """
+        if method is None:
+            method = HTTPMethod.GET
+
+        return await self.__request__(
+            method,
+            path,
+            res_json=False,
+            res_raw_data=True,
+            chunk_handler=chunk_handler,
+            chunk_size=chunk_size,
+            file_path=file_path,
+            decoder=decoder,
+            resume=resume,
+            **kwargs,
+        )
+
     @HTTPSession.Session
     async def __request__(
         self,
@@ -146,6 +288,9 @@ class HTTPSessionApi:
         raise_error: bool = True,
         chunk_handler: Optional[callable] = None,
         chunk_size: int = 1024,
+        file_path: Optional[Path] = None,
+        decoder=None,
+        resume: bool = False,
         session: aiohttp.ClientSession,
     ) -> RespondBase:
         """发起HTTP请求并获取数据"""
@@ -157,29 +302,43 @@ class HTTPSessionApi:
             request_url = path
         
         try:
-            headers = headers or {}
+            headers = dict(headers or {})
             headers.update(self.request_headers or {})
             if json is not None:
                 headers["Content-Type"] = "application/json"
 
+            part = None
+            if file_path is not None and resume:
+                part = PartFileWriter(file_path)
+                offset = part.offset
+                if offset > 0:
+                    validator = part.validator
+                    headers["Range"] = f"bytes={offset}-"
+                    headers["If-Range"] = validator["etag"] or validator["last_modified"]
+
             if not res_json and not res_raw_data:
                 raise ValueError("请指定返回数据类型")
 
-            async with session.request(
+            async with AdaptiveLimiter.get(request_url).slot() as slot, session.request(
                 method.value if method != HTTPMethod.OPTIONS else "GET",
                 request_url,
                 headers=headers,
                 json=json,
                 proxy=self.proxy,
             ) as resp:
-                if method == HTTPMethod.OPTIONS:
+                slot.record(resp.status)
+                if method in (HTTPMethod.OPTIONS, HTTPMethod.HEAD):
                     return RespondRawData(
                         data={}, status=resp.status, headers=resp.headers
                     )
                 if resp.status == 401:
                     raise Error_Message("access token 验证失败")
 
-                if resp.status != 200:
+                if part is not None and resp.status == 416:
+                    part.discard()
+                    raise Error_Message(f"断点续传失败, 重新下载 ({request_url})")
+
+                if resp.status != 200 and not (part is not None and resp.status == 206):
                     return RespondBase(status=resp.status)
 
                 if res_json:
@@ -189,11 +348,22 @@ class HTTPSessionApi:
                     )
                 elif res_raw_data:
                     data = None
-                    if chunk_handler is not None:
+                    if part is not None:
+                        data = b""
+                        await self._stream_to_part(
+                            resp, part, chunk_handler, chunk_size, decoder
+                        )
+                    elif file_path is not None:
                         data = b""
+                        await self._stream_to_file(
+                            resp, file_path, chunk_handler, chunk_size, decoder
+                        )
+                    elif chunk_handler is not None:
+                        data = bytearray()
                         async for chunk in resp.content.iter_chunked(chunk_size):
                             chunk_handler(chunk)
                             data += chunk
+                        data = bytes(data)
                     else:
                         data = await resp.read()
                     return RespondRawData(
@@ -210,6 +380,57 @@ class HTTPSessionApi:
             err_msg = f"连接服务器超时 ({self.host})"
             self._handle_error(err_msg, raise_error)
 
+    @staticmethod
+    async def _stream_to_file(
+        resp: aiohttp.ClientResponse,
+        file_path: Path,
+        chunk_handler: Optional[callable],
+        chunk_size: int,
+        decoder=None,
+    ):
+        """边下载边写入临时文件, 完成后原子替换"""
+        with AtomicFileWriter(file_path) as writer:
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                if chunk_handler is not None:
+                    chunk_handler(chunk)
+                writer.write(decoder.update(chunk) if decoder else chunk)
+            if decoder is not None:
+                writer.write(decoder.finalize())
+
+    @staticmethod
+    async def _stream_to_part(
+        resp: aiohttp.ClientResponse,
+        part: PartFileWriter,
+        chunk_handler: Optional[callable],
+        chunk_size: int,
+        decoder=None,
+    ):
+        """边下载边追加写入 .part 文件, 中断时保留已下载的部分, 完整后替换目标文件"""
+        if resp.status == 206:
+            start, total = parse_content_range(resp.headers.get("Content-Range", ""))
+            if start != part.offset:
+                part.discard()
+                raise Error_Message("断点续传位置不一致, 重新下载")
+            validator = None
+        else:
+            start, total = 0, None
+            if "Content-Length" in resp.headers and "Content-Encoding" not in resp.headers:
+                total = int(resp.headers["Content-Length"])
+            validator = resume_validator(resp.headers, total)
+
+        part.open(start, validator)
+        try:
+            async for chunk in resp.content.iter_chunked(chunk_size):
+                if chunk_handler is not None:
+                    chunk_handler(chunk)
+                part.write(chunk)
+        finally:
+            part.close()
+
+        if total is not None and part.size != total:
+            raise Error_Message(f"下载不完整 ({part.size}/{total})")
+        part.commit(decoder)
+
     def _handle_error(self, message: str, raise_error: bool):
         """处理错误日志记录"""
         if raise_error: